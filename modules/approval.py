@@ -0,0 +1,193 @@
+import os
+import re
+import json
+import time
+import threading
+from .db_utils import get_cache_dir
+from .comms import get_user_approval
+
+
+def _split_env(name):
+    return [item.strip() for item in os.getenv(name, "").split(",") if item.strip()]
+
+
+def parse_table_names(table_names):
+    """Split a "schema1.table1,schema2.table2" string into a list of table names."""
+    return [name.strip() for name in table_names.split(",") if name.strip()]
+
+
+def _words(text):
+    return set(re.findall(r"[a-z0-9_]+", (text or "").lower()))
+
+
+def question_similarity(a, b):
+    """Jaccard similarity of the words of two questions (0 to 1)."""
+    words_a, words_b = _words(a), _words(b)
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+class ApprovalPolicy:
+    """Decides whether a table selection needs a human to confirm it.
+
+    Table sets are approved automatically when none of the tables is sensitive
+    (APPROVAL_SENSITIVE_TABLES, entries like "hr.salaries" or "hr.*") and
+    either all tables are in an allow-listed schema (APPROVAL_ALLOWED_SCHEMAS)
+    or the same tables were approved before for a similar question
+    (APPROVAL_SIMILARITY). Everything else goes to the fallback backend:
+    interactive confirmation, or rejection when APPROVAL_FALLBACK=reject for
+    unattended use. Every decision is appended to a JSONL log.
+    """
+
+    def __init__(self, fallback=None):
+        cache_dir = get_cache_dir()
+        self.history_path = cache_dir / "approved_tables.json"
+        self.log_path = cache_dir / "approval_log.jsonl"
+        self.allowed_schemas = set(_split_env("APPROVAL_ALLOWED_SCHEMAS"))
+        self.sensitive = set(_split_env("APPROVAL_SENSITIVE_TABLES"))
+        self.similarity = float(os.getenv("APPROVAL_SIMILARITY", "0.5"))
+        self.max_history = int(os.getenv("APPROVAL_HISTORY_MAX_ENTRIES", "1000"))
+        self.fallback_mode = os.getenv("APPROVAL_FALLBACK", "interactive").strip().lower()
+        self.fallback = fallback or get_user_approval
+        self.lock = threading.Lock()
+        self.history = self._load_history()
+
+    def _load_history(self):
+        if not self.history_path.exists():
+            return []
+        try:
+            with open(self.history_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save_history(self):
+        tmp_path = self.history_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.history, f)
+        os.replace(tmp_path, self.history_path)
+
+    def _log(self, question, tables, decision, reason):
+        entry = {
+            "time": time.time(),
+            "question": question,
+            "tables": tables,
+            "decision": decision,
+            "reason": reason,
+        }
+        with open(self.log_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def is_sensitive(self, table):
+        schema = table.split(".", 1)[0]
+        return table in self.sensitive or f"{schema}.*" in self.sensitive
+
+    def find_prior_approval(self, tables, question):
+        """Return the most similar prior approval that covers all `tables`, if any."""
+        best, best_score = None, self.similarity
+        for entry in self.history:
+            if not set(tables) <= set(entry["tables"]):
+                continue
+            score = question_similarity(question, entry["question"])
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def record_approval(self, tables, question):
+        """Remember that `tables` were approved for `question`."""
+        with self.lock:
+            # A repeat of an earlier approval replaces it instead of piling up
+            self.history = [
+                entry for entry in self.history
+                if not (entry["question"] == (question or "") and entry["tables"] == tables)
+            ]
+            self.history.append(
+                {"question": question or "", "tables": tables, "time": time.time()}
+            )
+            # Oldest approvals go first once APPROVAL_HISTORY_MAX_ENTRIES is reached
+            del self.history[: max(len(self.history) - self.max_history, 0)]
+            self._save_history()
+
+    def evaluate(self, tables, question):
+        """Decide without asking anyone.
+
+        Returns:
+            tuple: ("approve" or "ask", reason)
+        """
+        sensitive = [table for table in tables if self.is_sensitive(table)]
+        if sensitive:
+            return "ask", f"sensitive tables: {', '.join(sensitive)}"
+        if self.allowed_schemas and all(
+            table.split(".", 1)[0] in self.allowed_schemas for table in tables
+        ):
+            return "approve", "all tables are in allow-listed schemas"
+        with self.lock:
+            prior = self.find_prior_approval(tables, question)
+        if prior is not None:
+            return "approve", f"previously approved for: {prior['question']}"
+        return "ask", "novel table selection"
+
+    def request(self, table_names, question=None):
+        """Get approval for a table selection.
+
+        Args:
+            table_names (str): Comma-separated list of schema.table names.
+            question (str, optional): The user question the tables are for.
+
+        Returns:
+            tuple: (response, tables or feedback), as returned by get_user_approval
+        """
+        tables = parse_table_names(table_names)
+        decision, reason = self.evaluate(tables, question)
+
+        if decision == "approve":
+            rsp, result = "success", table_names
+        elif self.fallback_mode == "reject":
+            rsp, result = "failure", (
+                f"These tables need a human to approve them ({reason}) and none "
+                "is available. Use tables from allow-listed schemas or tables "
+                "that were approved before."
+            )
+            reason = f"{reason}; no interactive approval available"
+        else:
+            rsp, result = self.fallback(table_names)
+            reason = f"{reason}; answered interactively"
+
+        if rsp in ("success", "modified"):
+            approved = parse_table_names(result)
+            if decision != "approve":
+                self.record_approval(approved, question)
+        with self.lock:
+            self._log(question, tables, rsp, reason)
+        return rsp, result
+
+
+_approval_policy = None
+_approval_policy_lock = threading.Lock()
+
+
+def get_approval_policy():
+    """Return the process-wide approval policy."""
+    global _approval_policy
+    with _approval_policy_lock:
+        if _approval_policy is None:
+            _approval_policy = ApprovalPolicy()
+        return _approval_policy
+
+
+def set_approval_backend(fallback):
+    """Replace the backend asked when a table selection needs confirmation.
+
+    Args:
+        fallback: Callable taking the comma-separated table names and returning
+            (response, tables or feedback) like comms.get_user_approval.
+    """
+    global _approval_policy
+    with _approval_policy_lock:
+        _approval_policy = ApprovalPolicy(fallback=fallback)
+
+
+def request_table_approval(table_names, question=None):
+    """Get approval for a table selection through the approval policy."""
+    return get_approval_policy().request(table_names, question)
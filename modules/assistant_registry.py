@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from .db_utils import get_cache_dir
+
+
+def config_hash(instructions, tools, builtin_tools, model):
+    """Content hash of everything that defines an assistant's behaviour."""
+    payload = json.dumps(
+        {
+            "instructions": instructions,
+            "tools": tools,
+            "builtin_tools": builtin_tools,
+            "model": model,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AssistantRegistry:
+    """Local record of the remote assistants this installation created.
+
+    Entries are keyed by assistant name and hold the assistant id, the hash
+    of its configuration and when it was last used. An unchanged
+    configuration reuses its assistant, a changed one updates it in place,
+    and entries not used for ASSISTANT_MAX_AGE_DAYS are deleted remotely by
+    `collect_garbage`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_cache_dir() / "assistants.json"
+        self.max_age = float(os.getenv("ASSISTANT_MAX_AGE_DAYS", "30")) * 86400
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Read the registry from disk (empty if there is none)."""
+        if not self.path.exists():
+            return {"assistants": {}, "last_gc": 0.0}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"assistants": {}, "last_gc": 0.0}
+
+    def save(self, data):
+        """Persist the registry atomically."""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, name):
+        """Return the entry recorded for `name`, or None."""
+        with self.lock:
+            return self.load()["assistants"].get(name)
+
+    def record(self, name, assistant_id, config):
+        """Record that `name` is served by `assistant_id` with configuration hash `config`."""
+        with self.lock:
+            # Re-read so concurrent launches don't drop each other's entries
+            data = self.load()
+            data["assistants"][name] = {
+                "id": assistant_id,
+                "config": config,
+                "last_used": time.time(),
+            }
+            self.save(data)
+
+    def remove(self, name):
+        with self.lock:
+            data = self.load()
+            entry = data["assistants"].pop(name, None)
+            self.save(data)
+            return entry
+
+    def stale(self, now=None):
+        """Return the names whose entries weren't used within the maximum age."""
+        now = now or time.time()
+        with self.lock:
+            return [
+                name
+                for name, entry in self.load()["assistants"].items()
+                if now - entry.get("last_used", 0) > self.max_age
+            ]
+
+    def collect_garbage(self, client, orphans=False, force=False):
+        """Delete stale assistants from the API and the registry.
+
+        Runs at most once a day unless `force` is set.
+
+        Args:
+            client: OpenAI client used for the deletions.
+            orphans (bool): Also delete remote assistants that carry this
+                project's metadata but aren't in the registry (e.g. created
+                before the registry existed).
+            force (bool): Ignore the once-a-day limit.
+
+        Returns:
+            list: Ids of the deleted assistants.
+        """
+        with self.lock:
+            data = self.load()
+            if not force and time.time() - data.get("last_gc", 0) < 86400:
+                return []
+            data["last_gc"] = time.time()
+            self.save(data)
+
+        deleted = []
+        for name in self.stale():
+            entry = self.remove(name)
+            if entry and _delete(client, entry["id"]):
+                deleted.append(entry["id"])
+
+        if orphans:
+            known = {entry["id"] for entry in self.load()["assistants"].values()}
+            for assistant in client.beta.assistants.list(limit=100):
+                metadata = assistant.metadata or {}
+                if "dbassistant_config" in metadata and assistant.id not in known:
+                    if _delete(client, assistant.id):
+                        deleted.append(assistant.id)
+        return deleted
+
+
+def _delete(client, assistant_id):
+    try:
+        client.beta.assistants.delete(assistant_id)
+        return True
+    except Exception as e:
+        print(f"Could not delete assistant {assistant_id}: {e}", flush=True)
+        return False
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_assistant_registry():
+    """Return the process-wide assistant registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = AssistantRegistry()
+        return _registry
+
+
+def registry_enabled():
+    """Whether assistants are reused through the registry (ASSISTANT_REGISTRY, default on)."""
+    return os.getenv("ASSISTANT_REGISTRY", "true").strip().lower() in ("1", "true", "yes", "on")
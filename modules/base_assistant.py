@@ -1,18 +1,146 @@
 import os
-from dotenv import load_dotenv
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-import pandas as pd
-from openai import OpenAI
 from typing_extensions import override
-from openai import AssistantEventHandler
+from openai import AssistantEventHandler, AsyncAssistantEventHandler, NotFoundError
 
 from .llm_utils import invoke_tool_for_llm, encode_func_call_result, func_to_json
+from .token_budget import TokenBudget
+from .tracing import span, current_span
+from .openai_client import get_client, get_async_client
+from .assistant_registry import get_assistant_registry, registry_enabled, config_hash
 
 
+# Tools that talk to the user. They are never run in parallel with each other.
+INTERACTIVE_TOOLS = {"confirm_add_tables"}
 
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=openai_api_key)
+# Blocking tool work of all async sessions runs on one bounded executor.
+_tool_executor = None
+_tool_executor_lock = threading.Lock()
+_interactive_lock = asyncio.Lock()
+
+# Tool calls of sync sessions run on their own shared executor.
+_tool_call_executor = None
+
+# Set once a tool call has been reported to the model as timed out
+_abandoned = contextvars.ContextVar("tool_call_abandoned", default=None)
+
+
+def tool_call_abandoned():
+    """Return True inside a tool call that was already reported as timed out.
+
+    Such a call keeps running in its worker thread, but its result is
+    discarded, so it should skip side effects like uploads or the query memory.
+    """
+    abandoned = _abandoned.get()
+    return abandoned is not None and abandoned.is_set()
+
+
+def get_tool_executor():
+    """Return the executor shared by async sessions (ASYNC_TOOL_WORKERS threads)."""
+    global _tool_executor
+    with _tool_executor_lock:
+        if _tool_executor is None:
+            _tool_executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("ASYNC_TOOL_WORKERS", "32")),
+                thread_name_prefix="dbassistant-tool",
+            )
+        return _tool_executor
+
+
+async def run_blocking(func, *args):
+    """Run blocking DB/pandas work on the shared tool executor."""
+    loop = asyncio.get_running_loop()
+    # Copy the context so spans opened by `func` nest under the caller's span
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_tool_executor(), context.run, func, *args)
+
+
+def get_tool_call_workers():
+    """Return the maximum number of tool calls run concurrently (TOOL_CALL_WORKERS)."""
+    return int(os.getenv("TOOL_CALL_WORKERS", "4"))
+
+
+def get_tool_call_executor():
+    """Return the executor shared by the tool calls of sync sessions (TOOL_CALL_WORKERS threads)."""
+    global _tool_call_executor
+    with _tool_executor_lock:
+        if _tool_call_executor is None:
+            _tool_call_executor = ThreadPoolExecutor(
+                max_workers=get_tool_call_workers(),
+                thread_name_prefix="dbassistant-tool-call",
+            )
+        return _tool_call_executor
+
+
+def get_tool_call_timeout(function_name):
+    """Return the timeout in seconds for a tool.
+
+    TOOL_CALL_TIMEOUTS holds per-tool overrides as "name=seconds,name=seconds";
+    other tools use TOOL_CALL_TIMEOUT.
+    """
+    overrides = os.getenv("TOOL_CALL_TIMEOUTS", "")
+    for item in overrides.split(","):
+        name, _, seconds = item.partition("=")
+        if name.strip() == function_name and seconds.strip():
+            return float(seconds)
+    return float(os.getenv("TOOL_CALL_TIMEOUT", "300"))
+
+
+RUN_END_EVENTS = {
+    "thread.run.completed",
+    "thread.run.failed",
+    "thread.run.incomplete",
+    "thread.run.cancelled",
+    "thread.run.expired",
+}
+
+
+def record_run_end(event):
+    """Add the final status and token usage of a run to the open run span."""
+    run_span = current_span("run")
+    if run_span is None:
+        return
+    run = event.data
+    run_span.set(run_id=run.id, status=run.status)
+    if getattr(run, "usage", None) is not None:
+        run_span.set(
+            prompt_tokens=run.usage.prompt_tokens,
+            completion_tokens=run.usage.completion_tokens,
+        )
+    if getattr(run, "last_error", None) is not None:
+        run_span.set(run_error=run.last_error.message)
+
+
+def invoke_tool_call(toolkit, tool):
+    """Invoke the function a tool call refers to and encode its result.
+
+    Args:
+        toolkit (dict): Dictionary of tools available to the assistant.
+        tool: The tool call object.
+
+    Returns:
+        str: The encoded tool output.
+    """
+    function_name = tool.function.name
+    function_args = tool.function.arguments
+
+    with span("tool_call", tool=function_name) as tool_span:
+        if function_name in toolkit:
+            try:
+                result = invoke_tool_for_llm(toolkit[function_name], function_args)
+                output = encode_func_call_result(result, function_name)
+            except Exception as e:
+                tool_span.set(tool_error=str(e))
+                output = encode_func_call_result(f"Error: {str(e)}")
+        else:
+            output = encode_func_call_result(f"Error: Tool {function_name} not found")
+        tool_span.set(output_chars=len(output))
+        return output
 
 
 class BaseAssistant:
@@ -43,6 +171,22 @@ class BaseAssistant:
         self.model = model
         self.tool_resources = tool_resources
 
+    def _definition(self):
+        """Read the instructions and build the tool list and configuration hash.
+
+        Returns:
+            tuple: (instructions, tools sent to the API, configuration hash)
+        """
+        with open(self.instruct_file, "r") as f:
+            instructions = f.read()
+        json_tools = [func_to_json(tool) for tool in self.tools.values()]
+        config = config_hash(instructions, json_tools, self.builtin_tools, self.model)
+        return instructions, json_tools + self.builtin_tools, config
+
+    def _metadata(self, config):
+        # Lets the registry recognise assistants it has lost track of
+        return {"dbassistant_name": self.name, "dbassistant_config": config}
+
     def create_assistant(self):
         """Create a new assistant with the specified configuration.
 
@@ -52,21 +196,99 @@ class BaseAssistant:
         Raises:
             Exception: If assistant creation fails.
         """
-        json_tools = [func_to_json(tool) for tool in self.tools.values()]
-        try:
-            with open(self.instruct_file, "r") as f:
-                instructions = f.read()
-
-            assistant = client.beta.assistants.create(
-                name=self.name,
-                instructions=instructions,
-                tools=json_tools + self.builtin_tools,
-                model=self.model,
-            )
-            self.id = assistant.id
-            return assistant
-        except Exception as e:
-            raise
+        instructions, tools, config = self._definition()
+        assistant = get_client().beta.assistants.create(
+            name=self.name,
+            instructions=instructions,
+            tools=tools,
+            model=self.model,
+            metadata=self._metadata(config),
+        )
+        self.id = assistant.id
+        return assistant
+
+    async def create_assistant_async(self):
+        """Create a new assistant with the async client.
+
+        Returns:
+            The created assistant object.
+        """
+        instructions, tools, config = self._definition()
+        assistant = await get_async_client().beta.assistants.create(
+            name=self.name,
+            instructions=instructions,
+            tools=tools,
+            model=self.model,
+            metadata=self._metadata(config),
+        )
+        self.id = assistant.id
+        return assistant
+
+    def get_or_create_assistant(self):
+        """Reuse the registered assistant of this name, or create one.
+
+        An unchanged configuration is retrieved, a changed one is updated in
+        place, and a missing one (or ASSISTANT_REGISTRY=false) is created.
+
+        Returns:
+            The assistant object.
+        """
+        if not registry_enabled():
+            return self.create_assistant()
+        instructions, tools, config = self._definition()
+        registry = get_assistant_registry()
+        entry = registry.get(self.name)
+        assistant = None
+        if entry is not None:
+            self.id = entry["id"]
+            try:
+                if entry["config"] == config:
+                    assistant = self.retrieve_assistant()
+                else:
+                    assistant = get_client().beta.assistants.update(
+                        self.id,
+                        instructions=instructions,
+                        tools=tools,
+                        model=self.model,
+                        metadata=self._metadata(config),
+                    )
+            except NotFoundError:
+                # Deleted outside of the registry
+                self.id = None
+        if assistant is None:
+            assistant = self.create_assistant()
+        registry.record(self.name, self.id, config)
+        registry.collect_garbage(get_client())
+        return assistant
+
+    async def get_or_create_assistant_async(self):
+        """Async version of `get_or_create_assistant`."""
+        if not registry_enabled():
+            return await self.create_assistant_async()
+        instructions, tools, config = self._definition()
+        registry = get_assistant_registry()
+        entry = registry.get(self.name)
+        assistant = None
+        if entry is not None:
+            self.id = entry["id"]
+            try:
+                if entry["config"] == config:
+                    assistant = await get_async_client().beta.assistants.retrieve(self.id)
+                else:
+                    assistant = await get_async_client().beta.assistants.update(
+                        self.id,
+                        instructions=instructions,
+                        tools=tools,
+                        model=self.model,
+                        metadata=self._metadata(config),
+                    )
+            except NotFoundError:
+                self.id = None
+        if assistant is None:
+            assistant = await self.create_assistant_async()
+        registry.record(self.name, self.id, config)
+        await run_blocking(registry.collect_garbage, get_client())
+        return assistant
 
     def retrieve_assistant(self):
         """Retrieve an existing assistant by ID.
@@ -78,7 +300,7 @@ class BaseAssistant:
             Exception: If assistant retrieval fails.
         """
         try:
-            assistant = client.beta.assistants.retrieve(self.id)
+            assistant = get_client().beta.assistants.retrieve(self.id)
             return assistant
         except Exception as e:
             raise
@@ -91,16 +313,18 @@ class BaseAssistantEventHandler(AssistantEventHandler):
     text creation, tool calls, and message processing.
     """
 
-    def __init__(self, tool_dict, name):
+    def __init__(self, tool_dict, name, budget=None):
         """Initialize the event handler.
 
         Args:
             tool_dict (dict): Dictionary of tools available to the assistant.
             name (str): Name of the assistant.
+            budget (TokenBudget, optional): Token budget shared by the handlers of one run.
         """
         super().__init__()
         self.toolkit = tool_dict
         self.name = name
+        self.budget = budget if budget is not None else TokenBudget()
 
     @override
     def on_text_created(self, text) -> None:
@@ -141,6 +365,8 @@ class BaseAssistantEventHandler(AssistantEventHandler):
         if event.event == "thread.run.requires_action":
             run_id = event.data.id
             self.handle_requires_action(event.data, run_id)
+        elif event.event in RUN_END_EVENTS:
+            record_run_end(event)
 
     def handle_requires_action(self, data, run_id):
         """Handle events that require action (like tool calls).
@@ -149,40 +375,87 @@ class BaseAssistantEventHandler(AssistantEventHandler):
             data: The event data.
             run_id: The ID of the current run.
         """
-        tool_outputs = []
-        toolkit = self.toolkit
+        tool_calls = data.required_action.submit_tool_outputs.tool_calls
+        results = self.run_tool_calls(tool_calls)
+        tool_outputs = [
+            {"tool_call_id": tool.id, "output": output}
+            for tool, output in zip(tool_calls, results)
+        ]
+        tool_outputs = self.budget.apply_outputs(tool_calls, tool_outputs)
+        self.submit_tool_outputs(tool_outputs, run_id)
 
-        for tool in data.required_action.submit_tool_outputs.tool_calls:
-            function_name = tool.function.name
-            function_args = tool.function.arguments
+    def run_tool_calls(self, tool_calls):
+        """Run the tool calls of one requires_action event concurrently.
+
+        Calls are dispatched to a shared pool of TOOL_CALL_WORKERS threads,
+        except for interactive tools, which run one after another on the
+        calling thread. Each call must finish within its timeout
+        (TOOL_CALL_TIMEOUT, or a per-tool override in TOOL_CALL_TIMEOUTS) from
+        the moment it is submitted, queueing included; otherwise it gets an
+        error output. Calls reported as timed out are not started anymore, and
+        running ones skip their side effects (see `tool_call_abandoned`).
 
-            if function_name in toolkit:
+        Args:
+            tool_calls (list): The tool calls of the event.
+
+        Returns:
+            list: The result of `run_tool_call` for each call, in the original order.
+        """
+        results = [None] * len(tool_calls)
+
+        def run_call(i, abandoned):
+            if abandoned.is_set():
+                return None
+            _abandoned.set(abandoned)
+            return self.run_tool_call(tool_calls[i])
+
+        executor = get_tool_call_executor()
+        calls = {}
+        for i, tool in enumerate(tool_calls):
+            if tool.function.name not in INTERACTIVE_TOOLS:
+                abandoned = threading.Event()
+                future = executor.submit(contextvars.copy_context().run, run_call, i, abandoned)
+                deadline = time.monotonic() + get_tool_call_timeout(tool.function.name)
+                calls[future] = (i, deadline, abandoned)
+
+        for i, tool in enumerate(tool_calls):
+            if tool.function.name in INTERACTIVE_TOOLS:
+                results[i] = self.run_tool_call(tool)
+
+        pending = set(calls)
+        while pending:
+            for future in [f for f in pending if f.done()]:
+                i = calls[future][0]
+                pending.discard(future)
                 try:
-                    result = invoke_tool_for_llm(toolkit[function_name], function_args)
-                    tool_outputs.append(
-                        {
-                            "tool_call_id": tool.id,
-                            "output": encode_func_call_result(result),
-                        }
-                    )
+                    results[i] = future.result()
                 except Exception as e:
-                    tool_outputs.append(
-                        {
-                            "tool_call_id": tool.id,
-                            "output": encode_func_call_result(f"Error: {str(e)}"),
-                        }
-                    )
-            else:
-                tool_outputs.append(
-                    {
-                        "tool_call_id": tool.id,
-                        "output": encode_func_call_result(
-                            f"Error: Tool {function_name} not found"
-                        ),
-                    }
+                    results[i] = encode_func_call_result(f"Error: {str(e)}")
+            now = time.monotonic()
+            for future in [f for f in pending if calls[f][1] <= now]:
+                i, _, abandoned = calls[future]
+                pending.discard(future)
+                abandoned.set()
+                function_name = tool_calls[i].function.name
+                results[i] = encode_func_call_result(
+                    f"Error: Tool {function_name} timed out after "
+                    f"{get_tool_call_timeout(function_name)} seconds"
                 )
+            if pending:
+                next_deadline = min(calls[f][1] for f in pending)
+                wait(pending, timeout=max(next_deadline - now, 0), return_when=FIRST_COMPLETED)
+        return results
 
-        self.submit_tool_outputs(tool_outputs, run_id)
+    def run_tool_call(self, tool):
+        """Run a single tool call.
+
+        Args:
+            tool: The tool call object.
+
+        Returns:
+            str: The encoded tool output.
+        """
+        return invoke_tool_call(self.toolkit, tool)
 
     def submit_tool_outputs(self, tool_outputs, run_id):
         """Submit tool outputs back to the assistant.
@@ -191,10 +464,12 @@ class BaseAssistantEventHandler(AssistantEventHandler):
             tool_outputs (list): List of tool outputs to submit.
             run_id (str): The ID of the current run.
         """
-        curr_event_handler = BaseAssistantEventHandler(self.toolkit, self.name)
+        curr_event_handler = BaseAssistantEventHandler(
+            self.toolkit, self.name, self.budget
+        )
 
-        try:
-            with client.beta.threads.runs.submit_tool_outputs_stream(
+        with span("submit_tool_outputs", outputs=len(tool_outputs)):
+            with get_client().beta.threads.runs.submit_tool_outputs_stream(
                 thread_id=self.current_run.thread_id,
                 run_id=self.current_run.id,
                 tool_outputs=tool_outputs,
@@ -202,8 +477,6 @@ class BaseAssistantEventHandler(AssistantEventHandler):
             ) as stream:
                 stream.until_done()
                 print()
-        except Exception as e:
-            pass
 
     @override
     def message_done(self, message):
@@ -219,7 +492,7 @@ class BaseAssistantEventHandler(AssistantEventHandler):
                         file_id = annot.file_path.file_id
 
                         try:
-                            file_content = client.files.retrieve(file_id)
+                            file_content = get_client().files.retrieve(file_id)
                             file_type = annot.text.split(".")[-1]
 
                             downloads_dir = Path(__file__).parent.parent / "downloads"
@@ -261,7 +534,7 @@ class BaseAssistantEventHandler(AssistantEventHandler):
         for content in message.content:
             if hasattr(content, "image_file") and content.image_file:
                 file_id = content.image_file.file_id
-                file_content = client.files.content(file_id)
+                file_content = get_client().files.content(file_id)
                 downloads_dir = Path(__file__).parent.parent / "downloads"
                 downloads_dir.mkdir(exist_ok=True)
                 file_path = downloads_dir / f"{file_id}.png"
@@ -273,7 +546,7 @@ class BaseAssistantEventHandler(AssistantEventHandler):
                     for annot in content.text.annotations:
                         if annot.type == "file_path":
                             file_id = annot.file_path.file_id
-                            file_content = client.files.content(file_id)
+                            file_content = get_client().files.content(file_id)
                             file_type = annot.text.split(".")[-1]
                             downloads_dir = Path(__file__).parent.parent / "downloads"
                             downloads_dir.mkdir(exist_ok=True)
@@ -284,3 +557,140 @@ class BaseAssistantEventHandler(AssistantEventHandler):
                                 f"code interpreter returned image with the following path: {file_path}",
                                 flush=True,
                             )
+
+
+class AsyncBaseAssistantEventHandler(AsyncAssistantEventHandler):
+    """Async event handler for OpenAI assistant interactions.
+
+    Tool calls run on the shared tool executor, so one event loop can serve
+    many sessions at once. Text produced by the assistant is collected in
+    `transcript`, which is shared with the handlers of follow-up streams.
+    """
+
+    def __init__(self, tool_dict, name, transcript=None, echo=True, budget=None):
+        """Initialize the event handler.
+
+        Args:
+            tool_dict (dict): Dictionary of tools available to the assistant.
+            name (str): Name of the assistant.
+            transcript (list, optional): Collects the assistant's text deltas.
+            echo (bool): Print the conversation to stdout.
+            budget (TokenBudget, optional): Token budget shared by the handlers of one run.
+        """
+        super().__init__()
+        self.toolkit = tool_dict
+        self.name = name
+        self.transcript = transcript if transcript is not None else []
+        self.echo = echo
+        self.budget = budget if budget is not None else TokenBudget()
+
+    def new_handler(self):
+        """Return a handler for the stream that continues after tool outputs."""
+        return AsyncBaseAssistantEventHandler(
+            self.toolkit, self.name, self.transcript, self.echo, self.budget
+        )
+
+    @override
+    async def on_text_created(self, text) -> None:
+        if self.echo:
+            print(f"\n {self.name} > ", end="", flush=True)
+
+    @override
+    async def on_text_delta(self, delta, snapshot):
+        self.transcript.append(delta.value or "")
+        if self.echo:
+            print(delta.value, end="", flush=True)
+
+    @override
+    async def on_tool_call_created(self, tool_call):
+        if self.echo:
+            print(f"\n {self.name} > {tool_call.type}\n", flush=True)
+            if tool_call.type == "function":
+                print(f"function name: {tool_call.function.name}\n", flush=True)
+
+    @override
+    async def on_event(self, event):
+        if event.event == "thread.run.requires_action":
+            run_id = event.data.id
+            await self.handle_requires_action(event.data, run_id)
+        elif event.event in RUN_END_EVENTS:
+            record_run_end(event)
+
+    async def handle_requires_action(self, data, run_id):
+        """Run the tool calls of the event and submit their outputs.
+
+        Args:
+            data: The event data.
+            run_id: The ID of the current run.
+        """
+        tool_calls = data.required_action.submit_tool_outputs.tool_calls
+        results = await self.run_tool_calls(tool_calls)
+        tool_outputs = [
+            {"tool_call_id": tool.id, "output": output}
+            for tool, output in zip(tool_calls, results)
+        ]
+        tool_outputs = self.budget.apply_outputs(tool_calls, tool_outputs)
+        await self.submit_tool_outputs(tool_outputs, run_id)
+
+    async def run_tool_calls(self, tool_calls):
+        """Run the tool calls of one event concurrently, in original order.
+
+        Interactive tools are serialised across all sessions of the process.
+
+        Args:
+            tool_calls (list): The tool calls of the event.
+
+        Returns:
+            list: The result of `run_tool_call` for each call.
+        """
+
+        async def run_one(tool):
+            function_name = tool.function.name
+            if function_name in INTERACTIVE_TOOLS:
+                async with _interactive_lock:
+                    return await self.run_tool_call(tool)
+            timeout = get_tool_call_timeout(function_name)
+            # Each gathered call runs in its own task context, which
+            # run_blocking passes on to the worker thread
+            abandoned = threading.Event()
+            _abandoned.set(abandoned)
+            try:
+                return await asyncio.wait_for(self.run_tool_call(tool), timeout)
+            except asyncio.TimeoutError:
+                abandoned.set()
+                return encode_func_call_result(
+                    f"Error: Tool {function_name} timed out after {timeout} seconds"
+                )
+            except Exception as e:
+                return encode_func_call_result(f"Error: {str(e)}")
+
+        return await asyncio.gather(*(run_one(tool) for tool in tool_calls))
+
+    async def run_tool_call(self, tool):
+        """Run a single tool call on the shared tool executor.
+
+        Args:
+            tool: The tool call object.
+
+        Returns:
+            str: The encoded tool output.
+        """
+        return await run_blocking(invoke_tool_call, self.toolkit, tool)
+
+    async def submit_tool_outputs(self, tool_outputs, run_id):
+        """Submit tool outputs and stream the rest of the run.
+
+        Args:
+            tool_outputs (list): List of tool outputs to submit.
+            run_id (str): The ID of the current run.
+        """
+        with span("submit_tool_outputs", outputs=len(tool_outputs)):
+            async with get_async_client().beta.threads.runs.submit_tool_outputs_stream(
+                thread_id=self.current_run.thread_id,
+                run_id=self.current_run.id,
+                tool_outputs=tool_outputs,
+                event_handler=self.new_handler(),
+            ) as stream:
+                await stream.until_done()
+                if self.echo:
+                    print()
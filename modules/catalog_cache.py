@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from .db_utils import get_engine, get_cache_dir
+from .tracing import span
+
+
+# A cheap fingerprint over the catalog rows that change on DDL. Any CREATE,
+# DROP or ALTER of a table, column or key constraint, and any COMMENT ON a
+# table, rewrites at least one of these rows and therefore changes its xmin.
+FINGERPRINT_QUERY = """
+    SELECT md5(
+        (SELECT coalesce(string_agg(c.oid::text || ':' || c.xmin::text || ':' || c.relnatts::text, ',' ORDER BY c.oid), '')
+         FROM pg_class c
+         JOIN pg_namespace n ON n.oid = c.relnamespace
+         WHERE c.relkind IN ('r', 'p', 'v', 'm', 'f')
+           AND n.nspname NOT IN ('pg_catalog', 'pg_toast', 'information_schema')
+           AND n.nspname NOT LIKE 'pg_temp%')
+        || '|' ||
+        (SELECT count(*)::text || ':' || coalesce(max(a.xmin::text::bigint), 0)::text
+         FROM pg_attribute a
+         JOIN pg_class c ON c.oid = a.attrelid
+         JOIN pg_namespace n ON n.oid = c.relnamespace
+         WHERE a.attnum > 0
+           AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+           AND n.nspname NOT IN ('pg_catalog', 'pg_toast', 'information_schema')
+           AND n.nspname NOT LIKE 'pg_temp%')
+        || '|' ||
+        (SELECT coalesce(string_agg(co.oid::text || ':' || co.xmin::text, ',' ORDER BY co.oid), '')
+         FROM pg_constraint co
+         JOIN pg_namespace n ON n.oid = co.connamespace
+         WHERE co.contype IN ('p', 'f')
+           AND n.nspname NOT IN ('pg_catalog', 'pg_toast', 'information_schema'))
+        || '|' ||
+        (SELECT count(*)::text || ':' || coalesce(max(d.xmin::text::bigint), 0)::text
+         FROM pg_description d
+         WHERE d.classoid = 'pg_class'::regclass AND d.objsubid = 0)
+    ) AS fingerprint
+"""
+
+COLUMNS_QUERY = """
+    SELECT
+        n.nspname AS schema_name,
+        c.relname AS table_name,
+        a.attname AS column_name,
+        format_type(a.atttypid, a.atttypmod) AS data_type
+    FROM pg_attribute a
+    JOIN pg_class c ON c.oid = a.attrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE a.attnum > 0
+        AND NOT a.attisdropped
+        AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+        AND n.nspname NOT IN ('pg_catalog', 'pg_toast', 'information_schema')
+        AND n.nspname NOT LIKE 'pg_temp%'
+    ORDER BY n.nspname, c.relname, a.attnum
+"""
+
+# Row estimates are as of the last ANALYZE when the snapshot was built.
+TABLES_QUERY = """
+    SELECT
+        n.nspname AS schema_name,
+        c.relname AS table_name,
+        c.relkind AS kind,
+        greatest(c.reltuples, 0)::bigint AS row_estimate,
+        obj_description(c.oid, 'pg_class') AS description
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind IN ('r', 'p', 'v', 'm', 'f')
+        AND n.nspname NOT IN ('pg_catalog', 'pg_toast', 'information_schema')
+        AND n.nspname NOT LIKE 'pg_temp%'
+"""
+
+PRIMARY_KEYS_QUERY = """
+    SELECT
+        n.nspname AS schema_name,
+        c.relname AS table_name,
+        a.attname AS column_name
+    FROM pg_constraint co
+    JOIN pg_class c ON c.oid = co.conrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    CROSS JOIN LATERAL unnest(co.conkey) WITH ORDINALITY AS k(attnum, pos)
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = k.attnum
+    WHERE co.contype = 'p'
+        AND n.nspname NOT IN ('pg_catalog', 'pg_toast', 'information_schema')
+    ORDER BY n.nspname, c.relname, k.pos
+"""
+
+FOREIGN_KEYS_QUERY = """
+    SELECT
+        n.nspname AS table_schema,
+        co.conname AS constraint_name,
+        c.relname AS table_name,
+        a.attname AS column_name,
+        fn.nspname AS foreign_table_schema,
+        fc.relname AS foreign_table_name,
+        fa.attname AS foreign_column_name
+    FROM pg_constraint co
+    JOIN pg_class c ON c.oid = co.conrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_class fc ON fc.oid = co.confrelid
+    JOIN pg_namespace fn ON fn.oid = fc.relnamespace
+    CROSS JOIN LATERAL unnest(co.conkey, co.confkey) WITH ORDINALITY AS k(attnum, fattnum, pos)
+    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = k.attnum
+    JOIN pg_attribute fa ON fa.attrelid = fc.oid AND fa.attnum = k.fattnum
+    WHERE co.contype = 'f'
+        AND n.nspname NOT IN ('pg_catalog', 'pg_toast', 'information_schema')
+    ORDER BY n.nspname, c.relname, co.conname, k.pos
+"""
+
+
+def _rows(conn, query):
+    from sqlalchemy import text
+
+    result = conn.execute(text(query))
+    return [dict(row) for row in result.mappings()]
+
+
+class CatalogCache:
+    """Local snapshot of the database catalog (tables, columns, types, PKs, FKs).
+
+    The snapshot is persisted to disk, loaded on first use and served from
+    memory. Before serving it, the cache compares a cheap catalog fingerprint
+    with the one stored in the snapshot (at most once every
+    CATALOG_CHECK_INTERVAL seconds) and rebuilds only when the catalog changed.
+    """
+
+    def __init__(self, db_uri=None):
+        self.db_uri = db_uri or os.getenv("DB_URI")
+        uri_hash = hashlib.sha1(str(self.db_uri).encode()).hexdigest()[:12]
+        self.path = get_cache_dir() / f"catalog_{uri_hash}.json"
+        self.check_interval = float(os.getenv("CATALOG_CHECK_INTERVAL", "60"))
+        self.snapshot = None
+        self.last_checked = 0.0
+        self.lock = threading.Lock()
+        # Held while the catalog is queried, so only one caller checks at a time
+        self.refresh_lock = threading.Lock()
+
+    def load(self):
+        """Load the persisted snapshot from disk, if there is one."""
+        if self.snapshot is None and self.path.exists():
+            try:
+                with open(self.path, "r") as f:
+                    self.snapshot = json.load(f)
+            except (OSError, ValueError):
+                self.snapshot = None
+        return self.snapshot
+
+    def save(self, snapshot=None):
+        """Persist `snapshot` (default: the in-memory one) to disk atomically."""
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot or self.snapshot, f)
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self, conn):
+        from sqlalchemy import text
+
+        return conn.execute(text(FINGERPRINT_QUERY)).scalar()
+
+    def build(self, conn, fingerprint):
+        """Read the catalog from pg_catalog and build a new snapshot."""
+        tables = {}
+        for row in _rows(conn, COLUMNS_QUERY):
+            key = f"{row['schema_name']}.{row['table_name']}"
+            table = tables.setdefault(
+                key,
+                {"columns": [], "primary_key": [], "foreign_keys": []},
+            )
+            table["columns"].append(
+                {"column_name": row["column_name"], "data_type": row["data_type"]}
+            )
+        for row in _rows(conn, TABLES_QUERY):
+            key = f"{row['schema_name']}.{row['table_name']}"
+            if key in tables:
+                tables[key]["kind"] = row["kind"]
+                tables[key]["row_estimate"] = row["row_estimate"]
+                tables[key]["description"] = row["description"]
+        for row in _rows(conn, PRIMARY_KEYS_QUERY):
+            key = f"{row['schema_name']}.{row['table_name']}"
+            if key in tables:
+                tables[key]["primary_key"].append(row["column_name"])
+        for row in _rows(conn, FOREIGN_KEYS_QUERY):
+            key = f"{row['table_schema']}.{row['table_name']}"
+            if key in tables:
+                tables[key]["foreign_keys"].append(row)
+
+        return {
+            "fingerprint": fingerprint,
+            "created_at": time.time(),
+            "tables": tables,
+        }
+
+    def get(self, force_check=False):
+        """Return an up-to-date catalog snapshot.
+
+        Args:
+            force_check (bool): Compare fingerprints even if the check interval
+                hasn't elapsed yet.
+
+        Returns:
+            dict: Snapshot with `fingerprint`, `created_at` and `tables`, where
+                `tables` maps "schema.table" to its columns, primary key,
+                foreign keys, kind, row estimate and description.
+        """
+        with self.lock:
+            self.load()
+            snapshot = self.snapshot
+            if (
+                snapshot is not None
+                and not force_check
+                and time.time() - self.last_checked < self.check_interval
+            ):
+                return snapshot
+
+        # The catalog is queried without holding self.lock. While one caller
+        # checks or rebuilds, the others keep getting the current snapshot.
+        if not self.refresh_lock.acquire(blocking=snapshot is None or force_check):
+            return snapshot
+        try:
+            with self.lock:
+                snapshot = self.snapshot
+                # Another caller may have checked while this one waited
+                if (
+                    snapshot is not None
+                    and not force_check
+                    and time.time() - self.last_checked < self.check_interval
+                ):
+                    return snapshot
+            now = time.time()
+            engine = get_engine(self.db_uri)
+            if engine is None:
+                raise ConnectionError("Unable to connect to the database")
+            with engine.connect() as conn:
+                with span("sql", kind="catalog_fingerprint"):
+                    fingerprint = self.fingerprint(conn)
+                rebuilt = snapshot is None or snapshot.get("fingerprint") != fingerprint
+                if rebuilt:
+                    with span("sql", kind="catalog_build") as build_span:
+                        snapshot = self.build(conn, fingerprint)
+                        build_span.set(tables=len(snapshot["tables"]))
+            with self.lock:
+                if rebuilt:
+                    self.snapshot = snapshot
+                self.last_checked = now
+            if rebuilt:
+                self.save(snapshot)
+            return snapshot
+        finally:
+            self.refresh_lock.release()
+
+    def invalidate(self):
+        """Drop the snapshot from memory and disk so the next call rebuilds it."""
+        with self.lock:
+            self.snapshot = None
+            self.last_checked = 0.0
+            if self.path.exists():
+                self.path.unlink()
+
+
+_catalog_caches = {}
+_catalog_caches_lock = threading.Lock()
+
+
+def get_catalog_cache(db_uri=None):
+    """Return the process-wide catalog cache for `db_uri` (defaults to DB_URI)."""
+    db_uri = db_uri or os.getenv("DB_URI")
+    with _catalog_caches_lock:
+        cache = _catalog_caches.get(db_uri)
+        if cache is None:
+            cache = CatalogCache(db_uri)
+            cache.load()
+            _catalog_caches[db_uri] = cache
+        return cache
+
+
+def warm_up_catalog(db_uri=None):
+    """Open the connection pool and bring the catalog snapshot up to date.
+
+    Meant to run next to the other startup work; failures are printed rather
+    than raised so the conversation still starts without a database.
+    """
+    try:
+        with span("startup", kind="database"):
+            engine = get_engine(db_uri)
+            # The snapshot reads pg_catalog, other databases only get the pool
+            if engine is not None and engine.dialect.name == "postgresql":
+                get_catalog_cache(db_uri).get()
+    except Exception as e:
+        print(f"Database warm-up failed: {e}", flush=True)
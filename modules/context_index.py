@@ -0,0 +1,265 @@
+import os
+import re
+import json
+import math
+import threading
+import importlib.util
+from pathlib import Path
+from collections import Counter
+from .db_utils import get_cache_dir
+
+CONTEXT_DIR = "context_files"
+
+_TOKEN = re.compile(r"[a-z0-9_]+")
+_HEADING = re.compile(r"^\s*(#+\s|table\s*:|schema\s*:|\d+\.\s)", re.IGNORECASE)
+
+
+def tokenize(text):
+    """Lower-case word tokens; snake_case identifiers also yield their parts."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if "_" in token:
+            tokens.extend(part for part in token.split("_") if part)
+    return tokens
+
+
+def bm25_score(query_terms, doc, doc_freq, n_docs, avg_length, k1=1.5, b=0.75):
+    """BM25 score of a document (a dict with "tf" and "length") for `query_terms`."""
+    score = 0.0
+    for term in query_terms:
+        tf = doc["tf"].get(term, 0)
+        if not tf:
+            continue
+        df = doc_freq.get(term, 0)
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = tf + k1 * (1 - b + b * doc["length"] / (avg_length or 1))
+        score += idf * tf * (k1 + 1) / norm
+    return score
+
+
+def chunk_context(text, max_chars=1200):
+    """Split a context file into sections.
+
+    A new section starts at a heading-like line (markdown headings, "Table:",
+    numbered items) or a blank line; small neighbouring paragraphs are merged
+    up to `max_chars`.
+    """
+    paragraphs, current = [], []
+    for line in text.splitlines():
+        if not line.strip() or _HEADING.match(line):
+            if current:
+                paragraphs.append("\n".join(current).strip())
+            current = [line] if line.strip() else []
+        else:
+            current.append(line)
+    if current:
+        paragraphs.append("\n".join(current).strip())
+
+    chunks = []
+    for paragraph in filter(None, paragraphs):
+        if chunks and len(chunks[-1]) + len(paragraph) + 2 <= max_chars and not _HEADING.match(paragraph):
+            chunks[-1] = f"{chunks[-1]}\n\n{paragraph}"
+        else:
+            chunks.append(paragraph)
+    return chunks
+
+
+class ContextIndex:
+    """On-disk BM25 index over the sections of the schema context files.
+
+    The index is rebuilt when a context file is added, removed or modified.
+    If sentence-transformers is installed and CONTEXT_EMBEDDING_MODEL is set,
+    section embeddings are stored as well and blended into the ranking.
+    """
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, context_dir=CONTEXT_DIR):
+        self.context_dir = Path(context_dir)
+        self.path = get_cache_dir() / "context_index.json"
+        self.embedding_model_name = os.getenv("CONTEXT_EMBEDDING_MODEL")
+        self._embedding_model = None
+        self.lock = threading.Lock()
+        self.index = None
+
+    def _file_state(self):
+        if not self.context_dir.exists():
+            return {}
+        return {
+            path.stem: [path.stat().st_mtime, path.stat().st_size]
+            for path in sorted(self.context_dir.glob("*.txt"))
+        }
+
+    def _embedding_model_in_use(self):
+        """The configured embedding model, or None if it's unset or not installed."""
+        if not self.embedding_model_name or importlib.util.find_spec("sentence_transformers") is None:
+            return None
+        return self.embedding_model_name
+
+    def _embedder(self):
+        if self._embedding_model_in_use() is None:
+            return None
+        if self._embedding_model is None:
+            # Only imported when CONTEXT_EMBEDDING_MODEL is set; it pulls in torch
+            from sentence_transformers import SentenceTransformer
+
+            self._embedding_model = SentenceTransformer(self.embedding_model_name)
+        return self._embedding_model
+
+    def build(self, state):
+        chunks = []
+        for schema in state:
+            with open(self.context_dir / f"{schema}.txt", "r") as f:
+                text = f.read()
+            for i, section in enumerate(chunk_context(text)):
+                chunks.append({"schema": schema, "position": i, "text": section})
+
+        doc_freq = Counter()
+        for chunk in chunks:
+            chunk["tf"] = Counter(tokenize(chunk["text"]))
+            chunk["length"] = sum(chunk["tf"].values())
+            doc_freq.update(chunk["tf"].keys())
+
+        embedder = self._embedder()
+        if embedder is not None and chunks:
+            vectors = embedder.encode([c["text"] for c in chunks], normalize_embeddings=True)
+            for chunk, vector in zip(chunks, vectors):
+                chunk["embedding"] = [float(x) for x in vector]
+
+        avg_length = sum(c["length"] for c in chunks) / len(chunks) if chunks else 0.0
+        return {
+            "files": state,
+            "embedding_model": self.embedding_model_name if embedder else None,
+            "chunks": chunks,
+            "doc_freq": dict(doc_freq),
+            "avg_length": avg_length,
+        }
+
+    def load(self):
+        """Return the index, rebuilding it if the context files changed."""
+        with self.lock:
+            state = self._file_state()
+            if self.index is None and self.path.exists():
+                try:
+                    with open(self.path, "r") as f:
+                        self.index = json.load(f)
+                except (OSError, ValueError):
+                    self.index = None
+            embedding_model = self._embedding_model_in_use()
+            if (
+                self.index is None
+                or self.index["files"] != state
+                or self.index.get("embedding_model") != embedding_model
+            ):
+                self.index = self.build(state)
+                tmp_path = self.path.with_suffix(".tmp")
+                with open(tmp_path, "w") as f:
+                    json.dump(self.index, f)
+                os.replace(tmp_path, self.path)
+            return self.index
+
+    def _bm25(self, index, chunk, query_terms):
+        return bm25_score(
+            query_terms, chunk, index["doc_freq"], len(index["chunks"]), index["avg_length"], self.k1, self.b
+        )
+
+    def search(self, query, schemas=None, top_k=5):
+        """Return the `top_k` sections most relevant to `query`.
+
+        Args:
+            query (str): Free-text query (question and table names).
+            schemas (list, optional): Only search the context of these schemas.
+            top_k (int): Number of sections to return.
+
+        Returns:
+            list: (score, chunk) pairs, best first.
+        """
+        index = self.load()
+        query_terms = tokenize(query)
+        candidates = [
+            c for c in index["chunks"] if schemas is None or c["schema"] in schemas
+        ]
+
+        query_vector = None
+        embedder = self._embedder() if index.get("embedding_model") else None
+        if embedder is not None:
+            query_vector = embedder.encode([query], normalize_embeddings=True)[0]
+
+        scored = []
+        for chunk in candidates:
+            score = self._bm25(index, chunk, query_terms)
+            if query_vector is not None and "embedding" in chunk:
+                score += 5.0 * sum(a * b for a, b in zip(query_vector, chunk["embedding"]))
+            scored.append((score, chunk))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [(score, chunk) for score, chunk in scored[:top_k] if score > 0]
+
+
+_context_index = None
+_context_index_lock = threading.Lock()
+
+
+def get_context_index():
+    """Return the process-wide context index."""
+    global _context_index
+    with _context_index_lock:
+        if _context_index is None:
+            _context_index = ContextIndex()
+        return _context_index
+
+
+def get_relevant_context(tables, question=None, top_k=None):
+    """Return the context sections relevant to confirmed tables and the question.
+
+    The first section of each schema's context file (its overview) is always
+    included; the remaining sections are ranked by BM25 against the question
+    and the table names.
+
+    Args:
+        tables (list): Confirmed tables as schema.table names.
+        question (str, optional): The user's question.
+        top_k (int, optional): Sections to add per call (CONTEXT_TOP_K).
+
+    Returns:
+        str: The selected sections, grouped by schema in file order.
+    """
+    schemas = sorted({table.split(".")[0].strip() for table in tables})
+    table_names = " ".join(table.split(".")[-1] for table in tables if "." in table)
+    return _select_context(schemas, f"{question or ''} {table_names}", top_k)
+
+
+def get_schema_context(schemas, question, top_k=None):
+    """Return the context sections of whole schemas relevant to a question.
+
+    Like get_relevant_context, for when no tables are confirmed yet: the
+    sections are ranked against the question alone.
+
+    Args:
+        schemas (list): Schema names.
+        question (str): The user's question.
+        top_k (int, optional): Sections to add per call (CONTEXT_TOP_K).
+    """
+    return _select_context(sorted({schema.strip() for schema in schemas}), question, top_k)
+
+
+def _select_context(schemas, query, top_k=None):
+    top_k = top_k or int(os.getenv("CONTEXT_TOP_K", "6"))
+    index = get_context_index()
+    selected = {
+        (chunk["schema"], chunk["position"]): chunk
+        for chunk in index.load()["chunks"]
+        if chunk["schema"] in schemas and chunk["position"] == 0
+    }
+    for _, chunk in index.search(query, schemas=schemas, top_k=top_k):
+        selected[(chunk["schema"], chunk["position"])] = chunk
+
+    context = ""
+    for schema in schemas:
+        sections = [
+            selected[key]["text"] for key in sorted(selected) if key[0] == schema
+        ]
+        if sections:
+            context = context + f"\n schema name: '{schema}'\n" + "\n...\n".join(sections)
+    return context
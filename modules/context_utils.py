@@ -1,3 +1,4 @@
+from .context_index import get_schema_context
 
 
 def get_dbexplorer_context_toolkit():
@@ -16,7 +17,14 @@ def get_dbassistant_context_toolkit():
     }
 
 
-def get_context_for_schemata(schemata: list[str]):
+def get_context_for_schemata(schemata: list[str], question: str = None):
+    """Returns the context files of the given schemata.
+
+    If a question is given, only the overview and the sections of the context files relevant to it are returned.
+    """
+    if question:
+        return get_schema_context(schemata, question)
+
     context = ""
     for schema in schemata:
         # read the schema context from context_files
@@ -1,6 +1,51 @@
-from modules.base_assistant import client, BaseAssistant
-from modules.db_assistant import DbAssistantEventHandler
+import uuid
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from modules.base_assistant import BaseAssistant, run_blocking
+from modules.openai_client import get_client, get_async_client
+from modules.catalog_cache import warm_up_catalog
+from modules.db_assistant import DbAssistantEventHandler, AsyncDbAssistantEventHandler
 from modules.db_thread import DbThread
+from modules.session_store import get_session_store
+from modules.query_memory import get_query_memory
+from modules.tracing import span, print_summary
+
+
+def expire_sessions(keep=None):
+    """Delete expired sessions and their threads (run during warm-up).
+
+    Args:
+        keep (str, optional): Session id that is never expired, e.g. the one
+            being resumed.
+    """
+    store = get_session_store()
+    if store is None:
+        return
+    try:
+        store.cleanup(get_client(), keep=keep)
+    except Exception as e:
+        print(f"Session cleanup failed: {e}", flush=True)
+
+
+def run_options(thread, message):
+    """Extra run parameters: tables and SQL of similar earlier questions, if any."""
+    memory = get_query_memory()
+    if memory is None:
+        return {}
+    with span("memory_lookup") as lookup_span:
+        hints = memory.suggest(message, confirmed=[table.strip() for table in thread.tables])
+        lookup_span.set(matched=hints is not None)
+    return {"additional_instructions": hints} if hints else {}
+
+
+def _attach_session(conversation):
+    # A resumed thread brings its session id; a new one gets a fresh id that
+    # also groups the trace spans of the conversation.
+    thread = conversation.thread
+    conversation.session_id = thread.session_id or uuid.uuid4().hex[:12]
+    thread.session_id = conversation.session_id
+    thread.assistant_name = thread.assistant_name or conversation.assistant.name
 
 
 class Converse:
@@ -8,32 +53,152 @@ class Converse:
     def __init__(self, assistant, thread):
         self.assistant = assistant
         self.thread = thread
+        _attach_session(self)
 
     
     def init_conversation(self):
         print("Hello, I'm your data analyst. How can I help you?", flush=True)
-        self.assistant.create_assistant()
+        self.warm_up()
+        if self.thread.tables:
+            print(f"Resumed session {self.session_id} with tables: {', '.join(self.thread.tables)}", flush=True)
         self.continue_conversation()
 
+    def warm_up(self):
+        """Reuse or create the assistant, create the thread and open the database
+        pool concurrently.
+
+        Each of these is a network round trip; run serially they add up
+        before the first prompt.
+        """
+        # The session being resumed may itself be past SESSION_MAX_AGE_DAYS
+        tasks = [warm_up_catalog, lambda: expire_sessions(keep=self.session_id)]
+        if self.assistant.id is None:
+            tasks.append(self.assistant.get_or_create_assistant)
+        if self.thread.thread_id is None:
+            tasks.append(self.thread.create_db_thread)
+        elif self.thread.thread_obj is None:
+            tasks.append(self.thread.resume_db_thread)
+        with span("startup", session=self.session_id, kind="warm_up"):
+            with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, task) for task in tasks
+                ]
+                for future in futures:
+                    future.result()
+
     
+    def ask(self, message):
+        """Send a user message and run the assistant until it's done.
+
+        Args:
+            message (str): The user's message.
+        """
+        self.thread.last_question = message
+        self.thread.title = self.thread.title or message[:80]
+        self.thread.token_budget.start_run()
+        with span("run", session=self.session_id, question_chars=len(message)):
+            get_client().beta.threads.messages.create(
+                thread_id=self.thread.thread_id, role="user", content=message
+            )
+
+            dbeh = DbAssistantEventHandler(
+                tool_dict=self.assistant.tools, name=self.assistant.name, thread_obj=self.thread
+            )
+
+            with get_client().beta.threads.runs.stream(
+                thread_id=self.thread.thread_id,
+                assistant_id=self.assistant.id,
+                event_handler=dbeh,
+                **run_options(self.thread, message),
+            ) as stream:
+                stream.until_done()
+        self.thread.save_session()
+
+        report = self.thread.token_budget.report()
+        print(f"\n[tokens] tool outputs this run: {report['run_tokens']} of {report['run_budget']}")
+
     def continue_conversation(self):
         while True:
             message = input("\n You: ")
             if message == "exit":
+                print_summary(self.session_id)
                 break
-            
-            client.beta.threads.messages.create(
+
+            try:
+                self.ask(message)
+            except Exception as e:
+                print(f"\nError: {e}", flush=True)
+
+
+class AsyncConverse:
+    """Async conversation with the assistant.
+
+    Many AsyncConverse instances can share one event loop; each keeps its own
+    AsyncDbThread, while the assistant can be shared between them.
+    """
+    def __init__(self, assistant, thread, echo=True):
+        self.assistant = assistant
+        self.thread = thread
+        self.echo = echo
+        _attach_session(self)
+
+    async def init_conversation(self):
+        """Reuse or create the assistant and create the thread if they don't
+        exist yet, and open the database pool, all concurrently."""
+        tasks = [run_blocking(warm_up_catalog)]
+        if self.assistant.id is None:
+            tasks.append(self.assistant.get_or_create_assistant_async())
+        if self.thread.thread_id is None:
+            tasks.append(self.thread.create_db_thread())
+        elif self.thread.thread_obj is None:
+            tasks.append(self.thread.resume_db_thread())
+        with span("startup", session=self.session_id, kind="warm_up"):
+            await asyncio.gather(*tasks)
+
+    async def ask(self, message):
+        """Send a user message and run the assistant until it's done.
+
+        Args:
+            message (str): The user's message.
+
+        Returns:
+            str: The text the assistant produced during the run.
+        """
+        self.thread.last_question = message
+        self.thread.title = self.thread.title or message[:80]
+        self.thread.token_budget.start_run()
+        transcript = []
+        with span("run", session=self.session_id, question_chars=len(message)):
+            await get_async_client().beta.threads.messages.create(
                 thread_id=self.thread.thread_id, role="user", content=message
             )
 
-            dbeh = DbAssistantEventHandler(
-                tool_dict=self.assistant.tools, name=self.assistant.name, thread_obj=self.thread
+            dbeh = AsyncDbAssistantEventHandler(
+                tool_dict=self.assistant.tools,
+                name=self.assistant.name,
+                thread_obj=self.thread,
+                transcript=transcript,
+                echo=self.echo,
             )
-
-            with client.beta.threads.runs.stream(
+            async with get_async_client().beta.threads.runs.stream(
                 thread_id=self.thread.thread_id,
                 assistant_id=self.assistant.id,
                 event_handler=dbeh,
+                **run_options(self.thread, message),
             ) as stream:
-                stream.until_done()
-    
+                await stream.until_done()
+        self.thread.save_session()
+        if self.echo:
+            report = self.thread.token_budget.report()
+            print(f"\n[tokens] tool outputs this run: {report['run_tokens']} of {report['run_budget']}")
+        return "".join(transcript)
+
+    async def continue_conversation(self):
+        """Interactive loop that reads user input without blocking the event loop."""
+        print("Hello, I'm your data analyst. How can I help you?", flush=True)
+        while True:
+            message = await asyncio.to_thread(input, "\n You: ")
+            if message == "exit":
+                print_summary(self.session_id)
+                break
+            await self.ask(message)
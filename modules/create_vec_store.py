@@ -1,10 +1,5 @@
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
-
-load_dotenv()
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from .openai_client import get_client
 
 
 def create_vec_store_from_folder(folder_path):
@@ -15,7 +10,7 @@ def create_vec_store_from_folder(folder_path):
     files = os.listdir(folder_path)
 
     # Create a vector store
-    vec_store = client.beta.vector_stores.create(
+    vec_store = get_client().beta.vector_stores.create(
         name="My Vector Store",
         files=files,
         metadata=[{"file_name": file} for file in files],
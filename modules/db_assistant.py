@@ -1,130 +1,227 @@
+import os
 import json
-from .base_assistant import BaseAssistantEventHandler, client
+from pathlib import Path
+from .base_assistant import (
+    BaseAssistantEventHandler,
+    AsyncBaseAssistantEventHandler,
+    run_blocking,
+    tool_call_abandoned,
+)
 from .db_thread import DbThread
 from typing_extensions import override
 from .db_tools import *
 from .llm_utils import *
-import pandas as pd
+from .result_cache import get_result_cache
+from .tracing import span
+from .openai_client import get_client, get_async_client
+
+
+def invoke_db_tool_call(thread_obj, toolkit, tool):
+    """Invoke the function a tool call refers to through the thread.
+
+    Args:
+        thread_obj (DbThread): The thread the tool call belongs to.
+        toolkit (dict): Dictionary of tools available to the assistant.
+        tool: The tool call object.
+
+    Returns:
+        str or tuple: The encoded tool output, or (result_path, message) for a
+            fetch_data_from_db result that still has to be uploaded.
+    """
+    function_name = tool.function.name
+    function_args = tool.function.arguments
+
+    if function_name not in toolkit.keys():
+        return encode_func_call_result(f"Error: Tool {function_name} not found")
+
+    with span("tool_call", tool=function_name) as tool_span:
+        try:
+            result = thread_obj.invoke_function(toolkit[function_name], function_args)
+        except Exception as e:
+            tool_span.set(tool_error=str(e))
+            return encode_func_call_result(f"Error: {str(e)}")
+
+        if function_name == "fetch_data_from_db":
+            if isinstance(result, str):
+                # "No data found" or an error message from the tool
+                tool_span.set(output_chars=len(result))
+                return encode_func_call_result(result)
+            return result
+
+        output = encode_func_call_result(result, function_name)
+        tool_span.set(output_chars=len(output))
+        return output
+
+
+def invoke_db_tool_call_once(thread_obj, toolkit, tool):
+    """invoke_db_tool_call, dropping the result file if the call timed out meanwhile.
+
+    Nobody uploads the file of a call already reported as timed out, so it
+    is deleted unless it belongs to the result cache.
+    """
+    result = invoke_db_tool_call(thread_obj, toolkit, tool)
+    if isinstance(result, tuple) and tool_call_abandoned():
+        result_path = result[0]
+        if not get_result_cache().owns(result_path) and os.path.exists(result_path):
+            os.remove(result_path)
+        return encode_func_call_result("Error: Tool call timed out")
+    return result
+
+
+def attached_file_outputs(pending_files, detached=None, error=None):
+    """Build the tool outputs of fetch_data_from_db calls once their files are attached.
+
+    Args:
+        pending_files (list): (tool_call_id, file_id, message) tuples.
+        detached (list, optional): File ids detached from the thread to make room.
+        error (Exception, optional): Error raised while attaching the files.
+
+    Returns:
+        list: Tool outputs for the fetch_data_from_db calls in the batch.
+    """
+    if error is not None:
+        return [
+            {
+                "tool_call_id": tool_call_id,
+                "output": encode_func_call_result(f"Error: {str(error)}"),
+            }
+            for tool_call_id, _, _ in pending_files
+        ]
+
+    note = ""
+    if detached:
+        note = (
+            f" The older result files {', '.join(detached)} were detached "
+            "from the thread and can no longer be read."
+        )
+    return [
+        {
+            "tool_call_id": tool_call_id,
+            "output": encode_func_call_result(
+                f"{msg}. The results are stored in the file {file_id}. "
+                f"Please use code to access the file.{note}"
+            ),
+        }
+        for tool_call_id, file_id, msg in pending_files
+    ]
+
+
+def merge_tool_outputs(tool_calls, results, file_outputs):
+    """Combine plain tool outputs with the outputs of attached result files, in call order."""
+    attached = {output["tool_call_id"]: output for output in file_outputs}
+    return [
+        attached[tool.id]
+        if tool.id in attached
+        else {"tool_call_id": tool.id, "output": result}
+        for tool, result in zip(tool_calls, results)
+    ]
 
 
 class DbAssistantEventHandler(BaseAssistantEventHandler):
     def __init__(self, tool_dict, name, thread_obj):
-        super().__init__(tool_dict, name)
+        super().__init__(tool_dict, name, thread_obj.token_budget)
         self.name = name
         self.toolkit = tool_dict
         self.thread_obj = thread_obj
 
     @override
     def handle_requires_action(self, data, run_id):
-        tool_outputs = []
-        toolkit = self.toolkit
-        for tool in data.required_action.submit_tool_outputs.tool_calls:
-            function_name = tool.function.name
-            function_args = tool.function.arguments
-
-            if function_name in toolkit.keys():
-                try:
-                    result = self.thread_obj.invoke_function(
-                        toolkit[function_name], function_args
-                    )
-
-                    if function_name == "fetch_data_from_db":
-                        
-                        try:
-                            data, msg = result
-                            # Check if data is a DataFrame and convert it to CSV for file creation
-                            if isinstance(data, pd.DataFrame):
-                                try:
-                                    temp_file = data.to_csv("temp.csv", index=False)
-                                    file = client.files.create(
-                                        file=open("temp.csv", "rb"),
-                                        purpose="assistants",
-                                    )
-                                    print(
-                                        f"File uploaded successfully. File ID: {file.id}"
-                                    )
-                                except FileNotFoundError:
-                                    print(
-                                        f"Error: File not found at path '{temp_file}'"
-                                    )
-                                except Exception as e:
-                                    print(f"API Error: {str(e)}")
-
-                                current_thread = client.beta.threads.retrieve(
-                                    thread_id=self.current_run.thread_id
-                                )
-                                curr_thread_resources = (
-                                    current_thread.tool_resources.code_interpreter.file_ids
-                                )
-                                curr_thread_resources = curr_thread_resources + [
-                                    file.id
-                                ]
-                                client.beta.threads.update(
-                                    thread_id=self.current_run.thread_id,
-                                    tool_resources={
-                                        "code_interpreter": {
-                                            "file_ids": curr_thread_resources
-                                        }
-                                    },
-                                )
-                            msg = f"Query ran successfully. The results are stored in the file {file.id}. Please use code to access the file."
-                            tool_outputs.append(
-                                {
-                                    "tool_call_id": tool.id,
-                                    "output": encode_func_call_result(msg),
-                                }
-                            )
-                        except Exception as e:
-                            tool_outputs.append(
-                                {
-                                    "tool_call_id": tool.id,
-                                    "output": encode_func_call_result(
-                                        f"Error: {str(e)}"
-                                    ),
-                                }
-                            )
-                    else:
-                        try:
-                            serialized = json.dumps(result)
-                            tool_outputs.append(
-                                {
-                                    "tool_call_id": tool.id,
-                                    "output": encode_func_call_result(result),
-                                }
-                            )
-                        except TypeError:
-                            tool_outputs.append(
-                                {
-                                    "tool_call_id": tool.id,
-                                    "output": encode_func_call_result(str(result)),
-                                }
-                            )
-                except Exception as e:
-                    tool_outputs.append(
-                        {
-                            "tool_call_id": tool.id,
-                            "output": encode_func_call_result(f"Error: {str(e)}"),
-                        }
-                    )
-            else:
-                tool_outputs.append(
-                    {
-                        "tool_call_id": tool.id,
-                        "output": encode_func_call_result(
-                            f"Error: Tool {function_name} not found"
-                        ),
-                    }
-                )
+        tool_calls = data.required_action.submit_tool_outputs.tool_calls
+        results = self.run_tool_calls(tool_calls)
 
+        # Result files of this batch, attached to the thread in one update
+        pending_files = [
+            (tool.id, result[0], result[1])
+            for tool, result in zip(tool_calls, results)
+            if isinstance(result, tuple)
+        ]
+        tool_outputs = merge_tool_outputs(
+            tool_calls, results, self.attach_result_files(pending_files)
+        )
+        tool_outputs = self.budget.apply_outputs(tool_calls, tool_outputs)
         self.submit_tool_outputs(tool_outputs, run_id)
 
+    @override
+    def run_tool_call(self, tool):
+        """Run a single tool call through the thread.
+
+        Args:
+            tool: The tool call object.
+
+        Returns:
+            str or tuple: The encoded tool output, or (file_id, message) for a
+                fetch_data_from_db result that still has to be attached to the thread.
+        """
+        result = invoke_db_tool_call_once(self.thread_obj, self.toolkit, tool)
+        if isinstance(result, tuple):
+            try:
+                result_path, msg = result
+                return self.upload_result_file(result_path), msg
+            except Exception as e:
+                return encode_func_call_result(f"Error: {str(e)}")
+        return result
+
+    def upload_result_file(self, result_path):
+        """Upload a result file, reusing the file id of an unchanged cached result.
+
+        Args:
+            result_path (str): Path of the result file written by fetch_data_from_db.
+
+        Returns:
+            str: The OpenAI file id of the result.
+        """
+        result_cache = get_result_cache()
+        file_id = result_cache.get_file_id(result_path)
+        if file_id is not None:
+            print(f"Reusing uploaded file. File ID: {file_id}")
+            return file_id
+
+        try:
+            with span("upload", bytes=os.path.getsize(result_path)), open(result_path, "rb") as f:
+                file = get_client().files.create(
+                    file=f,
+                    purpose="assistants",
+                )
+            print(f"File uploaded successfully. File ID: {file.id}")
+        except FileNotFoundError:
+            print(f"Error: File not found at path '{result_path}'")
+            raise
+        except Exception as e:
+            print(f"API Error: {str(e)}")
+            raise
+        finally:
+            # Cached result files are kept for reuse
+            if not result_cache.owns(result_path) and os.path.exists(result_path):
+                os.remove(result_path)
+        result_cache.set_file_id(result_path, file.id)
+        return file.id
+
+    def attach_result_files(self, pending_files):
+        """Attach all result files of a batch to the thread with a single update.
+
+        Args:
+            pending_files (list): (tool_call_id, file_id, message) tuples.
+
+        Returns:
+            list: Tool outputs for the fetch_data_from_db calls in the batch.
+        """
+        if not pending_files:
+            return []
+        try:
+            detached = self.thread_obj.attach_files(
+                [file_id for _, file_id, _ in pending_files]
+            )
+        except Exception as e:
+            return attached_file_outputs(pending_files, error=e)
+        return attached_file_outputs(pending_files, detached)
+
     @override
     def submit_tool_outputs(self, tool_outputs, run_id):
         curr_event_handler = DbAssistantEventHandler(
             self.toolkit, self.name, self.thread_obj
         )
-        try:
-            with client.beta.threads.runs.submit_tool_outputs_stream(
+        with span("submit_tool_outputs", outputs=len(tool_outputs)):
+            with get_client().beta.threads.runs.submit_tool_outputs_stream(
                 thread_id=self.current_run.thread_id,
                 run_id=self.current_run.id,
                 tool_outputs=tool_outputs,
@@ -132,5 +229,78 @@ class DbAssistantEventHandler(BaseAssistantEventHandler):
             ) as stream:
                 stream.until_done()
                 print()
-        except Exception as e:
-            pass
+
+
+class AsyncDbAssistantEventHandler(AsyncBaseAssistantEventHandler):
+    """Async counterpart of DbAssistantEventHandler for an AsyncDbThread."""
+
+    def __init__(self, tool_dict, name, thread_obj, transcript=None, echo=True):
+        super().__init__(tool_dict, name, transcript, echo, thread_obj.token_budget)
+        self.thread_obj = thread_obj
+
+    @override
+    def new_handler(self):
+        return AsyncDbAssistantEventHandler(
+            self.toolkit, self.name, self.thread_obj, self.transcript, self.echo
+        )
+
+    @override
+    async def handle_requires_action(self, data, run_id):
+        tool_calls = data.required_action.submit_tool_outputs.tool_calls
+        results = await self.run_tool_calls(tool_calls)
+
+        pending_files = [
+            (tool.id, result[0], result[1])
+            for tool, result in zip(tool_calls, results)
+            if isinstance(result, tuple)
+        ]
+        file_outputs = []
+        if pending_files:
+            try:
+                detached = await self.thread_obj.attach_files(
+                    [file_id for _, file_id, _ in pending_files]
+                )
+                file_outputs = attached_file_outputs(pending_files, detached)
+            except Exception as e:
+                file_outputs = attached_file_outputs(pending_files, error=e)
+
+        tool_outputs = merge_tool_outputs(tool_calls, results, file_outputs)
+        tool_outputs = self.budget.apply_outputs(tool_calls, tool_outputs)
+        await self.submit_tool_outputs(tool_outputs, run_id)
+
+    @override
+    async def run_tool_call(self, tool):
+        """Run a tool call on the shared tool executor and upload its result file.
+
+        Returns:
+            str or tuple: The encoded tool output, or (file_id, message).
+        """
+        result = await run_blocking(
+            invoke_db_tool_call_once, self.thread_obj, self.toolkit, tool
+        )
+        if isinstance(result, tuple):
+            try:
+                result_path, msg = result
+                return await self.upload_result_file(result_path), msg
+            except Exception as e:
+                return encode_func_call_result(f"Error: {str(e)}")
+        return result
+
+    async def upload_result_file(self, result_path):
+        """Upload a result file with the async client, reusing cached file ids."""
+        result_cache = get_result_cache()
+        file_id = result_cache.get_file_id(result_path)
+        if file_id is not None:
+            return file_id
+
+        try:
+            with span("upload", bytes=os.path.getsize(result_path)):
+                file = await get_async_client().files.create(
+                    file=Path(result_path),
+                    purpose="assistants",
+                )
+        finally:
+            if not result_cache.owns(result_path) and os.path.exists(result_path):
+                os.remove(result_path)
+        result_cache.set_file_id(result_path, file.id)
+        return file.id
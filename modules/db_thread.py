@@ -1,15 +1,18 @@
 import os
-from openai import OpenAI
+import asyncio
+import threading
 import json
-import pandas as pd
-from dotenv import load_dotenv
 from .context_utils import get_context_for_schemata
-from .db_tools import confirm_add_tables
-
-
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=openai_api_key)
+from .context_index import get_relevant_context
+from .approval import request_table_approval, parse_table_names
+from .llm_utils import parse_tool_args
+from .token_budget import TokenBudget, count_tokens
+from .tracing import span, current_span
+from .openai_client import get_client, get_async_client
+from .session_store import get_session_store, context_version
+from .query_memory import get_query_memory
+from .base_assistant import tool_call_abandoned
+from openai import NotFoundError
 
 
 class DbThread:
@@ -18,17 +21,165 @@ class DbThread:
         self.thread_id = None
         self.thread_obj = None
         self.tables = []
+        # The user message the current run answers, used by the approval policy
+        self.last_question = None
+        # Code interpreter files attached to the thread, oldest first
+        self.file_ids = []
+        self.max_files = int(os.getenv("THREAD_MAX_FILES", "20"))
+        self.files_lock = threading.Lock()
+        # Tokens the tool outputs of the current run add to the thread
+        self.token_budget = TokenBudget()
+        # Set by Converse; the session is persisted so it can be resumed
+        self.session_id = None
+        self.assistant_name = None
+        self.title = None
+        # Version of the context file each schema's context was injected from
+        self.context_versions = {}
 
     def create_db_thread(self):
-        self.thread_obj = client.beta.threads.create()
+        self.thread_obj = get_client().beta.threads.create()
         self.thread_id = self.thread_obj.id
+        self.save_session()
         return self.thread_obj
 
     def add_tables_to_thread(self, tables):
         print(f"Adding table: {tables} to thread")
         self.tables = self.tables + tables
+        for schema in {table.split(".")[0].strip() for table in tables}:
+            self.context_versions[schema] = context_version(schema)
+        self.save_session()
         return
 
+    def save_session(self):
+        """Persist the thread id, tables, context versions and files of the session."""
+        store = get_session_store()
+        if store is None or self.session_id is None or self.thread_id is None:
+            return
+        store.save(
+            self.session_id,
+            self.assistant_name,
+            self.thread_id,
+            self.tables,
+            self.context_versions,
+            self.file_ids,
+            title=self.title,
+        )
+
+    def load_session(self, session):
+        """Restore the state of a stored session (see SessionStore.get)."""
+        self.session_id = session["session_id"]
+        self.assistant_name = session["assistant_name"]
+        self.title = session["title"]
+        self.thread_id = session["thread_id"]
+        self.tables = session["tables"]
+        self.context_versions = session["context_versions"]
+        self.file_ids = session["file_ids"]
+
+    def resume_message(self):
+        """Return the message that brings a resumed thread up to date, or None.
+
+        Re-injects the context of schemas whose context file changed since it
+        was injected, so the confirmed tables don't have to be rediscovered.
+        """
+        changed = [
+            table
+            for table in self.tables
+            if self.context_versions.get(table.split(".")[0].strip())
+            != context_version(table.split(".")[0].strip())
+        ]
+        if not changed:
+            return None
+        for schema in {table.split(".")[0].strip() for table in changed}:
+            self.context_versions[schema] = context_version(schema)
+        return self.seed_message(changed, "The schema context of these confirmed tables was updated")
+
+    def seed_message(self, tables, reason):
+        context = self.get_table_context(tables)
+        return f"{reason}: {', '.join(tables)}. Use them without asking for confirmation again.{context}"
+
+    def resume_db_thread(self):
+        """Reattach to the stored thread instead of creating one.
+
+        If the thread no longer exists a new one is created and seeded with
+        the confirmed tables and their context.
+        """
+        try:
+            self.thread_obj = get_client().beta.threads.retrieve(self.thread_id)
+            message = self.resume_message()
+        except NotFoundError:
+            self.thread_obj = get_client().beta.threads.create()
+            self.thread_id = self.thread_obj.id
+            self.file_ids = []
+            message = self.seed_message(self.tables, "Tables confirmed earlier in this session") if self.tables else None
+        if message:
+            get_client().beta.threads.messages.create(
+                thread_id=self.thread_id, role="user", content=message
+            )
+        self.save_session()
+        return self.thread_obj
+
+    def plan_attachment(self, file_ids):
+        """Work out the attachment list after adding `file_ids`.
+
+        Returns:
+            tuple: (file ids to attach, file ids detached to stay within
+                THREAD_MAX_FILES), or (None, []) if nothing changes.
+        """
+        new_ids = [
+            file_id
+            for i, file_id in enumerate(file_ids)
+            if file_id not in self.file_ids and file_id not in file_ids[:i]
+        ]
+        if not new_ids:
+            return None, []
+        attached = self.file_ids + new_ids
+        detached = attached[: max(len(attached) - self.max_files, 0)]
+        return attached[len(detached):], detached
+
+    def attach_files(self, file_ids):
+        """Attach files to the thread's code interpreter in a single update.
+
+        The attachment list is tracked locally, so the thread doesn't have to be
+        retrieved first. Once more than THREAD_MAX_FILES files are attached, the
+        oldest ones are detached.
+
+        Args:
+            file_ids (list): OpenAI file ids to attach.
+
+        Returns:
+            list: File ids that were detached to stay within the limit.
+        """
+        with self.files_lock:
+            attached, detached = self.plan_attachment(file_ids)
+            if attached is None:
+                return []
+            with span("thread_update", files=len(attached), detached=len(detached)):
+                get_client().beta.threads.update(
+                    thread_id=self.thread_id,
+                    tool_resources={"code_interpreter": {"file_ids": attached}},
+                )
+            self.file_ids = attached
+            self.save_session()
+            return detached
+
+    def get_table_context(self, tables):
+        """Return the schema context to inject for newly confirmed tables.
+
+        With CONTEXT_RETRIEVAL=index (the default) only the sections relevant
+        to the tables and the current question are injected; "full" injects
+        the whole context file of every schema involved.
+        """
+        schemas = list(dict.fromkeys(table.split(".")[0].strip() for table in tables))
+        if os.getenv("CONTEXT_RETRIEVAL", "index").strip().lower() == "full":
+            context = get_context_for_schemata(schemas)
+        else:
+            context = get_relevant_context(tables, self.last_question)
+            context = context or get_context_for_schemata(schemas)
+        tool_span = current_span("tool_call")
+        if tool_span is not None:
+            tool_span.set(context_tokens=count_tokens(context), context_schemas=", ".join(schemas))
+        return context
+
     def invoke_function(self, func, args):
         """Invoke a function and return the result as a JSON string.
         Args:
@@ -36,16 +187,95 @@ class DbThread:
             args: Arguments to pass to the function
         """
         print(f"Invoking function: {func.__name__} with args: {args}")
-        args_dict = json.loads(args)
+        args_dict = parse_tool_args(func, args)
         if func.__name__ == "confirm_add_tables":
-            rsp, tables = confirm_add_tables(**args_dict)
+            requested = parse_table_names(args_dict["table_names"])
+            confirmed = {table.strip() for table in self.tables}
+            # Tables confirmed earlier in the session (possibly before a restart)
+            if requested and all(table in confirmed for table in requested):
+                return "tables already added to this conversation"
+            rsp, tables = request_table_approval(
+                args_dict["table_names"], question=self.last_question
+            )
             if rsp == "success" or rsp == "modified":
                 print(f"Adding tables: {tables.split(',')} to thread")
                 self.add_tables_to_thread(tables.split(","))
-                context = get_context_for_schemata([table.split(".")[0] for table in tables.split(",")])
+                self.remember(tables=parse_table_names(tables))
+                context = self.get_table_context(tables.split(","))
                 return "tables successfully added" + context
             else:
                 return tables
         else:
-            return func(**args_dict)
+            result = func(**args_dict)
+            # A tuple is a result file, i.e. the query ran and returned rows
+            if func.__name__ == "fetch_data_from_db" and isinstance(result, tuple):
+                self.remember(
+                    query=args_dict["query"],
+                    tables=[f"{args_dict['schema']}.{args_dict['table_name']}"],
+                )
+            return result
+
+    def remember(self, tables, query=None):
+        """Record approved tables or a successful query for the current question."""
+        memory = get_query_memory()
+        # The model was told the call timed out, so it didn't see this result
+        if memory is None or tool_call_abandoned():
+            return
+        try:
+            if query is None:
+                memory.record_tables(self.last_question, tables)
+            else:
+                memory.record_query(self.last_question, query, tables)
+        except OSError as e:
+            print(f"Could not update the query memory: {e}", flush=True)
+
+
+
+class AsyncDbThread(DbThread):
+    """DbThread whose API calls use the async client.
+
+    Tool functions are still invoked synchronously through `invoke_function`;
+    the async event handler runs them on the shared tool executor.
+    """
+
+    def __init__(self, tool_resources):
+        super().__init__(tool_resources)
+        self.async_files_lock = asyncio.Lock()
+
+    async def create_db_thread(self):
+        self.thread_obj = await get_async_client().beta.threads.create()
+        self.thread_id = self.thread_obj.id
+        self.save_session()
+        return self.thread_obj
+
+    async def resume_db_thread(self):
+        """Async version of DbThread.resume_db_thread."""
+        try:
+            self.thread_obj = await get_async_client().beta.threads.retrieve(self.thread_id)
+            message = self.resume_message()
+        except NotFoundError:
+            self.thread_obj = await get_async_client().beta.threads.create()
+            self.thread_id = self.thread_obj.id
+            self.file_ids = []
+            message = self.seed_message(self.tables, "Tables confirmed earlier in this session") if self.tables else None
+        if message:
+            await get_async_client().beta.threads.messages.create(
+                thread_id=self.thread_id, role="user", content=message
+            )
+        self.save_session()
+        return self.thread_obj
 
+    async def attach_files(self, file_ids):
+        """Async version of DbThread.attach_files."""
+        async with self.async_files_lock:
+            attached, detached = self.plan_attachment(file_ids)
+            if attached is None:
+                return []
+            with span("thread_update", files=len(attached), detached=len(detached)):
+                await get_async_client().beta.threads.update(
+                    thread_id=self.thread_id,
+                    tool_resources={"code_interpreter": {"file_ids": attached}},
+                )
+            self.file_ids = attached
+            self.save_session()
+            return detached
@@ -1,37 +1,55 @@
-from sqlalchemy import text
-import pandas as pd
-import json
-from .db_utils import get_engine
-from .comms import get_user_approval
+import os
+from .db_utils import get_engine, get_fetch_settings, stream_query_to_file
+from .result_files import ResultWriter, write_result_file, get_result_format
+from .result_cache import get_result_cache, get_freshness_token
+from .catalog_cache import get_catalog_cache
+from .approval import request_table_approval
+from .token_budget import get_tool_output_page
+from .tracing import span
 
 __all__ = [
     "fetch_data_from_db",
     "get_all_schemata",
+    "list_schemas",
+    "list_tables",
+    "list_table_columns",
     "get_table_columns_fks",
+    "get_tables_metadata",
+    "get_table_stats",
     "get_db_toolkit",
     "confirm_add_tables",
+    "get_tool_output_page",
 ]
 
 
 def get_db_toolkit():
     return {
-        "get_all_schemata": get_all_schemata,
+        "list_schemas": list_schemas,
+        "list_tables": list_tables,
+        "list_table_columns": list_table_columns,
         "get_table_columns_fks": get_table_columns_fks,
+        "get_tables_metadata": get_tables_metadata,
+        "get_table_stats": get_table_stats,
         "fetch_data_from_db": fetch_data_from_db,
         "confirm_add_tables": confirm_add_tables,
+        "get_tool_output_page": get_tool_output_page,
     }
 
 
-def fetch_data_from_db(query: str, table_name: str, schema: str):
-    """Executes a SQL query and returns the results as JSON.
+def fetch_data_from_db(query: str, table_name: str, schema: str, use_cache: bool = True):
+    """Executes a SQL query and stores the results in a file.
+
+    Large results are cut off at a row/byte limit; the returned message says so when that happens.
+    Identical queries on unchanged data are answered from a local result cache.
 
     Args:
         query (str): The SQL query to execute
         table_name (str): Name of the table being queried
         schema (str): Database schema name
+        use_cache (bool): Set to false to re-run the query even if a cached result exists
 
     Returns:
-        tuple: (JSON string of results, status message) or error message string
+        tuple: (path of the result file, status message) or error message string
 
     Raises:
         Exception: If database connection fails or query execution fails
@@ -41,26 +59,180 @@ def fetch_data_from_db(query: str, table_name: str, schema: str):
         return "Error: Unable to connect to the database"
 
     try:
-        # Clean up the query and ensure it's a proper SELECT
-        df = pd.read_sql(text(query), engine)
-        if df.empty:
-            return "No data found"
+        cache = get_result_cache()
+        key = None
+        if cache.enabled and use_cache:
+            with engine.connect() as conn:
+                token = get_freshness_token(conn, table_name, schema)
+            key = cache.make_key(
+                query,
+                token,
+                engine.url.render_as_string(hide_password=True),
+                _cache_fetch_settings(),
+            )
+            entry = cache.get(key)
+            if entry is not None:
+                return entry["path"], entry["msg"] + " (cached result)"
         else:
-            # Convert DataFrame to JSON string to make it serializable
-            return df, "Data fetched successfully"
+            cache.record_bypass()
+
+        result = _run_query_to_file(engine, query)
+        if isinstance(result, str) or key is None:
+            return result
+        path, msg = result
+        return cache.put(key, path, msg), msg
 
     except Exception as e:
         return f"Error: {e}"
 
 
-def get_all_schemata():
-    """Retrieves all table names from a specified schema.
+def _cache_fetch_settings():
+    """The fetch settings that change what a query's result file holds."""
+    settings = get_fetch_settings()
+    # The row and byte caps only apply to streamed results
+    return {
+        "stream": settings["stream"],
+        "max_rows": settings["max_rows"] if settings["stream"] else None,
+        "max_bytes": settings["max_bytes"] if settings["stream"] else None,
+        "format": get_result_format(),
+    }
 
-    Args:
-        schema (str): Name of the database schema
+
+def _run_query_to_file(engine, query):
+    """Run `query` and write its result to a new result file.
+
+    Returns:
+        tuple: (path of the result file, status message) or "No data found"
+    """
+    settings = get_fetch_settings()
+    if not settings["stream"]:
+        import pandas as pd
+        from sqlalchemy import text
+
+        with span("sql", kind="fetch", streaming=False) as sql_span:
+            df = pd.read_sql(text(query), engine)
+            sql_span.set(rows=len(df))
+        if df.empty:
+            return "No data found"
+        with span("result_write") as write_span:
+            writer = write_result_file(df)
+            write_span.set(
+                format=writer.format, rows=writer.rows, bytes=os.path.getsize(writer.path)
+            )
+        return writer.path, (
+            f"Data fetched successfully ({writer.rows} rows, {writer.format} "
+            f"format, read it with {writer.read_hint()})"
+        )
+
+    writer = ResultWriter()
+    try:
+        with span("sql", kind="fetch", streaming=True, format=writer.format) as sql_span:
+            stats = stream_query_to_file(
+                engine,
+                query,
+                writer,
+                chunk_rows=settings["chunk_rows"],
+                max_rows=settings["max_rows"],
+                max_bytes=settings["max_bytes"],
+            )
+            sql_span.set(
+                rows=stats["rows"],
+                bytes=stats["bytes"],
+                truncated=stats["truncated"],
+                write_ms=round(stats["write_seconds"] * 1000, 1),
+            )
+    except Exception:
+        writer.discard()
+        raise
+    if stats["rows"] == 0:
+        writer.discard()
+        return "No data found"
+    msg = (
+        f"Data fetched successfully ({stats['rows']} rows, {writer.format} "
+        f"format, read it with {writer.read_hint()})"
+    )
+    if stats["truncated"] == "rows":
+        msg += (
+            f". The result was truncated to the first {stats['rows']} rows "
+            f"(limit: {settings['max_rows']} rows). Aggregate or filter in SQL "
+            "if you need the full result."
+        )
+    elif stats["truncated"] == "bytes":
+        msg += (
+            f". The result was truncated after {stats['bytes']} bytes "
+            f"(limit: {settings['max_bytes']} bytes). Select fewer columns or "
+            "aggregate in SQL if you need the full result."
+        )
+    return writer.path, msg
+
+
+def _uses_catalog_snapshot(engine):
+    """The pg_catalog snapshot only exists for PostgreSQL databases."""
+    return engine.dialect.name == "postgresql"
+
+
+def _inspect_table(inspector, schema, table_name, kind):
+    """Describe one table with the SQLAlchemy inspector, in the snapshot's shape."""
+    try:
+        description = inspector.get_table_comment(table_name, schema=schema).get("text")
+    except NotImplementedError:
+        description = None
+    foreign_keys = []
+    for fk in inspector.get_foreign_keys(table_name, schema=schema):
+        for column, foreign_column in zip(fk["constrained_columns"], fk["referred_columns"]):
+            foreign_keys.append({
+                "table_schema": schema,
+                "constraint_name": fk.get("name"),
+                "table_name": table_name,
+                "column_name": column,
+                "foreign_table_schema": fk.get("referred_schema") or schema,
+                "foreign_table_name": fk["referred_table"],
+                "foreign_column_name": foreign_column,
+            })
+    return {
+        "columns": [
+            {"column_name": column["name"], "data_type": str(column["type"])}
+            for column in inspector.get_columns(table_name, schema=schema)
+        ],
+        "primary_key": inspector.get_pk_constraint(table_name, schema=schema).get("constrained_columns") or [],
+        "foreign_keys": foreign_keys,
+        "kind": kind,
+        "row_estimate": None,
+        "description": description,
+    }
+
+
+def _catalog_tables(engine, schema=None, table_name=None):
+    """Return the tables of the catalog as a "schema.table" mapping.
+
+    PostgreSQL tables come from the catalog snapshot (the filters are left to
+    the caller); other databases are read with the SQLAlchemy inspector,
+    limited to `schema` and `table_name` when given.
+    """
+    if _uses_catalog_snapshot(engine):
+        return get_catalog_cache().get()["tables"]
+
+    from sqlalchemy import inspect
+
+    inspector = inspect(engine)
+    schemas = [schema] if schema else [
+        name for name in inspector.get_schema_names() if name != "information_schema"
+    ]
+    tables = {}
+    for schema_name in schemas:
+        kinds = {name: "r" for name in inspector.get_table_names(schema=schema_name)}
+        kinds.update({name: "v" for name in inspector.get_view_names(schema=schema_name)})
+        for name, kind in sorted(kinds.items()):
+            if table_name is None or name == table_name:
+                tables[f"{schema_name}.{name}"] = _inspect_table(inspector, schema_name, name, kind)
+    return tables
+
+
+def get_all_schemata():
+    """Retrieves all tables and their columns from every schema in the database.
 
     Returns:
-        tuple: (JSON string of table names, status message) or error message string
+        list: Schema, table, column and data type records, or error message
 
     Raises:
         Exception: If database connection fails or query execution fails
@@ -70,36 +242,30 @@ def get_all_schemata():
         return "Error: Unable to connect to the database"
 
     try:
-        query = """
-            SELECT 
-                table_schema AS schema_name,
-                table_name,
-                column_name,
-                data_type
-            FROM 
-                INFORMATION_SCHEMA.COLUMNS
-            WHERE 
-                table_schema NOT IN ('pg_catalog', 'pg_toast', 'information_schema')
-            ORDER BY 
-            table_schema, 
-            table_name, 
-            ordinal_position;
-        """
-        df = pd.read_sql(text(query), engine)
-        return df.to_json(orient="records")
+        records = [
+            {
+                "schema_name": key.split(".", 1)[0],
+                "table_name": key.split(".", 1)[1],
+                "column_name": column["column_name"],
+                "data_type": column["data_type"],
+            }
+            for key, table in _catalog_tables(engine).items()
+            for column in table["columns"]
+        ]
+        return records
     except Exception as e:
         return f"Error: {e}"
 
 
 def get_table_columns_fks(table_name: str, schema: str):
-    """Retrieves column information for a specified table.
+    """Retrieves column, primary key and foreign key information for a specified table.
 
     Args:
         table_name (str): Name of the table
         schema (str): Name of the database schema
 
     Returns:
-        str: JSON string of column information or error message
+        dict: Columns, primary key and foreign keys or error message
 
     Raises:
         Exception: If database connection fails or query execution fails
@@ -109,36 +275,471 @@ def get_table_columns_fks(table_name: str, schema: str):
         return "Error: Unable to connect to the database"
 
     try:
-        column_query = f"SELECT column_name, data_type FROM information_schema.columns WHERE table_name = '{table_name}' AND table_schema = '{schema}'"
-        fk_query = f"""
-            SELECT
-                tc.table_schema, 
-                tc.constraint_name, 
-                tc.table_name, 
-                kcu.column_name, 
-                ccu.table_schema AS foreign_table_schema,
-                ccu.table_name AS foreign_table_name,
-                ccu.column_name AS foreign_column_name 
-            FROM information_schema.table_constraints AS tc 
-            JOIN information_schema.key_column_usage AS kcu
-                ON tc.constraint_name = kcu.constraint_name
-                AND tc.table_schema = kcu.table_schema
-            JOIN information_schema.constraint_column_usage AS ccu
-                ON ccu.constraint_name = tc.constraint_name
-            WHERE tc.constraint_type = 'FOREIGN KEY'
-                AND tc.table_schema='{schema}'
-                AND tc.table_name='{table_name}';
-        """       
-
-        df_columns = pd.read_sql(text(column_query), engine)
-        df_fks = pd.read_sql(text(fk_query), engine)
-        if df_columns.empty:
+        table = _catalog_tables(engine, schema, table_name).get(f"{schema}.{table_name}")
+        if table is None:
             return "No schema found"
         else:
-            return json.dumps({
-                "columns": json.loads(df_columns.to_json(orient="records")),
-                "foreign_keys": json.loads(df_fks.to_json(orient="records"))
+            return {
+                "columns": table["columns"],
+                "primary_key": table["primary_key"],
+                "foreign_keys": table["foreign_keys"],
+            }
+
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def _page_size(limit):
+    """Clamp a requested page size to BROWSE_MAX_PAGE_SIZE (default page: BROWSE_PAGE_SIZE)."""
+    default = int(os.getenv("BROWSE_PAGE_SIZE", "100"))
+    maximum = int(os.getenv("BROWSE_MAX_PAGE_SIZE", "500"))
+    return min(max(limit or default, 1), maximum)
+
+
+def _one_line(description, max_chars=120):
+    if not description:
+        return None
+    line = description.strip().splitlines()[0]
+    return line if len(line) <= max_chars else line[: max_chars - 3] + "..."
+
+
+def list_schemas(cursor: str = None, limit: int = None):
+    """Lists the schemas in the database with the number of tables in each, one page at a time.
+
+    Args:
+        cursor (str): The next_cursor of the previous page; leave empty for the first page
+        limit (int): Maximum number of schemas per page
+
+    Returns:
+        dict: Page with the schemas, the total number of schemas and next_cursor (null on the last page), or error message
+    """
+    engine = get_engine()
+    if engine is None:
+        return "Error: Unable to connect to the database"
+
+    try:
+        counts = {}
+        for key in _catalog_tables(engine):
+            schema = key.split(".", 1)[0]
+            counts[schema] = counts.get(schema, 0) + 1
+        names = sorted(counts)
+        page = [name for name in names if cursor is None or name > cursor][: _page_size(limit)]
+        next_cursor = page[-1] if page and page[-1] != names[-1] else None
+        return {
+            "schemas": [{"schema_name": name, "table_count": counts[name]} for name in page],
+            "total": len(names),
+            "next_cursor": next_cursor,
+        }
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def list_tables(schema: str, name_filter: str = None, cursor: str = None, limit: int = None):
+    """Lists the tables of a schema with their estimated row counts and one-line descriptions, one page at a time.
+
+    Args:
+        schema (str): Name of the database schema
+        name_filter (str): Only list tables whose name contains this text (case-insensitive)
+        cursor (str): The next_cursor of the previous page; leave empty for the first page
+        limit (int): Maximum number of tables per page
+
+    Returns:
+        dict: Page with the tables, the total number of matching tables and next_cursor (null on the last page), or error message
+    """
+    engine = get_engine()
+    if engine is None:
+        return "Error: Unable to connect to the database"
+
+    try:
+        catalog = _catalog_tables(engine, schema)
+        prefix = f"{schema}."
+        names = sorted(
+            key[len(prefix):]
+            for key in catalog
+            if key.startswith(prefix)
+            and (not name_filter or name_filter.lower() in key[len(prefix):].lower())
+        )
+        if not names:
+            return "No tables found"
+        page = [name for name in names if cursor is None or name > cursor][: _page_size(limit)]
+        next_cursor = page[-1] if page and page[-1] != names[-1] else None
+        tables = []
+        for name in page:
+            table = catalog[prefix + name]
+            tables.append({
+                "table_name": name,
+                "kind": table.get("kind"),
+                "row_estimate": table.get("row_estimate"),
+                "column_count": len(table["columns"]),
+                "description": _one_line(table.get("description")),
             })
+        return {"tables": tables, "total": len(names), "next_cursor": next_cursor}
+    except Exception as e:
+        return f"Error: {e}"
+
+
+def list_table_columns(table_name: str, schema: str, cursor: str = None, limit: int = None):
+    """Lists the columns of a table with their types, primary key membership and foreign key targets, one page at a time.
+
+    Args:
+        table_name (str): Name of the table
+        schema (str): Name of the database schema
+        cursor (str): The next_cursor of the previous page; leave empty for the first page
+        limit (int): Maximum number of columns per page
+
+    Returns:
+        dict: Page with the columns, the total number of columns and next_cursor (null on the last page), or error message
+    """
+    engine = get_engine()
+    if engine is None:
+        return "Error: Unable to connect to the database"
+
+    try:
+        table = _catalog_tables(engine, schema, table_name).get(f"{schema}.{table_name}")
+        if table is None:
+            return "No table found"
+        references = {
+            fk["column_name"]: f"{fk['foreign_table_schema']}.{fk['foreign_table_name']}.{fk['foreign_column_name']}"
+            for fk in table["foreign_keys"]
+        }
+        start = int(cursor) if cursor else 0
+        end = start + _page_size(limit)
+        columns = [
+            {
+                "column_name": column["column_name"],
+                "data_type": column["data_type"],
+                "primary_key": column["column_name"] in table["primary_key"],
+                "references": references.get(column["column_name"]),
+            }
+            for column in table["columns"][start:end]
+        ]
+        next_cursor = str(end) if end < len(table["columns"]) else None
+        return {"columns": columns, "total": len(table["columns"]), "next_cursor": next_cursor}
+    except Exception as e:
+        return f"Error: {e}"
+
+
+TABLES_METADATA_QUERY = """
+    WITH target AS (
+        SELECT c.oid, n.nspname AS schema_name, c.relname AS table_name
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p', 'v', 'm', 'f')
+            AND n.nspname || '.' || c.relname = ANY(:names)
+    )
+    SELECT
+        t.schema_name,
+        t.table_name,
+        obj_description(t.oid, 'pg_class') AS comment,
+        (
+            SELECT json_agg(json_build_object(
+                'column_name', a.attname,
+                'data_type', format_type(a.atttypid, a.atttypmod),
+                'nullable', NOT a.attnotnull,
+                'comment', col_description(t.oid, a.attnum)
+            ) ORDER BY a.attnum)
+            FROM pg_attribute a
+            WHERE a.attrelid = t.oid AND a.attnum > 0 AND NOT a.attisdropped
+        ) AS columns,
+        (
+            SELECT json_agg(a.attname ORDER BY k.pos)
+            FROM pg_constraint co
+            CROSS JOIN LATERAL unnest(co.conkey) WITH ORDINALITY AS k(attnum, pos)
+            JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+            WHERE co.conrelid = t.oid AND co.contype = 'p'
+        ) AS primary_key,
+        (
+            SELECT json_agg(json_build_object(
+                'constraint_name', co.conname,
+                'columns', (
+                    SELECT json_agg(a.attname ORDER BY k.pos)
+                    FROM unnest(co.conkey) WITH ORDINALITY AS k(attnum, pos)
+                    JOIN pg_attribute a ON a.attrelid = co.conrelid AND a.attnum = k.attnum
+                ),
+                'foreign_table', fn.nspname || '.' || fc.relname,
+                'foreign_columns', (
+                    SELECT json_agg(a.attname ORDER BY k.pos)
+                    FROM unnest(co.confkey) WITH ORDINALITY AS k(attnum, pos)
+                    JOIN pg_attribute a ON a.attrelid = co.confrelid AND a.attnum = k.attnum
+                )
+            ) ORDER BY co.conname)
+            FROM pg_constraint co
+            JOIN pg_class fc ON fc.oid = co.confrelid
+            JOIN pg_namespace fn ON fn.oid = fc.relnamespace
+            WHERE co.conrelid = t.oid AND co.contype = 'f'
+        ) AS foreign_keys,
+        (
+            SELECT json_agg(json_build_object(
+                'index_name', ic.relname,
+                'is_unique', i.indisunique,
+                'definition', pg_get_indexdef(i.indexrelid)
+            ) ORDER BY ic.relname)
+            FROM pg_index i
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            WHERE i.indrelid = t.oid
+        ) AS indexes
+    FROM target t
+    ORDER BY t.schema_name, t.table_name
+"""
+
+
+def _inspect_tables_metadata(engine, names):
+    """get_tables_metadata for databases other than PostgreSQL, via the SQLAlchemy inspector."""
+    from sqlalchemy import inspect
+
+    inspector = inspect(engine)
+    tables = {}
+    for name in names:
+        schema, table_name = name.split(".", 1)
+        if not inspector.has_table(table_name, schema=schema):
+            continue
+        try:
+            comment = inspector.get_table_comment(table_name, schema=schema).get("text")
+        except NotImplementedError:
+            comment = None
+        tables[name] = {
+            "comment": comment,
+            "columns": [
+                {
+                    "column_name": column["name"],
+                    "data_type": str(column["type"]),
+                    "nullable": column.get("nullable", True),
+                    "comment": column.get("comment"),
+                }
+                for column in inspector.get_columns(table_name, schema=schema)
+            ],
+            "primary_key": inspector.get_pk_constraint(table_name, schema=schema).get("constrained_columns") or [],
+            "foreign_keys": [
+                {
+                    "constraint_name": fk.get("name"),
+                    "columns": fk["constrained_columns"],
+                    "foreign_table": f"{fk.get('referred_schema') or schema}.{fk['referred_table']}",
+                    "foreign_columns": fk["referred_columns"],
+                }
+                for fk in inspector.get_foreign_keys(table_name, schema=schema)
+            ],
+            "indexes": [
+                {
+                    "index_name": index["name"],
+                    "is_unique": bool(index.get("unique")),
+                    "columns": index["column_names"],
+                }
+                for index in inspector.get_indexes(table_name, schema=schema)
+            ],
+        }
+    return tables
+
+
+def get_tables_metadata(table_names: list[str]):
+    """Retrieves columns, primary keys, foreign keys, indexes and comments for several tables at once.
+
+    Args:
+        table_names (list[str]): Table names in the format schema.table (tables without a schema are looked up in public)
+
+    Returns:
+        dict: Mapping of each schema.table to its metadata, plus the names that were not found, or error message
+
+    Raises:
+        Exception: If database connection fails or query execution fails
+    """
+    engine = get_engine()
+    if engine is None:
+        return "Error: Unable to connect to the database"
+
+    names = [
+        name.strip() if "." in name else f"public.{name.strip()}"
+        for name in table_names
+        if name.strip()
+    ]
+    if not names:
+        return "No tables given"
+
+    from sqlalchemy import text
+
+    try:
+        if not _uses_catalog_snapshot(engine):
+            with span("sql", kind="tables_metadata", tables=len(names), inspector=True):
+                tables = _inspect_tables_metadata(engine, names)
+            return {"tables": tables, "not_found": [name for name in names if name not in tables]}
+
+        with span("sql", kind="tables_metadata", tables=len(names)) as sql_span:
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    text(TABLES_METADATA_QUERY), {"names": names}
+                ).mappings().all()
+            sql_span.set(rows=len(rows))
+
+        tables = {}
+        for row in rows:
+            tables[f"{row['schema_name']}.{row['table_name']}"] = {
+                "comment": row["comment"],
+                "columns": row["columns"] or [],
+                "primary_key": row["primary_key"] or [],
+                "foreign_keys": row["foreign_keys"] or [],
+                "indexes": row["indexes"] or [],
+            }
+        not_found = [name for name in names if name not in tables]
+        return {"tables": tables, "not_found": not_found}
+
+    except Exception as e:
+        return f"Error: {e}"
+
+
+TABLE_STATS_QUERY = """
+    SELECT
+        c.relkind,
+        c.reltuples,
+        CASE WHEN c.relkind = 'p'
+            THEN (SELECT coalesce(sum(pg_relation_size(relid)), 0) FROM pg_partition_tree(c.oid))
+            ELSE pg_relation_size(c.oid)
+        END / current_setting('block_size')::bigint AS pages,
+        greatest(st.last_analyze, st.last_autoanalyze)::text AS last_analyzed
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_stat_all_tables st ON st.relid = c.oid
+    WHERE n.nspname = :schema AND c.relname = :table_name
+        AND c.relkind IN ('r', 'p', 'v', 'm', 'f')
+"""
+
+# Most-common values go through their text form; array columns are skipped
+# because their MCV literal can't be cast to a one-dimensional text[].
+COLUMN_STATS_QUERY = """
+    SELECT
+        a.attname AS column_name,
+        format_type(a.atttypid, a.atttypmod) AS data_type,
+        s.null_frac,
+        s.n_distinct,
+        CASE WHEN t.typcategory <> 'A'
+            THEN ((s.most_common_vals::text)::text[])[1:CAST(:mcv AS integer)]
+        END AS most_common_values,
+        s.most_common_freqs[1:CAST(:mcv AS integer)] AS most_common_freqs
+    FROM pg_attribute a
+    JOIN pg_class c ON c.oid = a.attrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    JOIN pg_type t ON t.oid = a.atttypid
+    LEFT JOIN pg_stats s
+        ON s.schemaname = n.nspname
+        AND s.tablename = c.relname
+        AND s.attname = a.attname
+        AND s.inherited = (c.relkind = 'p')
+    WHERE n.nspname = :schema AND c.relname = :table_name
+        AND a.attnum > 0 AND NOT a.attisdropped
+    ORDER BY a.attnum
+"""
+
+
+def _quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _json_value(value, max_chars=200):
+    """Make a sampled value JSON-safe and keep long text short."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else str(value)
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+
+def _sample_clause(pages, row_estimate, rows):
+    """Pick a TABLESAMPLE clause that reads at most TABLE_SAMPLE_MAX_PAGES pages.
+
+    Small tables are sampled row by row (BERNOULLI), which reads every page
+    but gives a uniform sample. Larger ones are sampled page by page (SYSTEM)
+    at the percentage that reads about TABLE_SAMPLE_MAX_PAGES pages.
+    """
+    max_pages = int(os.getenv("TABLE_SAMPLE_MAX_PAGES", "256"))
+    if pages <= max_pages:
+        # Oversample so the LIMIT is reached even with an outdated estimate
+        percent = 100.0 if row_estimate <= 0 else min(100.0, 100.0 * rows * 4 / row_estimate)
+        return f"BERNOULLI ({percent:.6f})"
+    return f"SYSTEM ({100.0 * max_pages / pages:.6f})"
+
+
+def get_table_stats(table_name: str, schema: str, sample_rows: int = None):
+    """Describes a table without scanning it: row estimate, per-column null fraction, distinct count and most common values from the planner statistics, plus a small random sample of rows. Use this instead of SELECT * or COUNT(*) queries to get to know a table.
+
+    Args:
+        table_name (str): Name of the table
+        schema (str): Name of the database schema
+        sample_rows (int): Number of sample rows to return
+
+    Returns:
+        dict: The row estimate, size in pages, when statistics were last gathered, column statistics and the sample, or error message
+    """
+    engine = get_engine()
+    if engine is None:
+        return "Error: Unable to connect to the database"
+    if engine.dialect.name != "postgresql":
+        return "Error: table statistics are only available on PostgreSQL"
+
+    from sqlalchemy import text
+
+    rows = sample_rows or int(os.getenv("TABLE_SAMPLE_ROWS", "20"))
+    rows = max(1, min(rows, int(os.getenv("TABLE_SAMPLE_MAX_ROWS", "100"))))
+    params = {"schema": schema, "table_name": table_name}
+    try:
+        with engine.begin() as conn:
+            # Bounds every statement of this transaction, including the sample
+            conn.execute(
+                text("SELECT set_config('statement_timeout', :timeout, true)"),
+                {"timeout": os.getenv("TABLE_STATS_TIMEOUT_MS", "5000")},
+            )
+            with span("sql", kind="table_stats"):
+                table = conn.execute(text(TABLE_STATS_QUERY), params).mappings().first()
+                if table is None:
+                    return "No table found"
+                column_rows = conn.execute(
+                    text(COLUMN_STATS_QUERY), {**params, "mcv": int(os.getenv("TABLE_STATS_MCV", "5"))}
+                ).mappings().all()
+
+            # reltuples is -1 (PostgreSQL 14+) or 0 before the first ANALYZE
+            row_estimate = max(int(table["reltuples"]), 0)
+            columns = []
+            for column in column_rows:
+                n_distinct = column["n_distinct"]
+                # Negative values are a fraction of the row count
+                if n_distinct is not None and n_distinct < 0:
+                    n_distinct = round(-n_distinct * row_estimate)
+                columns.append(
+                    {
+                        "column_name": column["column_name"],
+                        "data_type": column["data_type"],
+                        "null_frac": None if column["null_frac"] is None else round(column["null_frac"], 4),
+                        "n_distinct": None if n_distinct is None else int(n_distinct),
+                        "most_common_values": [
+                            _json_value(value, 60) for value in column["most_common_values"] or []
+                        ],
+                        "most_common_freqs": [
+                            round(freq, 4) for freq in column["most_common_freqs"] or []
+                        ],
+                    }
+                )
+
+            sample, method = [], None
+            if table["relkind"] in ("r", "p", "m"):
+                method = _sample_clause(int(table["pages"]), row_estimate, rows)
+                with span("sql", kind="table_sample", method=method.split()[0]) as sample_span:
+                    result = conn.execute(
+                        text(
+                            f"SELECT * FROM {_quote_ident(schema)}.{_quote_ident(table_name)} "
+                            f"TABLESAMPLE {method} ORDER BY random() LIMIT {rows}"
+                        )
+                    )
+                    sample = [
+                        {key: _json_value(value) for key, value in row.items()}
+                        for row in result.mappings()
+                    ]
+                    sample_span.set(rows=len(sample))
+
+        return {
+            "table": f"{schema}.{table_name}",
+            "row_estimate": row_estimate,
+            "pages": int(table["pages"]),
+            "last_analyzed": table["last_analyzed"],
+            "columns": columns,
+            "sample_method": method or "none (views can't be sampled)",
+            "sample": sample,
+        }
 
     except Exception as e:
         return f"Error: {e}"
@@ -156,5 +757,5 @@ def confirm_add_tables(table_names: str):
     Raises:
         Exception: If database connection fails or query execution fails
     """
-    rsp, feedback = get_user_approval(table_names)
+    rsp, feedback = request_table_approval(table_names)
     return rsp, feedback
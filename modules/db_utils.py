@@ -1,15 +1,272 @@
 import os
+import time
+import threading
 import dotenv
-from sqlalchemy import create_engine
-import pandas as pd
+from pathlib import Path
 
 dotenv.load_dotenv()
 
 
-def get_engine():
-    db_uri = os.getenv("DB_URI")
+# Engines are shared by every tool and every session in the process, keyed by URI.
+_engines = {}
+_pool_stats = {}
+_engines_lock = threading.Lock()
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_cache_dir():
+    """Return the local directory used for on-disk caches, creating it if needed."""
+    cache_dir = Path(os.getenv("DBASSISTANT_CACHE_DIR", ".cache"))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def get_pool_settings():
+    """Read the connection pool configuration from the environment.
+
+    Returns:
+        dict: Pool size, overflow, timeout, pre-ping, recycle and warm-up settings.
+    """
+    return {
+        "pool_size": _env_int("DB_POOL_SIZE", 5),
+        "max_overflow": _env_int("DB_POOL_MAX_OVERFLOW", 10),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "warmup": _env_int("DB_POOL_WARMUP", 1),
+    }
+
+
+def get_fetch_settings():
+    """Read the result streaming configuration from the environment.
+
+    Returns:
+        dict: Whether to stream, rows per chunk and the row/byte caps.
+    """
+    return {
+        "stream": _env_bool("FETCH_STREAMING", True),
+        "chunk_rows": _env_int("FETCH_CHUNK_ROWS", 50000),
+        "max_rows": _env_int("FETCH_MAX_ROWS", 1000000),
+        "max_bytes": _env_int("FETCH_MAX_BYTES", 200 * 1024 * 1024),
+    }
+
+
+def _attach_pool_stats(engine, stats):
+    """Register pool listeners that keep connect/checkout counters up to date."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_conn, conn_record):
+        with _engines_lock:
+            stats["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_conn, conn_record, conn_proxy):
+        with _engines_lock:
+            stats["checked_out"] += 1
+            stats["checkouts"] += 1
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_conn, conn_record):
+        with _engines_lock:
+            stats["checked_out"] = max(stats["checked_out"] - 1, 0)
+
+    # Time spent waiting for the pool to hand out a connection (including the
+    # connect handshake when the pool has to open a new one).
+    original_connect = engine.pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return original_connect()
+        finally:
+            waited = time.perf_counter() - start
+            with _engines_lock:
+                stats["wait_time_total"] += waited
+                stats["wait_time_max"] = max(stats["wait_time_max"], waited)
+
+    engine.pool.connect = timed_connect
+
+
+def _warm_up(engine, connections):
+    """Open `connections` connections and return them to the pool so the first
+    tool call doesn't pay the connect/TLS/auth cost."""
+    from sqlalchemy import text
+
+    opened = []
     try:
-        return create_engine(db_uri)
+        for _ in range(connections):
+            conn = engine.connect()
+            conn.execute(text("SELECT 1"))
+            opened.append(conn)
+    finally:
+        for conn in opened:
+            conn.close()
+
+
+def _create_pooled_engine(db_uri, settings):
+    from sqlalchemy import create_engine
+
+    kwargs = {
+        "pool_pre_ping": settings["pool_pre_ping"],
+        "pool_recycle": settings["pool_recycle"],
+    }
+    # SQLite uses a single-connection pool that doesn't accept sizing arguments.
+    if not db_uri.startswith("sqlite"):
+        kwargs.update(
+            pool_size=settings["pool_size"],
+            max_overflow=settings["max_overflow"],
+            pool_timeout=settings["pool_timeout"],
+        )
+    return create_engine(db_uri, **kwargs)
+
+
+def get_engine(db_uri=None):
+    """Return the shared, pooled engine for `db_uri` (defaults to DB_URI).
+
+    The engine is created on first use, warmed up with DB_POOL_WARMUP
+    connections and then reused by every caller in the process.
+
+    Args:
+        db_uri (str, optional): Database connection string.
+
+    Returns:
+        Engine: The pooled SQLAlchemy engine, or None if it can't be created.
+    """
+    db_uri = db_uri or os.getenv("DB_URI")
+    engine = _engines.get(db_uri)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(db_uri)
+        if engine is not None:
+            return engine
+        settings = get_pool_settings()
+        try:
+            engine = _create_pooled_engine(db_uri, settings)
+        except Exception as e:
+            print(f"Error connecting to database: {e}")
+            return None
+        stats = {
+            "connects": 0,
+            "checkouts": 0,
+            "checked_out": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+        _attach_pool_stats(engine, stats)
+        _engines[db_uri] = engine
+        _pool_stats[db_uri] = stats
+
+    try:
+        _warm_up(engine, settings["warmup"])
     except Exception as e:
-        print(f"Error connecting to database: {e}")
+        print(f"Error warming up database pool: {e}")
+    return engine
+
+
+def get_pool_stats(db_uri=None):
+    """Return runtime statistics for the pool behind `db_uri`.
+
+    Args:
+        db_uri (str, optional): Database connection string. Defaults to DB_URI.
+
+    Returns:
+        dict: Connect count, checkouts, currently checked-out connections,
+            total/max/average checkout wait time and the pool's own status,
+            or None if no engine has been created for the URI.
+    """
+    db_uri = db_uri or os.getenv("DB_URI")
+    engine = _engines.get(db_uri)
+    if engine is None:
         return None
+    with _engines_lock:
+        stats = dict(_pool_stats[db_uri])
+    stats["wait_time_avg"] = (
+        stats["wait_time_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    )
+    stats["pool_status"] = engine.pool.status()
+    return stats
+
+
+def dispose_engines():
+    """Close every pooled connection and forget all registered engines."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _pool_stats.clear()
+
+
+def stream_query_to_file(engine, query, writer, chunk_rows, max_rows, max_bytes):
+    """Run `query` with a server-side cursor and write the rows in chunks.
+
+    Only one chunk is held in memory at a time, so peak memory depends on
+    `chunk_rows` rather than on the size of the result.
+
+    Args:
+        engine: SQLAlchemy engine to run the query on.
+        query (str): The SQL query to execute.
+        writer (ResultWriter): Destination for the result chunks.
+        chunk_rows (int): Rows fetched from the cursor per chunk.
+        max_rows (int): Stop after writing this many rows.
+        max_bytes (int): Stop once the file reaches this size.
+
+    Returns:
+        dict: Rows and bytes written, whether the result was truncated
+            (`truncated` is "rows", "bytes" or None) and the seconds spent
+            writing the file.
+    """
+    import pandas as pd
+    from sqlalchemy import text
+
+    rows_written = 0
+    truncated = None
+    write_seconds = 0.0
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True, max_row_buffer=chunk_rows
+        ).execute(text(query))
+        columns = list(result.keys())
+        for rows in result.partitions(chunk_rows):
+            remaining = max_rows - rows_written
+            if remaining <= 0:
+                truncated = "rows"
+                break
+            if len(rows) > remaining:
+                rows = rows[:remaining]
+                truncated = "rows"
+            if rows_written == 0:
+                # Server-side cursors only describe their columns after the first fetch
+                writer.declare_types(result.cursor.description if result.cursor else None)
+            started = time.perf_counter()
+            writer.write(pd.DataFrame(rows, columns=columns))
+            write_seconds += time.perf_counter() - started
+            rows_written += len(rows)
+            if truncated:
+                break
+            if writer.size() >= max_bytes:
+                truncated = "bytes"
+                break
+        result.close()
+    started = time.perf_counter()
+    writer.close()
+    write_seconds += time.perf_counter() - started
+    return {
+        "rows": rows_written,
+        "bytes": writer.size(),
+        "truncated": truncated,
+        "write_seconds": write_seconds,
+    }
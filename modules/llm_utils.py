@@ -1,37 +1,59 @@
+import io
+import os
+import csv
+import copy
 import json
 import inspect
-from typing import get_type_hints
+import functools
+from typing import get_type_hints, get_origin, get_args
 
 
 def get_type_info(param, type_hints):
     """Helper function to determine parameter type information"""
     if param.name in type_hints:
-        typ = type_hints[param.name]
-        if typ == str:
-            return {"type": "string"}
-        elif typ == int:
-            return {"type": "integer"}
-        elif typ == float:
-            return {"type": "number"}
-        elif typ == bool:
-            return {"type": "boolean"}
-        elif typ == dict:
-            return {"type": "object"}
-        elif typ == list:
-            return {"type": "array"}
+        return _type_to_schema(type_hints[param.name])
+    return {"type": "string"}
+
+
+def _type_to_schema(typ):
+    """Map a Python type hint to a JSON schema type"""
+    if get_origin(typ) is list:
+        args = get_args(typ)
+        item_type = _type_to_schema(args[0]) if args else {"type": "string"}
+        return {"type": "array", "items": item_type}
+    if typ == str:
+        return {"type": "string"}
+    elif typ == int:
+        return {"type": "integer"}
+    elif typ == float:
+        return {"type": "number"}
+    elif typ == bool:
+        return {"type": "boolean"}
+    elif typ == dict:
+        return {"type": "object"}
+    elif typ == list:
+        return {"type": "array", "items": {"type": "string"}}
     return {"type": "string"}
 
 
 def func_to_json(func, description=None):
     """Convert a function to a JSON function schema.
 
+    Schemas are generated once per function and memoised; every call returns
+    its own copy.
+
     Args:
         func: The function to convert
         description: Optional description of what the function does
 
     Returns:
-        str: JSON string representing the function schema
+        dict: The function schema
     """
+    return copy.deepcopy(_func_schema(func, description))
+
+
+@functools.lru_cache(maxsize=None)
+def _func_schema(func, description):
     sig = inspect.signature(func)
     type_hints = get_type_hints(func)
 
@@ -43,10 +65,12 @@ def func_to_json(func, description=None):
             continue
 
         type_info = get_type_info(param, type_hints)
+        # Strict schemas require every property, so optional parameters are
+        # expressed as nullable and None falls back to the Python default.
+        if param.default != param.empty:
+            type_info = {**type_info, "type": [type_info["type"], "null"]}
         properties[name] = {**type_info, "description": name}
-
-        if param.default == param.empty:
-            required.append(name)
+        required.append(name)
 
     schema = {
         "type": "function",
@@ -66,18 +90,129 @@ def func_to_json(func, description=None):
     return schema
 
 
-def encode_func_call_result(result):
+TOOL_OUTPUT_ENCODINGS = ("json", "columnar", "csv")
+
+
+def get_tool_output_encoding(tool_name=None):
+    """Return the encoding for a tool's tabular outputs.
+
+    TOOL_OUTPUT_ENCODINGS holds per-tool overrides as "name=csv,name=json";
+    other tools use TOOL_OUTPUT_ENCODING ("columnar" by default).
+    """
+    setting = "TOOL_OUTPUT_ENCODING"
+    encoding = os.getenv(setting, "columnar")
+    for item in os.getenv("TOOL_OUTPUT_ENCODINGS", "").split(","):
+        name, _, override = item.partition("=")
+        if tool_name and name.strip() == tool_name and override.strip():
+            setting = f"TOOL_OUTPUT_ENCODINGS override for {tool_name}"
+            encoding = override
+            break
+    encoding = encoding.strip().lower()
+    if encoding not in TOOL_OUTPUT_ENCODINGS:
+        raise ValueError(
+            f"Unsupported {setting} '{encoding}', "
+            f"expected one of {', '.join(TOOL_OUTPUT_ENCODINGS)}"
+        )
+    return encoding
+
+
+def _value_type(values):
+    for value in values:
+        if value is not None:
+            return {bool: "bool", int: "int", float: "float", str: "str"}.get(type(value), "json")
+    return "null"
+
+
+def _is_table(value):
+    """A list of at least two dicts that all have the same keys."""
+    return (
+        isinstance(value, list)
+        and len(value) > 1
+        and all(isinstance(row, dict) for row in value)
+        and all(row.keys() == value[0].keys() for row in value)
+    )
+
+
+def _encode_table(fields, types, rows, encoding):
+    if encoding == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(fields)
+        for row in rows:
+            writer.writerow(
+                "" if cell is None
+                else json.dumps(cell) if isinstance(cell, (list, dict, bool))
+                else cell
+                for cell in row
+            )
+        return {"types": dict(zip(fields, types)), "csv": buffer.getvalue()}
+    return {"fields": fields, "types": types, "rows": rows}
+
+
+def compact_result(value, encoding="columnar", digits=None):
+    """Rewrite the tables inside a tool result so column names appear once.
+
+    Lists of records and DataFrames become {"fields", "types", "rows"}
+    ("columnar") or {"types", "csv"} ("csv"); with "json" they are kept as
+    they are. Floats are rounded to `digits` decimals if given.
+    """
+    if hasattr(value, "to_json") and hasattr(value, "columns"):
+        if digits is not None:
+            value = value.round(digits)
+        if encoding == "json":
+            return value
+        split = json.loads(value.to_json(orient="split", index=False, date_format="iso"))
+        types = [str(dtype) for dtype in value.dtypes]
+        return _encode_table(split["columns"], types, split["data"], encoding)
+    if isinstance(value, dict):
+        return {key: compact_result(item, encoding, digits) for key, item in value.items()}
+    if encoding != "json" and _is_table(value):
+        fields = list(value[0].keys())
+        rows = [
+            [compact_result(row[field], encoding, digits) for field in fields]
+            for row in value
+        ]
+        types = [_value_type(row[i] for row in rows) for i in range(len(fields))]
+        return _encode_table(fields, types, rows, encoding)
+    if isinstance(value, list):
+        return [compact_result(item, encoding, digits) for item in value]
+    if isinstance(value, float) and digits is not None:
+        return round(value, digits)
+    return value
+
+
+# Invalid encoding settings already warned about
+_encoding_warnings = set()
+
+
+def encode_func_call_result(result, tool_name=None):
     """Encode a function call result into a JSON string.
 
+    Tabular parts of the result are encoded with the tool's output encoding
+    (see get_tool_output_encoding), and floats are rounded to
+    TOOL_OUTPUT_FLOAT_DIGITS decimals if that is set.
+
     Args:
         result: The result to encode
+        tool_name (str, optional): Name of the tool that produced the result
 
     Returns:
         str: JSON string representing the function call result
     """
+    try:
+        encoding = get_tool_output_encoding(tool_name)
+    except ValueError as e:
+        # Also used to report tool errors, so a config typo must not raise here
+        if str(e) not in _encoding_warnings:
+            _encoding_warnings.add(str(e))
+            print(f"Warning: {e}; using columnar", flush=True)
+        encoding = "columnar"
+    digits = os.getenv("TOOL_OUTPUT_FLOAT_DIGITS")
+    if encoding != "json" or digits:
+        result = compact_result(result, encoding, int(digits) if digits else None)
     try:
         # Try to directly serialize the result
-        json_result = json.dumps(result)
+        json_result = json.dumps(result, separators=(",", ":"))
         return json_result
     except (TypeError, OverflowError):
         # If the result is not JSON serializable (like a DataFrame)
@@ -95,6 +230,42 @@ def encode_func_call_result(result):
             return json_result
 
 
+def compare_encodings(result):
+    """Return the encoded size in characters of `result` under each output encoding."""
+    sizes = {"json": len(json.dumps(result, default=str))}
+    for encoding in ("columnar", "csv"):
+        sizes[encoding] = len(
+            json.dumps(compact_result(result, encoding), separators=(",", ":"), default=str)
+        )
+    return sizes
+
+
+def parse_tool_args(func, args):
+    """Parse the JSON arguments of a tool call.
+
+    Optional parameters that the model passed as null are dropped so the
+    function's own defaults apply.
+
+    Args:
+        func: The function the arguments are for
+        args: JSON string of arguments
+
+    Returns:
+        dict: Keyword arguments for `func`
+    """
+    args_dict = json.loads(args)
+    sig = inspect.signature(func)
+    return {
+        name: value
+        for name, value in args_dict.items()
+        if not (
+            value is None
+            and name in sig.parameters
+            and sig.parameters[name].default != inspect.Parameter.empty
+        )
+    }
+
+
 def invoke_tool_for_llm(func, args):
     """Invoke a function and return the result as a JSON string.
 
@@ -102,7 +273,7 @@ def invoke_tool_for_llm(func, args):
         func: The function to invoke
         args: Arguments to pass to the function
     """
-    args_dict = json.loads(args)
+    args_dict = parse_tool_args(func, args)
     result = func(**args_dict)
     return result
 
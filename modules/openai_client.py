@@ -0,0 +1,53 @@
+import os
+import threading
+from dotenv import load_dotenv
+
+# One client of each kind per process, created on first use so importing the
+# modules doesn't pay for the client setup (or need an API key).
+_config = None
+_client = None
+_async_client = None
+_lock = threading.Lock()
+
+
+def get_config():
+    """Load .env once and return the OpenAI settings.
+
+    Returns:
+        dict: The API key and base URL (None when not set).
+    """
+    global _config
+    with _lock:
+        if _config is None:
+            load_dotenv()
+            _config = {
+                "api_key": os.getenv("OPENAI_API_KEY"),
+                "base_url": os.getenv("OPENAI_BASE_URL") or None,
+            }
+        return _config
+
+
+def get_client():
+    """Return the shared OpenAI client."""
+    global _client
+    if _client is None:
+        config = get_config()
+        from openai import OpenAI
+
+        with _lock:
+            if _client is None:
+                _client = OpenAI(api_key=config["api_key"], base_url=config["base_url"])
+    return _client
+
+
+def get_async_client():
+    """Return the shared AsyncOpenAI client."""
+    global _async_client
+    if _async_client is None:
+        config = get_config()
+        from openai import AsyncOpenAI
+
+        with _lock:
+            if _async_client is None:
+                _async_client = AsyncOpenAI(api_key=config["api_key"], base_url=config["base_url"])
+    return _async_client
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import threading
+from collections import Counter
+from .db_utils import get_cache_dir
+from .context_index import tokenize, bm25_score
+
+
+class QueryMemory:
+    """Remembers which tables and SQL answered earlier questions.
+
+    Every question is stored with the tables approved through
+    confirm_add_tables and the queries fetch_data_from_db ran successfully
+    for it. At the start of a run the entries most similar to the new
+    question (BM25 over the question and table names) are suggested to the
+    model, so repeat questions don't need exploratory tool calls. The memory
+    keeps the QUERY_MEMORY_MAX_ENTRIES most recently used questions.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_cache_dir() / "query_memory.json"
+        self.max_entries = int(os.getenv("QUERY_MEMORY_MAX_ENTRIES", "2000"))
+        self.max_queries = int(os.getenv("QUERY_MEMORY_MAX_QUERIES", "3"))
+        self.top_k = int(os.getenv("QUERY_MEMORY_TOP_K", "3"))
+        self.min_score = float(os.getenv("QUERY_MEMORY_MIN_SCORE", "1.0"))
+        self.lock = threading.Lock()
+        self.entries = self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return []
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _save(self):
+        self.entries.sort(key=lambda entry: entry["last_used"], reverse=True)
+        del self.entries[self.max_entries:]
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+    def _entry(self, question):
+        """Return the entry of `question`, creating it if needed."""
+        key = " ".join(tokenize(question))
+        for entry in self.entries:
+            if entry["key"] == key:
+                return entry
+        entry = {"key": key, "question": question, "tables": [], "queries": [], "uses": 0}
+        self.entries.append(entry)
+        return entry
+
+    def _index(self, entry):
+        text = f"{entry['question']} {' '.join(entry['tables'])}"
+        entry["tf"] = Counter(tokenize(text))
+        entry["length"] = sum(entry["tf"].values())
+
+    def record_tables(self, question, tables):
+        """Remember that `tables` were approved for `question`."""
+        if not question or not tables:
+            return
+        with self.lock:
+            entry = self._entry(question)
+            entry["tables"] = list(dict.fromkeys(entry["tables"] + tables))
+            entry["uses"] += 1
+            entry["last_used"] = time.time()
+            self._index(entry)
+            self._save()
+
+    def record_query(self, question, query, tables=None):
+        """Remember a query that ran successfully for `question`."""
+        if not question or not query:
+            return
+        with self.lock:
+            entry = self._entry(question)
+            if tables:
+                entry["tables"] = list(dict.fromkeys(entry["tables"] + tables))
+            queries = [q for q in entry["queries"] if q != query]
+            entry["queries"] = ([query] + queries)[: self.max_queries]
+            entry["last_used"] = time.time()
+            self._index(entry)
+            self._save()
+
+    def search(self, question, top_k=None):
+        """Return the `top_k` remembered entries most similar to `question`.
+
+        Returns:
+            list: (score, entry) pairs, best first, scoring at least
+                QUERY_MEMORY_MIN_SCORE and half the best score.
+        """
+        query_terms = tokenize(question or "")
+        with self.lock:
+            entries = [entry for entry in self.entries if entry["tables"]]
+            if not query_terms or not entries:
+                return []
+            doc_freq = Counter()
+            for entry in entries:
+                doc_freq.update(entry["tf"].keys())
+            avg_length = sum(entry["length"] for entry in entries) / len(entries)
+            scored = [
+                (bm25_score(query_terms, entry, doc_freq, len(entries), avg_length), entry)
+                for entry in entries
+            ]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        # Weak matches next to a strong one are mostly shared filler words
+        cutoff = max(self.min_score, scored[0][0] / 2)
+        return [(score, entry) for score, entry in scored[: top_k or self.top_k] if score >= cutoff]
+
+    def suggest(self, question, confirmed=None):
+        """Format the best matches as run instructions, or None if nothing matches.
+
+        Args:
+            question (str): The new question.
+            confirmed (list, optional): Tables already confirmed in the thread.
+        """
+        matches = self.search(question)
+        if not matches:
+            return None
+        lines = [
+            "Tables and SQL that answered similar earlier questions. If one fits, "
+            "skip schema discovery: call confirm_add_tables with its tables "
+            "(unless already confirmed) and adapt its SQL."
+        ]
+        confirmed = set(confirmed or [])
+        for i, (_, entry) in enumerate(matches, 1):
+            tables = ", ".join(entry["tables"])
+            note = " (already confirmed)" if set(entry["tables"]) <= confirmed else ""
+            lines.append(f'{i}. "{entry["question"]}" -> {tables}{note}')
+            for query in entry["queries"]:
+                lines.append(f"   SQL: {' '.join(query.split())[:500]}")
+        return "\n".join(lines)
+
+
+_query_memory = None
+_query_memory_lock = threading.Lock()
+
+
+def get_query_memory():
+    """Return the process-wide query memory, or None if QUERY_MEMORY is off."""
+    global _query_memory
+    if os.getenv("QUERY_MEMORY", "true").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    with _query_memory_lock:
+        if _query_memory is None:
+            _query_memory = QueryMemory()
+        return _query_memory
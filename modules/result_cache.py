@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from .db_utils import get_cache_dir
+
+# Modification counters of the queried table. They change whenever rows are
+# inserted, updated or deleted, which invalidates results cached under them.
+# Tables joined in by the query aren't covered; the TTL bounds those.
+FRESHNESS_QUERY = """
+    SELECT
+        coalesce(n_tup_ins, 0) || ':' || coalesce(n_tup_upd, 0) || ':' ||
+        coalesce(n_tup_del, 0) || ':' || coalesce(n_live_tup, 0) AS token
+    FROM pg_stat_user_tables
+    WHERE schemaname = :schema AND relname = :table_name
+"""
+
+_STRING_LITERAL = re.compile(r"('(?:''|[^'])*'|\"(?:\"\"|[^\"])*\")")
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+def normalize_sql(query):
+    """Normalise a query so formatting differences map to the same cache key.
+
+    Comments and redundant whitespace are removed outside of string literals,
+    and the trailing semicolon is dropped.
+    """
+    parts = _STRING_LITERAL.split(query)
+    normalized = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            # quoted literal or identifier, keep as-is
+            normalized.append(part)
+        else:
+            part = _COMMENTS.sub(" ", part)
+            normalized.append(re.sub(r"\s+", " ", part))
+    return "".join(normalized).strip().rstrip(";").strip()
+
+
+def get_freshness_token(conn, table_name, schema):
+    """Return a token that changes when the data in schema.table_name changes.
+
+    Returns None when the table has no statistics (e.g. non-Postgres databases),
+    in which case only the TTL bounds the age of a cached result.
+    """
+    from sqlalchemy import text
+
+    try:
+        return conn.execute(
+            text(FRESHNESS_QUERY), {"schema": schema, "table_name": table_name}
+        ).scalar()
+    except Exception:
+        return None
+
+
+class ResultCache:
+    """Disk-backed cache of fetch_data_from_db result files.
+
+    Entries are keyed by the normalised SQL, a data freshness token, the
+    database URL and the fetch settings (FETCH_* caps, RESULT_FORMAT), expire
+    after RESULT_CACHE_TTL seconds and are evicted least recently used first
+    once the cache exceeds RESULT_CACHE_MAX_BYTES. Each entry also remembers
+    the OpenAI file id its result was uploaded as, so unchanged results aren't
+    uploaded again.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.dir = cache_dir or get_cache_dir() / "query_results"
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.dir / "index.json"
+        self.enabled = os.getenv("RESULT_CACHE_ENABLED", "true").strip().lower() in (
+            "1",
+            "true",
+            "yes",
+            "on",
+        )
+        self.ttl = float(os.getenv("RESULT_CACHE_TTL", "900"))
+        self.max_bytes = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(1024**3)))
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+        # OpenAI file ids of removed entries, deleted outside the lock
+        self._orphaned_file_ids = []
+        self.entries = self._load_index()
+
+    def _load_index(self):
+        if not self.index_path.exists():
+            return {}
+        try:
+            with open(self.index_path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {key: entry for key, entry in entries.items() if os.path.exists(entry["path"])}
+
+    def _save_index(self):
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        if os.path.exists(entry["path"]):
+            os.remove(entry["path"])
+        if entry.get("file_id"):
+            self._orphaned_file_ids.append(entry["file_id"])
+
+    def _delete_orphaned_files(self):
+        """Delete the uploaded copies of removed entries from OpenAI."""
+        with self.lock:
+            file_ids, self._orphaned_file_ids = self._orphaned_file_ids, []
+        if not file_ids:
+            return
+        from .openai_client import get_client
+
+        for file_id in file_ids:
+            try:
+                get_client().files.delete(file_id)
+            except Exception as e:
+                print(f"Could not delete file {file_id}: {e}", flush=True)
+
+    def _evict(self, keep=None):
+        now = time.time()
+        for key in [k for k, e in self.entries.items() if now - e["created_at"] > self.ttl]:
+            self._remove(key)
+            self.stats["evictions"] += 1
+        total = sum(e["size"] for e in self.entries.values())
+        for key in sorted(self.entries, key=lambda k: self.entries[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self.entries[key]["size"]
+            self._remove(key)
+            self.stats["evictions"] += 1
+
+    def make_key(self, query, freshness_token, engine_url=None, fetch_settings=None):
+        """Hash a query with everything that shapes its result file.
+
+        Args:
+            query (str): The SQL query.
+            freshness_token (str): Data freshness token of the queried table.
+            engine_url (str, optional): Database the query runs on.
+            fetch_settings (dict, optional): Row/byte caps and result format.
+        """
+        payload = json.dumps(
+            [normalize_sql(query), freshness_token, engine_url, fetch_settings],
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached entry for `key`, or None on a miss."""
+        try:
+            return self._get(key)
+        finally:
+            self._delete_orphaned_files()
+
+    def _get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry["created_at"] > self.ttl:
+                self._remove(key)
+                self.stats["evictions"] += 1
+                self._save_index()
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            entry["last_used"] = time.time()
+            self.stats["hits"] += 1
+            self._save_index()
+            return dict(entry)
+
+    def put(self, key, path, msg):
+        """Move the result file at `path` into the cache and return its new path.
+
+        If another caller cached the same key meanwhile, its file is kept and
+        the file at `path` is deleted.
+        """
+        try:
+            return self._put(key, path, msg)
+        finally:
+            self._delete_orphaned_files()
+
+    def _put(self, key, path, msg):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry["created_at"] <= self.ttl:
+                os.remove(path)
+                entry["last_used"] = time.time()
+                self._save_index()
+                return entry["path"]
+            if entry is not None:
+                self._remove(key)
+            cached_path = str(self.dir / f"{key}{os.path.splitext(path)[1]}")
+            os.replace(path, cached_path)
+            now = time.time()
+            self.entries[key] = {
+                "path": cached_path,
+                "msg": msg,
+                "size": os.path.getsize(cached_path),
+                "created_at": now,
+                "last_used": now,
+                "file_id": None,
+            }
+            self._evict(keep=key)
+            self._save_index()
+            return cached_path
+
+    def _key_for_path(self, path):
+        for key, entry in self.entries.items():
+            if entry["path"] == path:
+                return key
+        return None
+
+    def owns(self, path):
+        """Whether `path` is a cached result file that must not be deleted by callers."""
+        with self.lock:
+            return self._key_for_path(path) is not None
+
+    def get_file_id(self, path):
+        """Return the OpenAI file id the cached result at `path` was uploaded as."""
+        with self.lock:
+            key = self._key_for_path(path)
+            return self.entries[key]["file_id"] if key else None
+
+    def set_file_id(self, path, file_id):
+        """Remember the OpenAI file id for the cached result at `path`."""
+        with self.lock:
+            key = self._key_for_path(path)
+            if key:
+                self.entries[key]["file_id"] = file_id
+                self._save_index()
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                self._remove(key)
+            self._save_index()
+        self._delete_orphaned_files()
+
+    def record_bypass(self):
+        with self.lock:
+            self.stats["bypassed"] += 1
+
+    def get_stats(self):
+        """Return hit/miss/bypass/eviction counters and the current cache size."""
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.entries)
+            stats["bytes"] = sum(e["size"] for e in self.entries.values())
+            return stats
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Return the process-wide result cache."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
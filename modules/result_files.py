@@ -0,0 +1,279 @@
+import os
+import uuid
+import threading
+from .db_utils import get_cache_dir
+
+# pyarrow is imported on the first columnar write, not at startup.
+_arrow = None
+_arrow_lock = threading.Lock()
+
+
+RESULT_FORMATS = {
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+    "csv": ".csv",
+}
+
+READ_HINTS = {
+    "parquet": "pd.read_parquet",
+    "arrow": "pd.read_feather",
+    "csv": "pd.read_csv",
+}
+
+
+def _load_arrow():
+    """Import pyarrow once; returns (pa, pq, ipc), or None if it isn't installed."""
+    global _arrow
+    with _arrow_lock:
+        if _arrow is None:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                import pyarrow.ipc as ipc
+
+                _arrow = (pa, pq, ipc)
+            except ImportError:
+                _arrow = False
+        return _arrow or None
+
+
+def get_result_format():
+    """Return the configured result file format (RESULT_FORMAT).
+
+    Columnar formats need pyarrow; without it results fall back to CSV.
+    """
+    result_format = os.getenv("RESULT_FORMAT", "parquet").strip().lower()
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(
+            f"Unsupported RESULT_FORMAT '{result_format}', "
+            f"expected one of {', '.join(RESULT_FORMATS)}"
+        )
+    if result_format != "csv" and _load_arrow() is None:
+        return "csv"
+    return result_format
+
+
+def new_result_path(result_format):
+    """Return a unique path for one tool call's result file."""
+    results_dir = get_cache_dir() / "results"
+    results_dir.mkdir(parents=True, exist_ok=True)
+    return str(results_dir / f"result_{uuid.uuid4().hex}{RESULT_FORMATS[result_format]}")
+
+
+# PostgreSQL type OIDs of the result columns, used for columns that are all
+# NULL in the first chunk (the values of other columns carry their type).
+PG_TYPE_OIDS = {
+    16: "bool",
+    20: "int64",
+    21: "int64",
+    23: "int64",
+    700: "float64",
+    701: "float64",
+    1700: "decimal",
+    1082: "date",
+    1114: "timestamp",
+    1184: "timestamptz",
+}
+
+
+def _arrow_type(pa, name):
+    return {
+        "bool": pa.bool_(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "decimal": pa.decimal128(38, 10),
+        "date": pa.date32(),
+        "timestamp": pa.timestamp("us"),
+        "timestamptz": pa.timestamp("us", tz="UTC"),
+    }.get(name, pa.string())
+
+
+def _widen_type(pa, current, incoming):
+    """Return a type that holds the values of both `current` and `incoming`."""
+    types = pa.types
+    if types.is_null(current):
+        return incoming
+    if types.is_integer(current) and types.is_integer(incoming):
+        return pa.int64()
+    if types.is_decimal(current) and (types.is_decimal(incoming) or types.is_integer(incoming)):
+        scale = max(current.scale, getattr(incoming, "scale", 0))
+        return pa.decimal128(38, scale)
+    numeric = (types.is_integer, types.is_floating, types.is_decimal)
+    if any(check(current) for check in numeric) and any(check(incoming) for check in numeric):
+        return pa.float64()
+    return pa.string()
+
+
+class ResultWriter:
+    """Incrementally writes DataFrame chunks to a result file.
+
+    Parquet and Arrow IPC files are compressed (RESULT_COMPRESSION, zstd by
+    default) and keep column types, so the code interpreter reads numbers and
+    dates back without re-parsing strings. The types come from the first
+    chunk and the cursor; when a later chunk doesn't fit them the schema is
+    widened (integers to floats, anything to strings as a last resort) and
+    the rows written so far are copied into a new file with it, one row group
+    (or record batch) at a time.
+    """
+
+    def __init__(self, result_format=None, path=None):
+        self.format = result_format or get_result_format()
+        self.path = path or new_result_path(self.format)
+        # Differs from `path` after a schema change; moved over it on close
+        self._write_path = self.path
+        self.compression = os.getenv("RESULT_COMPRESSION", "zstd")
+        self.rows = 0
+        self.schema = None
+        self.declared_types = {}
+        self._writer = None
+        self._file = None
+
+    def declare_types(self, description):
+        """Record the column types of a DB-API cursor description (PostgreSQL OIDs)."""
+        for column in description or []:
+            if isinstance(column[1], int) and column[1] in PG_TYPE_OIDS:
+                self.declared_types[column[0]] = PG_TYPE_OIDS[column[1]]
+
+    def _initial_field(self, pa, field):
+        if pa.types.is_null(field.type):
+            # Entirely NULL in the first chunk: use the cursor's type, or string
+            return pa.field(field.name, _arrow_type(pa, self.declared_types.get(field.name)))
+        if pa.types.is_integer(field.type):
+            return pa.field(field.name, pa.int64())
+        if pa.types.is_decimal(field.type):
+            # Leave room for wider values in later chunks
+            return pa.field(field.name, pa.decimal128(38, field.type.scale))
+        return field
+
+    def _to_arrow(self, df):
+        pa = _load_arrow()[0]
+        errors = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError)
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except errors:
+            # Object columns with mixed Python types
+            df = df.copy()
+            for name in df.columns[df.dtypes == object]:
+                df[name] = df[name].map(lambda value: value if value is None else str(value))
+            table = pa.Table.from_pandas(df, preserve_index=False)
+
+        if self.schema is None:
+            self.schema = pa.schema([self._initial_field(pa, field) for field in table.schema])
+        try:
+            return table.cast(self.schema)
+        except errors:
+            pass
+
+        fields = []
+        for field, column in zip(self.schema, table.columns):
+            for candidate in (field.type, _widen_type(pa, field.type, column.type), pa.string()):
+                try:
+                    column.cast(candidate)
+                    break
+                except errors:
+                    continue
+            fields.append(pa.field(field.name, candidate))
+        self._rewrite(pa.schema(fields))
+        return table.cast(self.schema)
+
+    def _rewrite(self, schema):
+        """Switch to a wider schema and copy the rows already written into a new file.
+
+        The old file is read one row group (parquet) or record batch (arrow)
+        at a time, so memory stays bounded by the chunk size.
+        """
+        pa, pq, ipc = _load_arrow()
+        self.schema = schema
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._writer = None
+        old_path = self._write_path
+        self._write_path = self.path if old_path != self.path else f"{self.path}.rewrite"
+        if self.format == "parquet":
+            with pq.ParquetFile(old_path) as source:
+                for i in range(source.num_row_groups):
+                    self._write_table(source.read_row_group(i).cast(schema))
+        else:
+            with pa.memory_map(old_path) as source:
+                reader = ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    self._write_table(pa.Table.from_batches([reader.get_batch(i)]).cast(schema))
+        os.remove(old_path)
+
+    def _write_table(self, table):
+        if self._writer is None:
+            _, pq, ipc = _load_arrow()
+            if self.format == "parquet":
+                self._writer = pq.ParquetWriter(
+                    self._write_path, self.schema, compression=self.compression
+                )
+            else:
+                self._writer = ipc.new_file(
+                    self._write_path,
+                    self.schema,
+                    options=ipc.IpcWriteOptions(compression=self.compression),
+                )
+        self._writer.write_table(table)
+
+    def write(self, df):
+        """Append a chunk of rows to the result file."""
+        if self.format == "csv":
+            if self._file is None:
+                self._file = open(self.path, "w", newline="")
+            df.to_csv(self._file, header=self.rows == 0, index=False)
+        else:
+            self._write_table(self._to_arrow(df))
+        self.rows += len(df)
+
+    def size(self):
+        """Return the number of bytes written to disk so far."""
+        if self._file is not None:
+            self._file.flush()
+        path = self._write_path
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._write_path != self.path:
+            os.replace(self._write_path, self.path)
+            self._write_path = self.path
+
+    def discard(self):
+        """Close the writer and delete the partially written file."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def read_hint(self):
+        """Return the pandas function the model should use to read the file."""
+        return READ_HINTS[self.format]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def write_result_file(df, result_format=None):
+    """Write a whole DataFrame to a new result file.
+
+    Args:
+        df (pd.DataFrame): The result to write.
+        result_format (str, optional): "parquet", "arrow" or "csv". Defaults to RESULT_FORMAT.
+
+    Returns:
+        ResultWriter: The closed writer, with its `path`, `format` and `rows`.
+    """
+    with ResultWriter(result_format) as writer:
+        writer.write(df)
+    return writer
@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from .db_utils import get_cache_dir
+from .context_index import CONTEXT_DIR
+
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        assistant_name TEXT,
+        thread_id TEXT NOT NULL,
+        title TEXT,
+        tables TEXT NOT NULL DEFAULT '[]',
+        context_versions TEXT NOT NULL DEFAULT '{}',
+        file_ids TEXT NOT NULL DEFAULT '[]',
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    )
+"""
+
+
+def context_version(schema):
+    """Short hash of a schema's context file, or None if it has none."""
+    path = Path(CONTEXT_DIR) / f"{schema}.txt"
+    try:
+        return hashlib.sha1(path.read_bytes()).hexdigest()[:12]
+    except OSError:
+        return None
+
+
+class SessionStore:
+    """SQLite store of conversation sessions, so they can be resumed after a restart.
+
+    A session keeps its thread id, the confirmed tables, the version of the
+    schema context injected for them and the files attached to the thread.
+    Sessions not used for SESSION_MAX_AGE_DAYS are expired by `cleanup`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_cache_dir() / "sessions.db"
+        self.max_age = float(os.getenv("SESSION_MAX_AGE_DAYS", "14")) * 86400
+        self.lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, session_id, assistant_name, thread_id, tables, context_versions, file_ids, title=None):
+        """Insert or update a session."""
+        now = time.time()
+        with self.lock, self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO sessions (session_id, assistant_name, thread_id, title, tables,
+                                      context_versions, file_ids, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    thread_id = excluded.thread_id,
+                    title = coalesce(sessions.title, excluded.title),
+                    tables = excluded.tables,
+                    context_versions = excluded.context_versions,
+                    file_ids = excluded.file_ids,
+                    last_used = excluded.last_used
+                """,
+                (
+                    session_id,
+                    assistant_name,
+                    thread_id,
+                    title,
+                    json.dumps(tables),
+                    json.dumps(context_versions),
+                    json.dumps(file_ids),
+                    now,
+                    now,
+                ),
+            )
+
+    def get(self, session_id):
+        """Return a session as a dict, or None if it doesn't exist."""
+        with self.lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return _session(row) if row else None
+
+    def latest(self, assistant_name=None):
+        """Return the most recently used session (of `assistant_name`), or None."""
+        sessions = self.list(assistant_name, limit=1)
+        return sessions[0] if sessions else None
+
+    def list(self, assistant_name=None, limit=20):
+        """Return sessions, most recently used first."""
+        query = "SELECT * FROM sessions"
+        params = []
+        if assistant_name:
+            query += " WHERE assistant_name = ?"
+            params.append(assistant_name)
+        query += " ORDER BY last_used DESC LIMIT ?"
+        params.append(limit)
+        with self.lock, self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [_session(row) for row in rows]
+
+    def delete(self, session_id):
+        with self.lock, self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def cleanup(self, client=None, keep=None):
+        """Delete sessions not used within SESSION_MAX_AGE_DAYS.
+
+        Args:
+            client: OpenAI client; when given, the sessions' threads are
+                deleted from the API too.
+            keep (str, optional): Session id to leave alone, such as the
+                session that is being resumed.
+
+        Returns:
+            list: Ids of the expired sessions.
+        """
+        cutoff = time.time() - self.max_age
+        with self.lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT session_id, thread_id FROM sessions WHERE last_used < ? AND session_id IS NOT ?",
+                (cutoff, keep),
+            ).fetchall()
+            conn.executemany(
+                "DELETE FROM sessions WHERE session_id = ?", [(row["session_id"],) for row in rows]
+            )
+        if client is not None:
+            for row in rows:
+                try:
+                    client.beta.threads.delete(row["thread_id"])
+                except Exception as e:
+                    print(f"Could not delete thread {row['thread_id']}: {e}", flush=True)
+        return [row["session_id"] for row in rows]
+
+
+def _session(row):
+    session = dict(row)
+    for key in ("tables", "context_versions", "file_ids"):
+        session[key] = json.loads(session[key])
+    return session
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Return the process-wide session store, or None if SESSION_STORE is off."""
+    global _store
+    if os.getenv("SESSION_STORE", "true").strip().lower() not in ("1", "true", "yes", "on"):
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore()
+        return _store
@@ -0,0 +1,180 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+from .llm_utils import encode_func_call_result
+from .tracing import current_span
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        _encoding = tiktoken.get_encoding(os.getenv("TOKEN_ENCODING", "o200k_base"))
+    return _encoding
+
+
+def count_tokens(text):
+    """Count the tokens of `text` (about 4 characters per token without tiktoken)."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_tokens(text, max_tokens):
+    """Split `text` into consecutive pieces of at most `max_tokens` tokens."""
+    encoding = _get_encoding()
+    if encoding is None:
+        step = max_tokens * 4
+        return [text[i : i + step] for i in range(0, len(text), step)] or [""]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [
+        encoding.decode(tokens[i : i + max_tokens])
+        for i in range(0, len(tokens), max_tokens)
+    ] or [""]
+
+
+# Full outputs that were cut down, so the model can page through them. Only
+# the TOOL_OUTPUT_PAGES_MAX most recently used outputs are kept.
+_pages = OrderedDict()
+_pages_lock = threading.Lock()
+
+
+def _store_pages(output_id, pages):
+    max_outputs = int(os.getenv("TOOL_OUTPUT_PAGES_MAX", "100"))
+    with _pages_lock:
+        _pages[output_id] = pages
+        while len(_pages) > max_outputs:
+            _pages.popitem(last=False)
+
+
+def get_tool_output_page(output_id: str, page: int):
+    """Returns another page of a tool output that was truncated to fit the token budget.
+
+    Args:
+        output_id (str): The id given in the truncation notice
+        page (int): Page number, starting at 1
+
+    Returns:
+        str: The requested page, or error message
+    """
+    with _pages_lock:
+        pages = _pages.get(output_id)
+        if pages is not None:
+            _pages.move_to_end(output_id)
+    if pages is None:
+        return "Error: Unknown or expired output id"
+    if page < 1 or page > len(pages):
+        return f"Error: Page must be between 1 and {len(pages)}"
+    notice = f"\n\n[Page {page} of {len(pages)} of output {output_id}]"
+    return pages[page - 1] + notice
+
+
+def _parse_overrides(value):
+    overrides = {}
+    for item in value.split(","):
+        name, _, tokens = item.partition("=")
+        if name.strip() and tokens.strip():
+            overrides[name.strip()] = int(tokens)
+    return overrides
+
+
+class TokenBudget:
+    """Counts and limits the tokens that tool outputs add to a thread.
+
+    Every tool output is limited to TOOL_OUTPUT_TOKENS tokens (per-tool
+    overrides in TOOL_TOKEN_BUDGETS as "name=tokens,..."), and all outputs of
+    one run share RUN_TOKEN_BUDGET tokens. Longer outputs are cut to their
+    first page; the rest can be read with get_tool_output_page.
+    """
+
+    # Outputs are never cut below this, even when the run budget is spent
+    min_tokens = 200
+
+    def __init__(self):
+        self.tool_tokens = int(os.getenv("TOOL_OUTPUT_TOKENS", "4000"))
+        self.run_tokens = int(os.getenv("RUN_TOKEN_BUDGET", "20000"))
+        self.overrides = _parse_overrides(os.getenv("TOOL_TOKEN_BUDGETS", ""))
+        self.lock = threading.Lock()
+        self.start_run()
+
+    def start_run(self):
+        """Reset the per-run spend; call once per user message."""
+        with self.lock:
+            self.run_spent = 0
+            self.calls = []
+
+    def limit_for(self, tool_name):
+        return self.overrides.get(tool_name, self.tool_tokens)
+
+    def apply(self, tool_name, output):
+        """Fit one encoded tool output into the budget and record its token spend.
+
+        Args:
+            tool_name (str): Name of the tool that produced the output.
+            output (str): The encoded tool output.
+
+        Returns:
+            str: The output, truncated to its first page if it was too long.
+        """
+        tokens = count_tokens(output)
+        with self.lock:
+            run_left = max(self.run_tokens - self.run_spent, self.min_tokens)
+            limit = min(self.limit_for(tool_name), run_left)
+            if tool_name == "get_tool_output_page" or tokens <= limit:
+                sent = output
+            else:
+                pages = split_tokens(output, limit)
+                output_id = uuid.uuid4().hex[:12]
+                _store_pages(output_id, pages)
+                reason = (
+                    "the run's token budget is nearly spent"
+                    if run_left < self.limit_for(tool_name)
+                    else f"it exceeds {limit} tokens"
+                )
+                sent = encode_func_call_result(
+                    f"{pages[0]}\n\n[Output truncated because {reason}: page 1 of "
+                    f"{len(pages)}, {tokens} tokens in total. Call get_tool_output_page "
+                    f"with output_id '{output_id}' to read more, or narrow the request.]"
+                )
+            sent_tokens = count_tokens(sent)
+            self.run_spent += sent_tokens
+            self.calls.append(
+                {
+                    "tool": tool_name,
+                    "tokens": tokens,
+                    "sent_tokens": sent_tokens,
+                    "truncated": sent is not output,
+                }
+            )
+            run_spent = self.run_spent
+            truncated = sum(1 for call in self.calls if call["truncated"])
+        run_span = current_span("run")
+        if run_span is not None:
+            run_span.set(tool_output_tokens=run_spent, truncated_outputs=truncated)
+        return sent
+
+    def apply_outputs(self, tool_calls, tool_outputs):
+        """Apply `apply` to the outputs of a batch of tool calls."""
+        names = {tool.id: tool.function.name for tool in tool_calls}
+        return [
+            {**output, "output": self.apply(names.get(output["tool_call_id"], ""), output["output"])}
+            for output in tool_outputs
+        ]
+
+    def report(self):
+        """Return the token spend of the current run, per tool call."""
+        with self.lock:
+            return {
+                "run_tokens": self.run_spent,
+                "run_budget": self.run_tokens,
+                "calls": list(self.calls),
+            }
@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from .db_utils import get_cache_dir
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+
+_current_span = contextvars.ContextVar("dbassistant_span", default=None)
+
+
+class Span:
+    """One timed operation: a run, tool call, SQL execution, upload or thread update."""
+
+    def __init__(self, name, parent=None, session=None, attributes=None):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.parent_id = parent.span_id if parent else None
+        self.session = session or (parent.session if parent else None)
+        self.attributes = dict(attributes or {})
+        self.start = time.time()
+        self.duration_ms = None
+        self.error = None
+        # The mirrored OpenTelemetry span, parent of the children's OTel spans
+        self.otel_span = None
+
+    def set(self, **attributes):
+        """Add attributes to the span, e.g. rows or bytes once they are known."""
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "session": self.session,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 3) if self.duration_ms is not None else None,
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    index = min(int(round(q * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+class Tracer:
+    """Records spans and appends them to a JSONL file (TRACE_FILE).
+
+    The file is rotated to TRACE_FILE.1 once it exceeds TRACE_FILE_MAX_BYTES,
+    so at most two files' worth of spans are kept on disk.
+
+    Spans nest through a context variable, so tool calls, SQL executions and
+    uploads are children of the run they belong to, including work done on
+    executor threads that copy the caller's context. If TRACE_OTEL is set and
+    opentelemetry is installed, every span is mirrored to OpenTelemetry too.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("TRACE_ENABLED", "true").strip().lower() in (
+            "1",
+            "true",
+            "yes",
+            "on",
+        )
+        self.path = os.getenv("TRACE_FILE") or str(get_cache_dir() / "traces.jsonl")
+        self.max_file_bytes = int(os.getenv("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+        self._file_bytes = None
+        self.otel = None
+        if otel_trace is not None and os.getenv("TRACE_OTEL", "").strip().lower() in ("1", "true", "yes", "on"):
+            self.otel = otel_trace.get_tracer("dbassistant")
+        self.lock = threading.Lock()
+        # Recently finished spans, kept for session summaries
+        self.spans = deque(maxlen=int(os.getenv("TRACE_KEEP_SPANS", "10000")))
+
+    @contextmanager
+    def span(self, name, session=None, **attributes):
+        """Time the enclosed block as a span named `name`.
+
+        Args:
+            name (str): Span name, e.g. "run", "tool_call", "sql", "upload".
+            session (str, optional): Session id; children inherit it.
+            **attributes: Initial span attributes.
+
+        Yields:
+            Span: The span, so the block can add attributes with `set`.
+        """
+        span = Span(name, _current_span.get(), session, attributes)
+        if not self.enabled:
+            yield span
+            return
+        token = _current_span.set(span)
+        otel_span = None
+        if self.otel is not None:
+            parent = span.parent.otel_span if span.parent is not None else None
+            context = otel_trace.set_span_in_context(parent) if parent is not None else None
+            otel_span = self.otel.start_span(name, context=context)
+            span.otel_span = otel_span
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_ms = (time.perf_counter() - started) * 1000
+            _current_span.reset(token)
+            if otel_span is not None:
+                for key, value in span.attributes.items():
+                    if isinstance(value, (str, bool, int, float)):
+                        otel_span.set_attribute(key, value)
+                if span.error:
+                    otel_span.set_attribute("error", span.error)
+                otel_span.end()
+            self.record(span)
+
+    def record(self, span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self.lock:
+            self.spans.append(span)
+            if self._file_bytes is None:
+                self._file_bytes = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+            if self._file_bytes + len(line) > self.max_file_bytes > 0:
+                os.replace(self.path, f"{self.path}.1")
+                self._file_bytes = 0
+            with open(self.path, "a") as f:
+                f.write(line)
+            self._file_bytes += len(line)
+
+    def get_spans(self, session=None):
+        """Return the finished spans of a session (or of the whole process)."""
+        with self.lock:
+            return [s for s in self.spans if session is None or s.session == session]
+
+    def summary(self, session=None):
+        """Aggregate the finished spans of a session (or of the whole process).
+
+        Returns:
+            dict: Per span name: count, errors, total, p50, p95 and max duration in ms.
+        """
+        grouped = {}
+        for span in self.get_spans(session):
+            grouped.setdefault(span.name, []).append(span)
+        summary = {}
+        for name, group in sorted(grouped.items()):
+            durations = [s.duration_ms for s in group]
+            summary[name] = {
+                "count": len(group),
+                "errors": sum(1 for s in group if s.error),
+                "total_ms": round(sum(durations), 1),
+                "p50_ms": round(_percentile(durations, 0.5), 1),
+                "p95_ms": round(_percentile(durations, 0.95), 1),
+                "max_ms": round(max(durations), 1),
+            }
+        return summary
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Return the process-wide tracer."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+
+def current_span(name=None):
+    """Return the innermost open span of the calling context, if any.
+
+    With `name`, return the innermost open span of that name instead.
+    """
+    span = _current_span.get()
+    while name is not None and span is not None and span.name != name:
+        span = span.parent
+    return span
+
+
+def span(name, session=None, **attributes):
+    """Shortcut for get_tracer().span(...)."""
+    return get_tracer().span(name, session, **attributes)
+
+
+def print_summary(session=None):
+    """Print the span summary of a session as a table."""
+    summary = get_tracer().summary(session)
+    if not summary:
+        return
+    print(f"\n{'span':<18}{'count':>7}{'errors':>8}{'total ms':>12}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for name, row in summary.items():
+        print(
+            f"{name:<18}{row['count']:>7}{row['errors']:>8}{row['total_ms']:>12}"
+            f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['max_ms']:>10}"
+        )
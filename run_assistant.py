@@ -3,7 +3,7 @@
 Entry point script to run the database assistant.
 """
 
-from scripts.run_dbassistant import run_assistant
+from scripts.run_dbassistant import main
 
 if __name__ == "__main__":
-    run_assistant()
+    main()
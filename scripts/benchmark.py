@@ -0,0 +1,295 @@
+"""
+Offline benchmark of the tool layer.
+
+Replays the scripted scenarios in benchmarks/scenarios.json through Converse
+and DbAssistantEventHandler against a local fake Assistants API and a
+fixture database (SQLite by default, or the Postgres database given with
+--db-uri), then reports latency percentiles per scenario, per step, per
+tool and per span type. With --baseline the results are compared against a
+saved run and the script exits with status 1 on a regression.
+
+    python -m scripts.benchmark --repeat 10 --save-baseline benchmarks/baseline.json
+    python -m scripts.benchmark --repeat 10 --baseline benchmarks/baseline.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+
+from scripts.fake_assistants_api import FakeAssistantsServer
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_SCENARIOS = REPO_DIR / "benchmarks" / "scenarios.json"
+
+
+def percentiles(values):
+    """p50/p95/p99/max of a list of millisecond timings."""
+    values = sorted(values)
+
+    def pick(q):
+        return values[min(int(round(q * (len(values) - 1))), len(values) - 1)]
+
+    return {
+        "count": len(values),
+        "p50_ms": round(pick(0.5), 2),
+        "p95_ms": round(pick(0.95), 2),
+        "p99_ms": round(pick(0.99), 2),
+        "max_ms": round(values[-1], 2),
+    }
+
+
+def build_fixture(db_uri, schema, rows):
+    """Create the customers and orders fixture tables (replacing existing ones)."""
+    import numpy as np
+    import pandas as pd
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(db_uri)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+    target_schema = schema if engine.dialect.name == "postgresql" else None
+
+    rng = np.random.default_rng(0)
+    customers = max(rows // 20, 1)
+    pd.DataFrame(
+        {
+            "id": np.arange(customers),
+            "name": [f"customer {i}" for i in range(customers)],
+            "country": rng.choice(["DE", "FR", "NL", "US", "JP"], customers),
+        }
+    ).to_sql("customers", engine, schema=target_schema, if_exists="replace", index=False)
+    pd.DataFrame(
+        {
+            "id": np.arange(rows),
+            "customer_id": rng.integers(0, customers, rows),
+            "amount": rng.gamma(2.0, 40.0, rows).round(2),
+            "status": rng.choice(["new", "paid", "shipped", "returned"], rows),
+            "created_at": pd.Timestamp("2024-01-01")
+            + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, rows), unit="s"),
+        }
+    ).to_sql("orders", engine, schema=target_schema, if_exists="replace", index=False, chunksize=10000)
+    engine.dispose()
+
+
+def substitute(value, schema):
+    """Replace {schema} in the string values of scenario arguments."""
+    if isinstance(value, str):
+        return value.replace("{schema}", schema)
+    if isinstance(value, list):
+        return [substitute(item, schema) for item in value]
+    if isinstance(value, dict):
+        return {key: substitute(item, schema) for key, item in value.items()}
+    return value
+
+
+def run_benchmark(server, scenarios, repeat, warmup, schema, verbose=False):
+    """Run every scenario `warmup + repeat` times and collect timings.
+
+    Returns:
+        dict: Percentiles per scenario, step, tool and span name, plus the
+            number of tool outputs that reported an error.
+    """
+    # Imported here so the environment set up by main() is in place first
+    from modules.base_assistant import BaseAssistant
+    from modules.converse import Converse
+    from modules.db_thread import DbThread
+    from modules.db_tools import get_db_toolkit
+    from modules.context_utils import get_dbassistant_context_toolkit
+    from modules.tracing import get_tracer
+
+    assistant = BaseAssistant(
+        name="Benchmark",
+        instruct_file=str(REPO_DIR / "instructions" / "db_assistant_instructs.txt"),
+        tools=get_db_toolkit() | get_dbassistant_context_toolkit(),
+        builtin_tools=[{"type": "code_interpreter"}],
+        model="gpt-4.1",
+        tool_resources=None,
+    )
+    assistant.create_assistant()
+
+    timings = {"scenarios": {}, "steps": {}, "tools": {}, "spans": {}}
+    errors = {}
+    for scenario in scenarios:
+        name = scenario["name"]
+        steps = substitute(scenario["steps"], schema)
+        for iteration in range(warmup + repeat):
+            thread = DbThread(tool_resources=None)
+            thread.create_db_thread()
+            converse = Converse(assistant, thread)
+            server.runs.load(steps)
+
+            output = io.StringIO()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(sys.stdout if verbose else output):
+                converse.ask(scenario["question"])
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if iteration < warmup:
+                continue
+
+            timings["scenarios"].setdefault(name, []).append(elapsed_ms)
+            for step_index, seconds, tool_outputs in server.runs.tool_steps:
+                key = f"{name}#{step_index}"
+                timings["steps"].setdefault(key, []).append(seconds * 1000)
+                failed = sum(1 for o in tool_outputs if o.get("output", "").startswith('"Error'))
+                if failed:
+                    errors[key] = errors.get(key, 0) + failed
+            for span in get_tracer().get_spans(converse.session_id):
+                if span.name == "tool_call":
+                    tool = span.attributes.get("tool", "")
+                    timings["tools"].setdefault(tool, []).append(span.duration_ms)
+                elif span.name != "run":
+                    key = span.name
+                    if "kind" in span.attributes:
+                        key = f"{span.name}.{span.attributes['kind']}"
+                    timings["spans"].setdefault(key, []).append(span.duration_ms)
+
+    results = {
+        group: {key: percentiles(values) for key, values in sorted(entries.items())}
+        for group, entries in timings.items()
+    }
+    results["errors"] = errors
+    return results
+
+
+def compare(results, baseline, tolerance, floor_ms=1.0):
+    """Compare p50 and p95 against a baseline.
+
+    A metric regresses when it is more than `tolerance` (a fraction) and
+    more than `floor_ms` slower than in the baseline.
+
+    Returns:
+        list: (group, key, metric, baseline ms, current ms) of every regression.
+    """
+    regressions = []
+    for group in ("scenarios", "steps", "tools", "spans"):
+        for key, current in results.get(group, {}).items():
+            previous = baseline.get(group, {}).get(key)
+            if previous is None:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                old, new = previous[metric], current[metric]
+                if new > old * (1 + tolerance) and new - old > floor_ms:
+                    regressions.append((group, key, metric, old, new))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    for group in ("scenarios", "steps", "tools", "spans"):
+        entries = results.get(group, {})
+        if not entries:
+            continue
+        print(f"\n{group}")
+        print(f"  {'name':<32}{'n':>5}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'max ms':>11}{'vs base':>10}")
+        for key, row in entries.items():
+            delta = ""
+            previous = (baseline or {}).get(group, {}).get(key)
+            if previous and previous["p50_ms"]:
+                delta = f"{(row['p50_ms'] / previous['p50_ms'] - 1) * 100:+.0f}%"
+            print(
+                f"  {key:<32}{row['count']:>5}{row['p50_ms']:>11}{row['p95_ms']:>11}"
+                f"{row['p99_ms']:>11}{row['max_ms']:>11}{delta:>10}"
+            )
+    if results.get("errors"):
+        print("\ntool errors (check the fixture and scenarios):")
+        for key, count in results["errors"].items():
+            print(f"  {key}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", default=str(DEFAULT_SCENARIOS))
+    parser.add_argument("--only", nargs="*", help="Run only these scenarios")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--db-uri", help="Postgres fixture database (default: a temporary SQLite file)")
+    parser.add_argument("--rows", type=int, default=100000, help="Rows in the orders fixture table")
+    parser.add_argument("--result-cache", action="store_true", help="Keep the result cache enabled")
+    parser.add_argument("--baseline", help="Compare against this saved result file")
+    parser.add_argument("--save-baseline", help="Write the results to this file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown as a fraction")
+    parser.add_argument("--verbose", action="store_true", help="Show the conversation output")
+    args = parser.parse_args()
+    # The benchmark runs in a temporary working directory
+    for name in ("scenarios", "baseline", "save_baseline"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    with open(args.scenarios, "r") as f:
+        scenarios = json.load(f)
+
+    work_dir = Path(tempfile.mkdtemp(prefix="dbassistant-bench-"))
+    db_uri = args.db_uri or f"sqlite:///{work_dir / 'bench.db'}"
+    dialect = "postgres" if db_uri.startswith("postgres") else "sqlite"
+    schema = "bench" if dialect == "postgres" else "main"
+    scenarios = [
+        s for s in scenarios
+        if dialect in s.get("requires", [dialect]) and (not args.only or s["name"] in args.only)
+    ]
+
+    server = FakeAssistantsServer().start()
+    os.environ.update(
+        {
+            "OPENAI_API_KEY": "benchmark",
+            "OPENAI_BASE_URL": server.base_url,
+            "DB_URI": db_uri,
+            "DBASSISTANT_CACHE_DIR": str(work_dir / ".cache"),
+            "TRACE_FILE": str(work_dir / "traces.jsonl"),
+            "APPROVAL_FALLBACK": "reject",
+            "APPROVAL_ALLOWED_SCHEMAS": schema,
+            "RESULT_CACHE_ENABLED": "true" if args.result_cache else "false",
+        }
+    )
+
+    # Tools read context_files/ relative to the working directory
+    (work_dir / "context_files").mkdir()
+    (work_dir / "context_files" / f"{schema}.txt").write_text(
+        "Benchmark fixture.\n\nTable: orders\nOne row per order with amount, status and created_at.\n\n"
+        "Table: customers\nOne row per customer with name and country.\n"
+    )
+    os.chdir(work_dir)
+
+    print(f"Building fixture ({args.rows} orders) in {db_uri}", flush=True)
+    build_fixture(db_uri, schema, args.rows)
+
+    try:
+        results = run_benchmark(server, scenarios, args.repeat, args.warmup, schema, args.verbose)
+    finally:
+        server.stop()
+    results["meta"] = {
+        "dialect": dialect,
+        "rows": args.rows,
+        "repeat": args.repeat,
+        "result_cache": args.result_cache,
+        "created_at": time.time(),
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.save_baseline}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}:")
+            for group, key, metric, old, new in regressions:
+                print(f"  {group} {key} {metric}: {old} -> {new} ms")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+List or garbage-collect the assistants recorded in the assistant registry.
+
+Without options the registered assistants are listed. --gc deletes the ones
+not used for ASSISTANT_MAX_AGE_DAYS; with --orphans it also deletes remote
+assistants created by this project that the registry doesn't know about,
+such as those left behind before the registry existed. Don't use --orphans
+while sessions with unregistered assistants are running.
+
+    python -m scripts.cleanup_assistants
+    python -m scripts.cleanup_assistants --gc --orphans
+"""
+
+import time
+import argparse
+
+from modules.assistant_registry import get_assistant_registry
+from modules.openai_client import get_client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--gc", action="store_true", help="Delete stale assistants")
+    parser.add_argument("--orphans", action="store_true", help="Also delete unregistered assistants")
+    args = parser.parse_args()
+
+    registry = get_assistant_registry()
+    if not args.gc:
+        entries = registry.load()["assistants"]
+        for name, entry in sorted(entries.items()):
+            age = (time.time() - entry["last_used"]) / 86400
+            print(f"{name:<24}{entry['id']:<34}{entry['config'][:12]}  last used {age:.1f} days ago")
+        if not entries:
+            print("No registered assistants")
+        return
+
+    deleted = registry.collect_garbage(get_client(), orphans=args.orphans, force=True)
+    print(f"Deleted {len(deleted)} assistant(s)")
+    for assistant_id in deleted:
+        print(f"  {assistant_id}")
+
+
+if __name__ == "__main__":
+    main()
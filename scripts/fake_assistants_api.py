@@ -0,0 +1,289 @@
+"""
+A local stand-in for the OpenAI Assistants API that replays scripted runs.
+
+Point the OpenAI client at it with OPENAI_BASE_URL=<server.base_url> before
+the modules create their clients. Each run replays the steps of the loaded
+scenario: a step either requests tool calls (the run pauses in
+requires_action until the outputs are submitted) or streams a text answer
+and completes the run. `model_ms` on a step simulates the model's latency,
+`latency_ms` on the server the round trip of every request.
+"""
+
+import re
+import json
+import time
+import uuid
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _new_id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+class ScriptedRuns:
+    """The scenario being replayed and what the client sent back."""
+
+    def __init__(self):
+        self.steps = []
+        self.step_index = 0
+        self.lock = threading.Lock()
+        # (step index, seconds between requesting tool calls and receiving outputs, outputs)
+        self.tool_steps = []
+        self.uploaded_bytes = 0
+        self._requested_at = None
+
+    def load(self, steps):
+        with self.lock:
+            self.steps = steps
+            self.step_index = 0
+            self.tool_steps = []
+            self.uploaded_bytes = 0
+            self._requested_at = None
+
+    def next_step(self):
+        with self.lock:
+            if self.step_index >= len(self.steps):
+                return {"text": ""}
+            step = self.steps[self.step_index]
+            self.step_index += 1
+            return step
+
+    def mark_requested(self):
+        with self.lock:
+            self._requested_at = time.perf_counter()
+
+    def record_upload(self, size):
+        with self.lock:
+            self.uploaded_bytes += size
+
+    def record_outputs(self, tool_outputs):
+        with self.lock:
+            elapsed = time.perf_counter() - self._requested_at if self._requested_at else None
+            self.tool_steps.append((self.step_index - 1, elapsed, tool_outputs))
+
+
+def _run(thread_id, run_id, assistant_id, status, required_action=None):
+    return {
+        "id": run_id,
+        "object": "thread.run",
+        "created_at": int(time.time()),
+        "thread_id": thread_id,
+        "assistant_id": assistant_id,
+        "status": status,
+        "required_action": required_action,
+        "last_error": None,
+        "model": "fake",
+        "instructions": "",
+        "tools": [],
+        "metadata": {},
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        if status == "completed"
+        else None,
+    }
+
+
+def _assistant(assistant_id, payload):
+    return {
+        "id": assistant_id,
+        "object": "assistant",
+        "created_at": int(time.time()),
+        "name": payload.get("name"),
+        "model": payload.get("model", "fake"),
+        "instructions": payload.get("instructions"),
+        "tools": payload.get("tools", []),
+        "metadata": payload.get("metadata", {}),
+    }
+
+
+def _message(thread_id, run_id, assistant_id, message_id, text, status):
+    return {
+        "id": message_id,
+        "object": "thread.message",
+        "created_at": int(time.time()),
+        "thread_id": thread_id,
+        "run_id": run_id,
+        "assistant_id": assistant_id,
+        "role": "assistant",
+        "status": status,
+        "attachments": [],
+        "metadata": {},
+        "content": [{"type": "text", "text": {"value": text, "annotations": []}}]
+        if text is not None
+        else [],
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeAssistants/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, thread_id, run_id, assistant_id):
+        runs = self.server.runs
+        step = runs.next_step()
+        time.sleep(step.get("model_ms", 0) / 1000)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def send(event, data):
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+
+        send("thread.run.created", _run(thread_id, run_id, assistant_id, "queued"))
+        send("thread.run.in_progress", _run(thread_id, run_id, assistant_id, "in_progress"))
+        if step.get("tool_calls"):
+            tool_calls = [
+                {
+                    "id": _new_id("call"),
+                    "type": "function",
+                    "function": {
+                        "name": call["name"],
+                        "arguments": json.dumps(call.get("arguments", {})),
+                    },
+                }
+                for call in step["tool_calls"]
+            ]
+            required_action = {
+                "type": "submit_tool_outputs",
+                "submit_tool_outputs": {"tool_calls": tool_calls},
+            }
+            runs.mark_requested()
+            send(
+                "thread.run.requires_action",
+                _run(thread_id, run_id, assistant_id, "requires_action", required_action),
+            )
+        else:
+            text = step.get("text", "")
+            message_id = _new_id("msg")
+            send("thread.message.created", _message(thread_id, run_id, assistant_id, message_id, None, "in_progress"))
+            send(
+                "thread.message.delta",
+                {
+                    "id": message_id,
+                    "object": "thread.message.delta",
+                    "delta": {
+                        "content": [
+                            {"index": 0, "type": "text", "text": {"value": text, "annotations": []}}
+                        ]
+                    },
+                },
+            )
+            send("thread.message.completed", _message(thread_id, run_id, assistant_id, message_id, text, "completed"))
+            send("thread.run.completed", _run(thread_id, run_id, assistant_id, "completed"))
+        self.wfile.write(b"event: done\ndata: [DONE]\n\n")
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        time.sleep(self.server.latency_ms / 1000)
+        match = re.search(r"/assistants/([^/]+)$", path)
+        if match:
+            return self._json(_assistant(match.group(1), {}))
+        if path.endswith("/assistants"):
+            return self._json({"object": "list", "data": [], "first_id": None, "last_id": None, "has_more": False})
+        match = re.search(r"/threads/([^/]+)$", path)
+        if match:
+            return self._json(
+                {"id": match.group(1), "object": "thread", "created_at": int(time.time()), "metadata": {}}
+            )
+        self.send_error(404)
+
+    def do_DELETE(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        match = re.search(r"/assistants/([^/]+)$", path)
+        if match:
+            return self._json({"id": match.group(1), "object": "assistant.deleted", "deleted": True})
+        match = re.search(r"/threads/([^/]+)$", path)
+        if match:
+            return self._json({"id": match.group(1), "object": "thread.deleted", "deleted": True})
+        self.send_error(404)
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        body = self._body()
+        time.sleep(self.server.latency_ms / 1000)
+
+        if path.endswith("/assistants"):
+            return self._json(_assistant(_new_id("asst"), json.loads(body or b"{}")))
+        match = re.search(r"/assistants/([^/]+)$", path)
+        if match:
+            return self._json(_assistant(match.group(1), json.loads(body or b"{}")))
+        if path.endswith("/files"):
+            self.server.runs.record_upload(len(body))
+            return self._json(
+                {
+                    "id": _new_id("file"),
+                    "object": "file",
+                    "bytes": len(body),
+                    "created_at": int(time.time()),
+                    "filename": "result",
+                    "purpose": "assistants",
+                    "status": "processed",
+                }
+            )
+        if path.endswith("/threads"):
+            return self._json(
+                {"id": _new_id("thread"), "object": "thread", "created_at": int(time.time()), "metadata": {}}
+            )
+
+        match = re.search(r"/threads/([^/]+)/messages$", path)
+        if match:
+            return self._json(_message(match.group(1), None, None, _new_id("msg"), "", "completed"))
+
+        match = re.search(r"/threads/([^/]+)/runs$", path)
+        if match:
+            payload = json.loads(body or b"{}")
+            return self._stream(match.group(1), _new_id("run"), payload.get("assistant_id"))
+
+        match = re.search(r"/threads/([^/]+)/runs/([^/]+)/submit_tool_outputs$", path)
+        if match:
+            payload = json.loads(body or b"{}")
+            self.server.runs.record_outputs(payload.get("tool_outputs", []))
+            return self._stream(match.group(1), match.group(2), None)
+
+        match = re.search(r"/threads/([^/]+)$", path)
+        if match:
+            return self._json(
+                {"id": match.group(1), "object": "thread", "created_at": int(time.time()), "metadata": {}}
+            )
+
+        self.send_error(404)
+
+
+class FakeAssistantsServer:
+    """Runs the fake API on a local port in a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0):
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.latency_ms = latency_ms
+        self.httpd.runs = ScriptedRuns()
+        self.runs = self.httpd.runs
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,181 @@
+"""
+Generate a synthetic catalog for scaling tests of the metadata tools.
+
+Creates `--schemas` schemas named <prefix>NNN in a PostgreSQL database, each
+with `--tables` tables of `--columns` columns, a primary key, up to `--fks`
+foreign keys to earlier tables of the same schema, a table comment and
+`--rows` rows, then runs ANALYZE so row estimates are populated. A matching
+context file is written for every schema.
+
+    python -m scripts.generate_catalog --db-uri postgresql://localhost/bench --schemas 20 --tables 500
+    python -m scripts.generate_catalog --db-uri postgresql://localhost/bench --drop
+"""
+
+import os
+import random
+import argparse
+from pathlib import Path
+from sqlalchemy import create_engine, text
+
+COLUMN_TYPES = [
+    ("integer", "(random() * 1000)::integer"),
+    ("numeric(12,2)", "round((random() * 10000)::numeric, 2)"),
+    ("text", "md5(g::text)"),
+    ("timestamp", "timestamp '2024-01-01' + g * interval '1 minute'"),
+    ("boolean", "random() < 0.5"),
+    ("varchar(32)", "'code_' || (g % 50)"),
+]
+
+NOUNS = [
+    "order", "customer", "invoice", "payment", "shipment", "product", "supplier",
+    "account", "contract", "ticket", "visit", "claim", "device", "event", "region",
+]
+
+
+def schema_names(prefix, schemas):
+    return [f"{prefix}{i:03d}" for i in range(schemas)]
+
+
+def table_name(rng, index):
+    return f"{rng.choice(NOUNS)}_{rng.choice(NOUNS)}_{index:05d}"
+
+
+def drop_catalog(engine, prefix):
+    """Drop every schema whose name starts with `prefix`."""
+    with engine.begin() as conn:
+        names = conn.execute(
+            text("SELECT nspname FROM pg_namespace WHERE nspname LIKE :pattern"),
+            {"pattern": prefix.replace("_", r"\_") + "%"},
+        ).scalars().all()
+        for name in names:
+            conn.execute(text(f'DROP SCHEMA "{name}" CASCADE'))
+    return names
+
+
+def generate_catalog(
+    engine,
+    schemas=5,
+    tables=100,
+    columns=12,
+    fks=2,
+    rows=100,
+    prefix="synth_",
+    context_dir="context_files",
+    seed=0,
+):
+    """Create the synthetic schemas, tables, keys, comments, rows and context files.
+
+    Args:
+        engine: SQLAlchemy engine of a PostgreSQL database.
+        schemas (int): Number of schemas.
+        tables (int): Tables per schema.
+        columns (int): Columns per table, besides the id and foreign key columns.
+        fks (int): Maximum foreign keys per table.
+        rows (int): Rows per table.
+        prefix (str): Prefix of the generated schema names.
+        context_dir (str): Where the context files are written (None to skip).
+        seed (int): Seed for the generated names and keys.
+
+    Returns:
+        dict: Counts of the generated schemas, tables, columns and foreign keys.
+    """
+    rng = random.Random(seed)
+    totals = {"schemas": 0, "tables": 0, "columns": 0, "foreign_keys": 0}
+    for schema in schema_names(prefix, schemas):
+        sections = [
+            f"Synthetic schema {schema} with {tables} generated tables. "
+            "Every table has an id primary key; *_id columns reference other tables of the schema."
+        ]
+        created = []
+        with engine.begin() as conn:
+            conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+            for t in range(tables):
+                name = table_name(rng, t)
+                targets = rng.sample(created, min(len(created), rng.randint(0, fks)))
+                column_defs = ["id integer PRIMARY KEY"]
+                selects = ["g"]
+                for target in targets:
+                    column_defs.append(
+                        f'{target}_id integer REFERENCES "{schema}"."{target}"(id)'
+                    )
+                    selects.append(f"1 + (g % {max(rows, 1)})" if rows else "NULL")
+                for c in range(columns):
+                    data_type, expression = COLUMN_TYPES[(t + c) % len(COLUMN_TYPES)]
+                    column_defs.append(f"col_{c:03d} {data_type}")
+                    selects.append(expression)
+                conn.execute(
+                    text(f'CREATE TABLE "{schema}"."{name}" ({", ".join(column_defs)})')
+                )
+                description = (
+                    f"{name.split('_')[0].capitalize()} records linked to "
+                    f"{', '.join(targets) or 'no other table'}."
+                )
+                # Utility statements can't take bind parameters
+                comment = description.replace("'", "''")
+                conn.execute(text(f'COMMENT ON TABLE "{schema}"."{name}" IS \'{comment}\''))
+                if rows:
+                    conn.execute(
+                        text(
+                            f'INSERT INTO "{schema}"."{name}" '
+                            f"SELECT {', '.join(selects)} FROM generate_series(1, {rows}) AS g"
+                        )
+                    )
+                    conn.execute(text(f'ANALYZE "{schema}"."{name}"'))
+                sections.append(f"Table: {name}\n{description}")
+                created.append(name)
+                totals["tables"] += 1
+                totals["columns"] += len(column_defs)
+                totals["foreign_keys"] += len(targets)
+        totals["schemas"] += 1
+
+        if context_dir:
+            Path(context_dir).mkdir(parents=True, exist_ok=True)
+            with open(Path(context_dir) / f"{schema}.txt", "w") as f:
+                f.write("\n\n".join(sections) + "\n")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db-uri", default=os.getenv("DB_URI"))
+    parser.add_argument("--schemas", type=int, default=5)
+    parser.add_argument("--tables", type=int, default=100, help="Tables per schema")
+    parser.add_argument("--columns", type=int, default=12, help="Columns per table")
+    parser.add_argument("--fks", type=int, default=2, help="Maximum foreign keys per table")
+    parser.add_argument("--rows", type=int, default=100, help="Rows per table")
+    parser.add_argument("--prefix", default="synth_")
+    parser.add_argument("--context-dir", default="context_files")
+    parser.add_argument("--drop", action="store_true", help="Only drop the generated schemas")
+    args = parser.parse_args()
+
+    engine = create_engine(args.db_uri)
+    if engine.dialect.name != "postgresql":
+        parser.error("the metadata tools read pg_catalog, so --db-uri must be a PostgreSQL database")
+
+    dropped = drop_catalog(engine, args.prefix)
+    for name in dropped:
+        context_file = Path(args.context_dir) / f"{name}.txt"
+        if context_file.exists():
+            context_file.unlink()
+    if args.drop:
+        print(f"Dropped {len(dropped)} schemas")
+        return
+
+    totals = generate_catalog(
+        engine,
+        schemas=args.schemas,
+        tables=args.tables,
+        columns=args.columns,
+        fks=args.fks,
+        rows=args.rows,
+        prefix=args.prefix,
+        context_dir=args.context_dir,
+    )
+    print(
+        f"Created {totals['schemas']} schemas, {totals['tables']} tables, "
+        f"{totals['columns']} columns and {totals['foreign_keys']} foreign keys"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,33 @@
-from modules.base_assistant import BaseAssistant, client
+import sys
+import time
+import argparse
+from modules.base_assistant import BaseAssistant
 from modules.converse import Converse
 from modules.db_thread import DbThread
 from modules.db_tools import get_db_toolkit
 from modules.context_utils import get_dbassistant_context_toolkit
+from modules.session_store import get_session_store
+from modules.openai_client import get_client
 
-def run_assistant():
+ASSISTANT_NAME = "Data Expert"
+
+
+def run_assistant(resume=None):
     """Run the database assistant in an interactive loop.
 
     This function initializes the assistant with the necessary tools and configuration,
     then enters an interactive loop where the user can input messages and receive responses.
+
+    Args:
+        resume (str, optional): Session id to resume, or "last" for the most
+            recently used session. Resumed sessions keep their thread and
+            confirmed tables, so discovery is skipped.
     """
     toolkit = get_db_toolkit() | get_dbassistant_context_toolkit()
     builtin_tools = [{"type": "code_interpreter"}]
 
     assistant = BaseAssistant(
-        name="Data Expert",
+        name=ASSISTANT_NAME,
         instruct_file="instructions/db_assistant_instructs.txt",
         tools=toolkit,
         builtin_tools=builtin_tools,
@@ -22,13 +35,54 @@ def run_assistant():
         tool_resources=None,
     )
 
+    # The thread, the assistant and the database pool/catalog snapshot are
+    # created concurrently by init_conversation.
     dbthread = DbThread(tool_resources=None)
-    dbthread.create_db_thread()
+    if resume:
+        session = find_session(resume)
+        if session is None:
+            sys.exit(f"No session '{resume}' to resume (see --list-sessions)")
+        dbthread.load_session(session)
 
     conversation = Converse(assistant, dbthread)
     conversation.init_conversation()
 
 
+def find_session(resume):
+    store = get_session_store()
+    if store is None:
+        return None
+    if resume == "last":
+        return store.latest(ASSISTANT_NAME)
+    return store.get(resume)
+
+
+def list_sessions():
+    store = get_session_store()
+    sessions = store.list(ASSISTANT_NAME) if store else []
+    if not sessions:
+        print("No stored sessions")
+    for session in sessions:
+        age = (time.time() - session["last_used"]) / 3600
+        print(f"{session['session_id']}  {age:6.1f}h ago  {len(session['tables'])} tables  {session['title'] or ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the database assistant.")
+    parser.add_argument("--resume", nargs="?", const="last", help="Resume a session (default: the last one)")
+    parser.add_argument("--list-sessions", action="store_true", help="List stored sessions")
+    parser.add_argument("--cleanup-sessions", action="store_true", help="Delete expired sessions and their threads")
+    args = parser.parse_args()
+
+    if args.list_sessions:
+        list_sessions()
+    elif args.cleanup_sessions:
+        store = get_session_store()
+        expired = store.cleanup(get_client()) if store else []
+        print(f"Deleted {len(expired)} expired session(s)")
+    else:
+        run_assistant(resume=args.resume)
+
 
 if __name__ == "__main__":
-    run_assistant()
+    main()
@@ -24,8 +24,9 @@ def run_dbexplorer():
         tool_resources=None,
     )
 
+    # The thread, the assistant and the database pool/catalog snapshot are
+    # created concurrently by init_conversation.
     dbthread = DbThread(tool_resources=None)
-    dbthread.create_db_thread()
 
     conversation = Converse(assistant, dbthread)
     conversation.init_conversation()
@@ -0,0 +1,173 @@
+"""
+Measure how the metadata tools scale with catalog size.
+
+For every size in --sizes (total number of generated tables) the synthetic
+catalog is regenerated in the PostgreSQL database given by --db-uri, and the
+catalog snapshot build, the metadata tools and context loading are timed.
+The output size of each tool is reported in characters and tokens. Results
+are written as JSON, and with --plot as a latency/size chart (needs
+matplotlib).
+
+    python -m scripts.scaling_benchmark --db-uri postgresql://localhost/bench --sizes 100 1000 5000 --plot scaling.png
+"""
+
+import os
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+from scripts.generate_catalog import drop_catalog, generate_catalog, schema_names
+
+
+def time_call(func, repeat):
+    """Median duration in ms of `repeat` calls and the last result."""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations), result
+
+
+def measure(schemas, repeat):
+    """Time the catalog build, metadata tools and context loading on the current catalog."""
+    from modules.catalog_cache import get_catalog_cache
+    from modules.context_index import get_context_index, get_relevant_context
+    from modules.context_utils import get_context_for_schemata
+    from modules.llm_utils import encode_func_call_result
+    from modules.token_budget import count_tokens
+    from modules import db_tools
+
+    cache = get_catalog_cache()
+    cache.invalidate()
+    build_ms, snapshot = time_call(lambda: cache.get(force_check=True), 1)
+    check_ms, _ = time_call(lambda: cache.get(force_check=True), repeat)
+
+    schema = schemas[0]
+    tables = sorted(key for key in snapshot["tables"] if key.startswith(f"{schema}."))
+    first = tables[0].split(".", 1)[1]
+    question = "which invoices were paid by customers in each region"
+
+    index = get_context_index()
+    index.index = None
+    if index.path.exists():
+        index.path.unlink()
+    index_ms, _ = time_call(index.load, 1)
+
+    tools = {
+        "get_all_schemata": lambda: db_tools.get_all_schemata(),
+        "list_schemas": lambda: db_tools.list_schemas(),
+        "list_tables": lambda: db_tools.list_tables(schema),
+        "list_table_columns": lambda: db_tools.list_table_columns(first, schema),
+        "get_table_columns_fks": lambda: db_tools.get_table_columns_fks(first, schema),
+        "get_tables_metadata": lambda: db_tools.get_tables_metadata(tables[:10]),
+        "context_full": lambda: get_context_for_schemata(schemas),
+        "context_relevant": lambda: get_relevant_context(tables[:3], question),
+    }
+    rows = {
+        "catalog_build": {"ms": build_ms},
+        "catalog_check": {"ms": check_ms},
+        "context_index_build": {"ms": index_ms},
+    }
+    for name, func in tools.items():
+        ms, result = time_call(func, repeat)
+        output = encode_func_call_result(result, name)
+        rows[name] = {"ms": ms, "chars": len(output), "tokens": count_tokens(output)}
+    return rows
+
+
+def plot(results, path):
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    sizes = [r["tables"] for r in results]
+    names = list(results[0]["metrics"])
+    fig, (latency_ax, size_ax) = plt.subplots(1, 2, figsize=(13, 5))
+    for name in names:
+        latency_ax.plot(sizes, [r["metrics"][name]["ms"] for r in results], marker="o", label=name)
+        if "tokens" in results[0]["metrics"][name]:
+            size_ax.plot(sizes, [r["metrics"][name]["tokens"] for r in results], marker="o", label=name)
+    for ax, label in ((latency_ax, "latency (ms)"), (size_ax, "output size (tokens)")):
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("tables in catalog")
+        ax.set_ylabel(label)
+        ax.grid(True, which="both", alpha=0.3)
+    latency_ax.legend(fontsize=8)
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db-uri", default=os.getenv("DB_URI"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="Total tables per step")
+    parser.add_argument("--tables-per-schema", type=int, default=250)
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--fks", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=10, help="Rows per table")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--prefix", default="synth_")
+    parser.add_argument("--output", default="scaling_results.json")
+    parser.add_argument("--plot", help="Write a latency and output size chart to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the last generated catalog")
+    args = parser.parse_args()
+    args.output = os.path.abspath(args.output)
+    if args.plot:
+        args.plot = os.path.abspath(args.plot)
+
+    # Context files and caches go to a scratch directory, not the repo
+    work_dir = Path(tempfile.mkdtemp(prefix="dbassistant-scaling-"))
+    os.environ["DB_URI"] = args.db_uri
+    os.environ["DBASSISTANT_CACHE_DIR"] = str(work_dir / ".cache")
+    os.chdir(work_dir)
+
+    from sqlalchemy import create_engine
+
+    engine = create_engine(args.db_uri)
+    results = []
+    try:
+        for size in args.sizes:
+            schemas = max(1, -(-size // args.tables_per_schema))
+            drop_catalog(engine, args.prefix)
+            for context_file in Path("context_files").glob(f"{args.prefix}*.txt"):
+                context_file.unlink()
+            print(f"Generating {size} tables in {schemas} schemas", flush=True)
+            totals = generate_catalog(
+                engine,
+                schemas=schemas,
+                tables=-(-size // schemas),
+                columns=args.columns,
+                fks=args.fks,
+                rows=args.rows,
+                prefix=args.prefix,
+            )
+            metrics = measure(schema_names(args.prefix, schemas), args.repeat)
+            results.append({"tables": totals["tables"], "totals": totals, "metrics": metrics})
+            for name, row in metrics.items():
+                extra = f"  {row['tokens']:>9} tokens" if "tokens" in row else ""
+                print(f"  {name:<22}{row['ms']:>10.1f} ms{extra}")
+    finally:
+        if not args.keep:
+            drop_catalog(engine, args.prefix)
+        engine.dispose()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.plot and results:
+        try:
+            plot(results, args.plot)
+            print(f"Plot written to {args.plot}")
+        except ImportError:
+            print("matplotlib is not installed, skipping the plot")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,10 +8,16 @@ from sqlalchemy import (
     Float,
     DateTime,
     Date,
+    inspect,
+    text,
 )
 import pandas as pd
 from pathlib import Path
 import os
+import io
+import csv
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -42,6 +48,51 @@ def sanitize_column_name(name):
     return sanitized.lower()
 
 
+PRIMARY_KEYS = {
+    "workouts": [
+        "Cycle start time",
+        "Cycle start end",
+        "Cycle timezone",
+        "Workout start time",
+        "Workout end time",
+    ],
+    "sleeps": [
+        "Cycle start time",
+        "Cycle end time",
+        "Cycle timezone",
+        "Sleep onset",
+        "Wake onset",
+    ],
+    "physiological_cycles": [
+        "Cycle start time",
+        "Cycle end time",
+        "Cycle timezone",
+    ],
+    "journal_entries": [
+        "Cycle start time",
+        "Cycle end time",
+        "Cycle timezone",
+        "Question text",
+    ],
+}
+
+
+def build_table(table_name, dtypes, metadata):
+    """Build a Table from (sanitized column name, pandas dtype) pairs"""
+    # Sanitize the primary key names
+    pkeys = [sanitize_column_name(col) for col in PRIMARY_KEYS.get(table_name, [])]
+
+    columns = []
+    for column_name, dtype in dtypes:
+        sql_type = get_sql_type(dtype)
+        if column_name in pkeys:
+            columns.append(Column(column_name, sql_type, primary_key=True))
+        else:
+            columns.append(Column(column_name, sql_type))
+
+    return Table(table_name, metadata, *columns)
+
+
 def create_table_from_csv(engine, csv_file):
     """Dynamically create a table based on CSV structure"""
     # Read the CSV file
@@ -66,51 +117,7 @@ def create_table_from_csv(engine, csv_file):
     df = df.rename(columns=column_mapping)
 
     # Create table with columns based on DataFrame structure
-    columns = []
-    pkeys = {
-        "workouts": [
-            "Cycle start time",
-            "Cycle start end",
-            "Cycle timezone",
-            "Workout start time",
-            "Workout end time",
-        ],
-        "sleeps": [
-            "Cycle start time",
-            "Cycle end time",
-            "Cycle timezone",
-            "Sleep onset",
-            "Wake onset",
-        ],
-        "physiological_cycles": [
-            "Cycle start time",
-            "Cycle end time",
-            "Cycle timezone",
-        ],
-        "journal_entries": [
-            "Cycle start time",
-            "Cycle end time",
-            "Cycle timezone",
-            "Question text",
-        ],
-    }
-
-    # Sanitize the primary key names in the pkeys dictionary
-    sanitized_pkeys = {
-        table: [sanitize_column_name(col) for col in cols]
-        for table, cols in pkeys.items()
-    }
-
-    for column_name, dtype in df.dtypes.items():
-        sql_type = get_sql_type(dtype)
-        # column_name is already sanitized here
-        if column_name in sanitized_pkeys.get(table_name, []):
-            columns.append(Column(column_name, sql_type, primary_key=True))
-        else:
-            columns.append(Column(column_name, sql_type))
-
-    # Create the table
-    table = Table(table_name, metadata, *columns)
+    table = build_table(table_name, df.dtypes.items(), metadata)
 
     # Create the table in the database
     try:
@@ -121,29 +128,531 @@ def create_table_from_csv(engine, csv_file):
     return table, df
 
 
+def create_table_from_sample(engine, csv_file, sample_rows):
+    """Create a table from the column types of the first `sample_rows` rows of a CSV.
+
+    Like create_table_from_csv, the first data row is skipped.
+
+    Returns:
+        tuple: (table, mapping of CSV column names to sanitized column names)
+    """
+    sample = pd.read_csv(csv_file, nrows=sample_rows, skiprows=[1])
+    column_mapping = {col: sanitize_column_name(col) for col in sample.columns}
+    sample.columns = [column_mapping[col] for col in sample.columns]
+
+    metadata = MetaData()
+    table = build_table(Path(csv_file).stem, sample.dtypes.items(), metadata)
+    metadata.create_all(engine)
+    return table, column_mapping
+
+
+def get_dtype_kind(dtype):
+    """Classify a pandas dtype the same way get_sql_type maps it"""
+    if "int" in str(dtype):
+        return "integer"
+    elif "float" in str(dtype):
+        return "float"
+    elif "datetime" in str(dtype):
+        return "datetime"
+    elif "date" in str(dtype):
+        return "date"
+    return "string"
+
+
+def get_type_kind(sql_type):
+    """Classify a SQLAlchemy column type for widening"""
+    if isinstance(sql_type, Integer):
+        return "integer"
+    elif isinstance(sql_type, Float):
+        return "float"
+    elif isinstance(sql_type, DateTime):
+        return "datetime"
+    elif isinstance(sql_type, Date):
+        return "date"
+    return "string"
+
+
+def widen_type_kind(current, incoming):
+    """Return the narrowest type kind that holds values of both kinds"""
+    if current == incoming:
+        return current
+    if {current, incoming} <= {"integer", "float"}:
+        return "float"
+    if {current, incoming} <= {"date", "datetime"}:
+        return "datetime"
+    return "string"
+
+
+TYPE_KINDS = {
+    "integer": Integer,
+    "float": Float,
+    "datetime": DateTime,
+    "date": Date,
+    "string": lambda: String(255),
+}
+
+
+def widen_table_columns(engine, table, chunk):
+    """Widen the table's columns where a chunk holds values the sample didn't.
+
+    A column that was all integers in the sample but holds fractions later
+    becomes a float column, numbers mixed with text become strings, and so on.
+
+    Parallel workers widen the same table, so the live column type is re-read
+    (under an advisory lock on PostgreSQL) before altering it, and a column is
+    never narrowed back to a type another worker already widened past.
+    """
+    for column_name, dtype in chunk.dtypes.items():
+        values = chunk[column_name].dropna()
+        if values.empty:
+            continue
+        incoming = get_dtype_kind(dtype)
+        # Integer columns with missing values are read as floats
+        if incoming == "float" and (values % 1 == 0).all():
+            incoming = "integer"
+        current = get_type_kind(table.c[column_name].type)
+        if widen_type_kind(current, incoming) == current:
+            continue
+
+        # SQLite columns are dynamically typed and can't be altered
+        if engine.dialect.name == "sqlite":
+            widened = widen_type_kind(current, incoming)
+            new_type = TYPE_KINDS[widened]()
+        else:
+            with engine.begin() as conn:
+                if engine.dialect.name == "postgresql":
+                    conn.execute(
+                        text("SELECT pg_advisory_xact_lock(hashtext(:name))"),
+                        {"name": table.name},
+                    )
+                live_type = next(
+                    column["type"]
+                    for column in inspect(conn).get_columns(table.name)
+                    if column["name"] == column_name
+                )
+                current = get_type_kind(live_type)
+                widened = widen_type_kind(current, incoming)
+                new_type = live_type if widened == current else TYPE_KINDS[widened]()
+                if widened != current:
+                    type_sql = new_type.compile(dialect=engine.dialect)
+                    conn.execute(
+                        text(
+                            f'ALTER TABLE "{table.name}" ALTER COLUMN "{column_name}" '
+                            f'TYPE {type_sql} USING "{column_name}"::{type_sql}'
+                        )
+                    )
+        if widened != current:
+            print(f"Widened {table.name}.{column_name} from {current} to {widened}", flush=True)
+        table.c[column_name].type = new_type
+
+
+def read_csv_chunks(engine, table, csv_file, column_mapping, chunk_rows, skip_first_row=True):
+    """Yield the CSV in chunks of `chunk_rows` rows, ready to load into `table`.
+
+    `csv_file` is a path or a binary file object (e.g. a CsvByteRange).
+    """
+    skiprows = [1] if skip_first_row else None
+    for chunk in pd.read_csv(csv_file, chunksize=chunk_rows, skiprows=skiprows):
+        chunk.columns = [column_mapping[col] for col in chunk.columns]
+        widen_table_columns(engine, table, chunk)
+        yield chunk
+
+
+def get_import_settings():
+    """Read the bulk load configuration from the environment"""
+    return {
+        "batch_size": int(os.getenv("IMPORT_BATCH_SIZE", "10000")),
+        # "auto" uses COPY on PostgreSQL and executemany batches elsewhere
+        "method": os.getenv("IMPORT_METHOD", "auto").strip().lower(),
+        "rejected_dir": os.getenv("IMPORT_REJECTED_DIR", "rejected_rows"),
+        # "stream" reads files in chunks; "full" reads each file into memory at once
+        "mode": os.getenv("IMPORT_MODE", "stream").strip().lower(),
+        "chunk_rows": int(os.getenv("IMPORT_CHUNK_ROWS", "100000")),
+        "sample_rows": int(os.getenv("IMPORT_SAMPLE_ROWS", "10000")),
+    }
+
+
+class RejectedRows:
+    """Collects rows that could not be loaded, with the database error, into a CSV file"""
+
+    def __init__(self, rejected_dir, table_name):
+        self.path = Path(rejected_dir) / f"{table_name}.rejected.csv"
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def add(self, record, error):
+        if self._writer is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "w", newline="")
+            self._writer = csv.DictWriter(
+                self._file, fieldnames=list(record.keys()) + ["_error"]
+            )
+            self._writer.writeheader()
+        self._writer.writerow({**record, "_error": str(error).splitlines()[0]})
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def to_records(df):
+    """Convert a batch to insert records, with missing values as None"""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def insert_rows_individually(engine, table, records, rejected):
+    """Insert rows one at a time to isolate the ones a failed batch choked on"""
+    loaded = 0
+    with engine.connect() as conn:
+        for record in records:
+            try:
+                with conn.begin_nested():
+                    conn.execute(table.insert(), [record])
+                loaded += 1
+            except Exception as e:
+                rejected.add(record, e)
+        conn.commit()
+    return loaded
+
+
+def executemany_insert(engine, table, df, batch_size, rejected):
+    """Insert a DataFrame in executemany batches of `batch_size` rows"""
+    loaded = 0
+    for start in range(0, len(df), batch_size):
+        records = to_records(df.iloc[start : start + batch_size])
+        try:
+            with engine.begin() as conn:
+                conn.execute(table.insert(), records)
+            loaded += len(records)
+        except Exception:
+            loaded += insert_rows_individually(engine, table, records, rejected)
+    return loaded
+
+
+def integer_columns_as_int(table, df):
+    """Cast float columns loaded into integer columns to nullable integers.
+
+    Integer columns with missing values are read as floats, and COPY rejects
+    their CSV form ("1.0") for an INTEGER column.
+    """
+    for column in table.columns:
+        if column.name not in df.columns or get_type_kind(column.type) != "integer":
+            continue
+        values = df[column.name]
+        if "float" in str(values.dtype) and (values.dropna() % 1 == 0).all():
+            df = df.assign(**{column.name: values.astype("Int64")})
+    return df
+
+
+def copy_insert(engine, table, df, batch_size, rejected):
+    """Stream a DataFrame into a PostgreSQL table with COPY FROM STDIN.
+
+    Each batch is sent as one COPY. A batch that fails is retried row by row
+    so only the offending rows end up in the rejected rows file.
+    """
+    columns = ", ".join(f'"{column.name}"' for column in table.columns)
+    copy_sql = f'COPY "{table.name}" ({columns}) FROM STDIN WITH (FORMAT csv)'
+    df = integer_columns_as_int(table, df)
+    loaded = 0
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start : start + batch_size]
+        buffer = io.StringIO()
+        batch.to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        raw_conn = engine.raw_connection()
+        try:
+            cursor = raw_conn.cursor()
+            if hasattr(cursor, "copy_expert"):
+                # psycopg2
+                cursor.copy_expert(copy_sql, buffer)
+            else:
+                # psycopg 3
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+            raw_conn.commit()
+            loaded += len(batch)
+        except Exception:
+            raw_conn.rollback()
+            loaded += insert_rows_individually(
+                engine, table, to_records(batch), rejected
+            )
+        finally:
+            raw_conn.close()
+    return loaded
+
+
+def load_dataframe(engine, table, df, settings):
+    """Bulk load a DataFrame into `table` and report the throughput"""
+    return load_chunks(engine, table, [df], settings)
+
+
+def load_chunks(engine, table, chunks, settings, part=None):
+    """Bulk load DataFrame chunks into `table` and report the throughput.
+
+    `part` numbers the rejected rows file when a file is loaded in several parts.
+
+    Returns:
+        dict: Table name, rows loaded and rejected, seconds taken, rows/second
+        and the rejected rows file (if any rows were rejected)
+    """
+    method = settings["method"]
+    if method == "auto":
+        method = "copy" if engine.dialect.name == "postgresql" else "executemany"
+
+    rejected_name = table.name if part is None else f"{table.name}.part{part}"
+    rejected = RejectedRows(settings["rejected_dir"], rejected_name)
+    loaded = 0
+    start = time.perf_counter()
+    try:
+        for chunk in chunks:
+            if method == "copy":
+                loaded += copy_insert(
+                    engine, table, chunk, settings["batch_size"], rejected
+                )
+            else:
+                loaded += executemany_insert(
+                    engine, table, chunk, settings["batch_size"], rejected
+                )
+    finally:
+        rejected.close()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "table": table.name,
+        "method": method,
+        "rows": loaded,
+        "rejected": rejected.count,
+        "rejected_file": str(rejected.path) if rejected.count else None,
+        "seconds": elapsed,
+        "rows_per_second": loaded / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def print_load_report(csv_file, report):
+    line = (
+        f"{Path(csv_file).name}: {report['rows']} rows loaded into {report['table']} "
+        f"in {report['seconds']:.1f}s ({report['rows_per_second']:.0f} rows/s, {report['method']})"
+    )
+    if report["rejected"]:
+        line += f", {report['rejected']} rows rejected -> {report['rejected_file']}"
+    print(line, flush=True)
+
+
 def import_csv_data(engine, csv_files):
-    """Import data from CSV files into dynamically created tables"""
+    """Import data from CSV files into dynamically created tables.
+
+    Returns:
+        list: One load report per file; files that failed completely carry an "error"
+    """
+    settings = get_import_settings()
+    reports = []
     for csv_file in csv_files:
         try:
-            # Create table and get DataFrame
-            table, df = create_table_from_csv(engine, csv_file)
-
-            # Convert DataFrame to dictionary format
-            records = df.to_dict("records")
-
-            # Insert data
-            with engine.connect() as conn:
-                for i, record in enumerate(records):
-                    try:
-                        stmt = table.insert().values(**record)
-                        conn.execute(stmt)
-                    except Exception:
-                        # Continue with next record
-                        pass
-                conn.commit()
-        except Exception:
-            # Continue with next file
-            pass
+            if settings["mode"] == "stream":
+                # Infer the table from a sample, then load the file chunk by chunk
+                table, column_mapping = create_table_from_sample(
+                    engine, csv_file, settings["sample_rows"]
+                )
+                chunks = read_csv_chunks(
+                    engine, table, csv_file, column_mapping, settings["chunk_rows"]
+                )
+                report = load_chunks(engine, table, chunks, settings)
+            else:
+                # Create table and get DataFrame
+                table, df = create_table_from_csv(engine, csv_file)
+                report = load_dataframe(engine, table, df, settings)
+            print_load_report(csv_file, report)
+        except Exception as e:
+            report = {"table": Path(csv_file).stem, "error": str(e)}
+            print(f"{Path(csv_file).name}: import failed: {e}", flush=True)
+        reports.append(report)
+    return reports
+
+
+class CsvByteRange(io.RawIOBase):
+    """Binary file object over the lines of a CSV that start in [start, end).
+
+    Both ends are moved forward to the next line start, so consecutive ranges
+    cover every line exactly once. Ranges after the first are prefixed with the
+    header line. Quoted values spanning several lines must not straddle a
+    range boundary.
+    """
+
+    def __init__(self, path, start, end):
+        self._file = open(path, "rb")
+        self._prefix = b""
+        if start > 0:
+            self._prefix = self._file.readline()
+        self.start = self._align(start)
+        self.end = self._align(end)
+        self._file.seek(self.start)
+
+    def _align(self, offset):
+        if offset == 0:
+            return 0
+        self._file.seek(offset - 1)
+        self._file.readline()
+        return self._file.tell()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._prefix:
+            n = min(len(buffer), len(self._prefix))
+            buffer[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        remaining = self.end - self._file.tell()
+        if remaining <= 0:
+            return 0
+        data = self._file.read(min(len(buffer), remaining))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def split_csv_files(csv_files, split_bytes):
+    """Split files larger than `split_bytes` into byte ranges.
+
+    Returns:
+        list: (csv_file, part, start, end) tasks
+    """
+    tasks = []
+    for csv_file in csv_files:
+        size = os.path.getsize(csv_file)
+        parts = max(1, -(-size // split_bytes)) if split_bytes > 0 else 1
+        bounds = [size * i // parts for i in range(parts + 1)]
+        for part in range(parts):
+            tasks.append((csv_file, part, bounds[part], bounds[part + 1]))
+    return tasks
+
+
+_worker_engine = None
+
+
+def _get_worker_engine():
+    """One connection per worker process, reused for all of its tasks"""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = create_engine(db_url, pool_size=1, max_overflow=0)
+    return _worker_engine
+
+
+def import_csv_range(task):
+    """Load one byte range of a CSV into its (already created) table.
+
+    Runs in a worker process.
+    """
+    csv_file, part, start, end = task
+    settings = get_import_settings()
+    engine = _get_worker_engine()
+    table = Table(Path(csv_file).stem, MetaData(), autoload_with=engine)
+    header = pd.read_csv(csv_file, nrows=0).columns
+    column_mapping = {col: sanitize_column_name(col) for col in header}
+
+    source = io.BufferedReader(CsvByteRange(csv_file, start, end))
+    try:
+        chunks = read_csv_chunks(
+            engine,
+            table,
+            source,
+            column_mapping,
+            settings["chunk_rows"],
+            skip_first_row=start == 0,
+        )
+        report = load_chunks(engine, table, chunks, settings, part=part)
+    finally:
+        source.close()
+    report.update(file=csv_file, part=part, bytes=end - start)
+    return report
+
+
+def import_csv_data_parallel(engine, csv_files, workers):
+    """Import CSV files with a pool of worker processes.
+
+    Tables are created up front from a sample of each file. Files larger than
+    IMPORT_SPLIT_BYTES are split into byte ranges, and every range is loaded by
+    a worker with its own database connection. Progress is printed as ranges
+    finish.
+
+    Returns:
+        list: One summary per file with rows, rejected rows, failed parts and rows/second
+    """
+    settings = get_import_settings()
+    split_bytes = int(os.getenv("IMPORT_SPLIT_BYTES", str(256 * 1024 * 1024)))
+
+    summaries = {}
+    ready_files = []
+    for csv_file in csv_files:
+        summaries[csv_file] = {
+            "table": Path(csv_file).stem,
+            "rows": 0,
+            "rejected": 0,
+            "parts": 0,
+            "parts_done": 0,
+            "failed_parts": [],
+            "started": time.perf_counter(),
+            "seconds": 0.0,
+        }
+        try:
+            create_table_from_sample(engine, csv_file, settings["sample_rows"])
+            ready_files.append(csv_file)
+        except Exception as e:
+            summaries[csv_file]["error"] = str(e)
+            print(f"{Path(csv_file).name}: import failed: {e}", flush=True)
+
+    tasks = split_csv_files(ready_files, split_bytes)
+    for csv_file, _, _, _ in tasks:
+        summaries[csv_file]["parts"] += 1
+    print(f"Loading {len(tasks)} parts of {len(ready_files)} files with {workers} workers")
+
+    total_rows = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(import_csv_range, task): task for task in tasks}
+        for done, future in enumerate(as_completed(futures), 1):
+            csv_file, part, _, _ = futures[future]
+            summary = summaries[csv_file]
+            summary["parts_done"] += 1
+            try:
+                report = future.result()
+                summary["rows"] += report["rows"]
+                summary["rejected"] += report["rejected"]
+                total_rows += report["rows"]
+                status = (
+                    f"{report['rows']} rows in {report['seconds']:.1f}s "
+                    f"({report['rows_per_second']:.0f} rows/s)"
+                )
+                if report["rejected"]:
+                    status += f", {report['rejected']} rejected -> {report['rejected_file']}"
+            except Exception as e:
+                summary["failed_parts"].append(part)
+                status = f"failed: {e}"
+            summary["seconds"] = time.perf_counter() - summary["started"]
+            elapsed = time.perf_counter() - start
+            print(
+                f"[{done}/{len(tasks)}] {Path(csv_file).name} part "
+                f"{summary['parts_done']}/{summary['parts']}: {status} "
+                f"| total {total_rows} rows, {total_rows / elapsed:.0f} rows/s",
+                flush=True,
+            )
+
+    results = []
+    for summary in summaries.values():
+        summary.pop("started")
+        summary["rows_per_second"] = (
+            summary["rows"] / summary["seconds"] if summary["seconds"] > 0 else 0.0
+        )
+        if summary["failed_parts"] and "error" not in summary:
+            summary["error"] = f"parts {summary['failed_parts']} failed"
+        results.append(summary)
+    return results
 
 
 if __name__ == "__main__":
@@ -160,7 +669,23 @@ if __name__ == "__main__":
     # Setup database and import data
     try:
         engine = create_engine(db_url)
-        import_csv_data(engine, csv_files)
+        workers = int(os.getenv("IMPORT_WORKERS", str(os.cpu_count() or 1)))
+        if workers > 1 and get_import_settings()["mode"] == "stream":
+            reports = import_csv_data_parallel(engine, csv_files, workers)
+            for report in reports:
+                print(
+                    f"{report['table']}: {report['rows']} rows, {report['rejected']} rejected, "
+                    f"{report['rows_per_second']:.0f} rows/s"
+                    + (f", {report['error']}" if "error" in report else "")
+                )
+        else:
+            reports = import_csv_data(engine, csv_files)
+        loaded = sum(report.get("rows", 0) for report in reports)
+        rejected = sum(report.get("rejected", 0) for report in reports)
+        failed = [report["table"] for report in reports if "error" in report]
+        print(f"Loaded {loaded} rows, rejected {rejected} rows")
+        if failed:
+            print(f"Failed files: {', '.join(failed)}")
         print("Data import completed successfully!")
     except Exception as e:
         print(f"Error: {str(e)}")
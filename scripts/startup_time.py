@@ -0,0 +1,132 @@
+"""
+Measure the time from process start to the first prompt.
+
+Every run starts a fresh interpreter that imports the assistant modules and
+warms up the assistant, the thread and the database pool the way
+run_assistant does, against a local fake Assistants API with --latency-ms
+per request and a database (a temporary SQLite file by default). With
+--serial the warm-up steps run one after the other instead, for comparison.
+Reports the median and p95 of the import, warm-up and total time.
+
+    python -m scripts.startup_time --runs 10 --latency-ms 150
+    python -m scripts.startup_time --runs 10 --latency-ms 150 --serial
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+from scripts.fake_assistants_api import FakeAssistantsServer
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def child(serial):
+    """Import, warm up and print the timings as JSON (runs in the subprocess)."""
+    started = time.perf_counter()
+    from modules.base_assistant import BaseAssistant
+    from modules.converse import Converse
+    from modules.db_thread import DbThread
+    from modules.db_tools import get_db_toolkit
+    from modules.catalog_cache import warm_up_catalog
+    from modules.context_utils import get_dbassistant_context_toolkit
+
+    imported = time.perf_counter()
+    assistant = BaseAssistant(
+        name="Startup",
+        instruct_file=str(REPO_DIR / "instructions" / "db_assistant_instructs.txt"),
+        tools=get_db_toolkit() | get_dbassistant_context_toolkit(),
+        builtin_tools=[{"type": "code_interpreter"}],
+        model="gpt-4.1",
+        tool_resources=None,
+    )
+    thread = DbThread(tool_resources=None)
+    converse = Converse(assistant, thread)
+    if serial:
+        warm_up_catalog()
+        thread.create_db_thread()
+        assistant.create_assistant()
+    else:
+        converse.warm_up()
+    ready = time.perf_counter()
+
+    print(
+        json.dumps(
+            {
+                "import_ms": (imported - started) * 1000,
+                "warm_up_ms": (ready - imported) * 1000,
+                "modules": sorted(
+                    name for name in ("pandas", "sqlalchemy", "pyarrow", "openai") if name in sys.modules
+                ),
+            }
+        )
+    )
+
+
+def summarize(values):
+    values = sorted(values)
+    p95 = values[min(int(round(0.95 * (len(values) - 1))), len(values) - 1)]
+    return {"p50_ms": round(statistics.median(values), 1), "p95_ms": round(p95, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=150, help="Simulated API round trip")
+    parser.add_argument("--db-uri", help="Database to warm up (default: a temporary SQLite file)")
+    parser.add_argument("--serial", action="store_true", help="Warm up one step after the other")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.serial)
+        return
+
+    work_dir = Path(tempfile.mkdtemp(prefix="dbassistant-startup-"))
+    server = FakeAssistantsServer(latency_ms=args.latency_ms).start()
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="startup",
+        OPENAI_BASE_URL=server.base_url,
+        DB_URI=args.db_uri or f"sqlite:///{work_dir / 'startup.db'}",
+        DBASSISTANT_CACHE_DIR=str(work_dir / ".cache"),
+        TRACE_FILE=str(work_dir / "traces.jsonl"),
+        PYTHONPATH=str(REPO_DIR),
+    )
+    command = [sys.executable, "-m", "scripts.startup_time", "--child"]
+    if args.serial:
+        command.append("--serial")
+
+    timings = {"process": [], "import": [], "warm_up": []}
+    modules = []
+    try:
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            output = subprocess.run(
+                command, cwd=work_dir, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            timings["process"].append((time.perf_counter() - started) * 1000)
+            result = json.loads(output.strip().splitlines()[-1])
+            timings["import"].append(result["import_ms"])
+            timings["warm_up"].append(result["warm_up_ms"])
+            modules = result["modules"]
+    finally:
+        server.stop()
+
+    mode = "serial" if args.serial else "concurrent"
+    print(f"{args.runs} runs, {mode} warm-up, {args.latency_ms:g} ms API latency")
+    print(f"  {'phase':<12}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, values in timings.items():
+        row = summarize(values)
+        print(f"  {name:<12}{row['p50_ms']:>10}{row['p95_ms']:>10}")
+    print(f"  heavy modules loaded by the first prompt: {', '.join(modules) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()